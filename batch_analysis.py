@@ -0,0 +1,220 @@
+"""
+Contains a command-line entry point that analyses every dataset in a directory without the
+interactive window.
+
+Every csv or Excel file in the directory is a factor, except the target file (the sea levels,
+found by name). For each factor, the statistics of stats_analysis are computed and every model
+of curve_fitting is fitted, on a pool of worker processes; the multiple linear regression of
+the target on all the factors that could be read is computed over the years every file has
+data for. A file that cannot be read or analysed is reported with its error. The results
+are written to a JSON report and a CSV table with one row per factor and model, and the charts
+can be rendered too. The time taken by each stage is included in the report.
+
+Run this file directly, e.g.
+    python batch_analysis.py data/ --jobs 4 --out report/ --charts
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import plotting_data_with_pandas as pd_with_pandas
+import stats_analysis
+from batch_fitting import fit_batch
+from curve_fitting import MODEL_FUNCTIONS
+from figure_export import FORMATS, export_charts
+from residual_analysis import linear_fit_residuals
+
+DATA_EXTENSIONS = ('.csv', '.xlsx')
+
+# Part of the name of the file holding the target variable, if --target is not given
+DEFAULT_TARGET = 'Sea_Level'
+
+
+def discover(directory: str, target: str = DEFAULT_TARGET) -> Tuple[List[str], str]:
+    """Return the paths of the factor files in directory, sorted by name, and the path of
+    the target file, the only data file whose name contains target.
+    Preconditions:
+        - os.path.isdir(directory)
+    """
+    filenames = sorted(name for name in os.listdir(directory)
+                       if name.endswith(DATA_EXTENSIONS) and not name.startswith('.'))
+    targets = [name for name in filenames if target in name]
+    if len(targets) != 1:
+        raise ValueError(f'expected one data file named like {target!r} in {directory}, '
+                         f'found {len(targets)}')
+    factors = [os.path.join(directory, name) for name in filenames if name != targets[0]]
+    return factors, os.path.join(directory, targets[0])
+
+
+def factor_statistics(ind_filename: str, dep_filename: str) -> Dict[str, Any]:
+    """Return the statistics of stats_analysis for the factor in ind_filename against the
+    target in dep_filename. Any error raised is recorded under 'error' rather than propagated.
+    """
+    row = {'ind_filename': ind_filename, 'error': None}
+    try:
+        x_values, y_values = pd_with_pandas.filenames_to_arrays(ind_filename, dep_filename)
+        accumulator = stats_analysis.BivariateAccumulator(x_values, y_values)
+        row.update(points=accumulator.n, mean=stats_analysis.mean(x_values),
+                   median=stats_analysis.median(x_values),
+                   standard_deviation=stats_analysis.sample_standard_deviation(x_values),
+                   correlation=accumulator.correlation, slope=accumulator.slope,
+                   intercept=accumulator.intercept, r_squared=accumulator.r_squared,
+                   line_rmse=linear_fit_residuals(x_values, y_values).rmse)
+    except Exception as error:  # pylint: disable=broad-except
+        row['error'] = type(error).__name__ + ': ' + str(error)
+    return row
+
+
+def _factor_statistics_star(arguments: Tuple[str, str]) -> Dict[str, Any]:
+    """Call factor_statistics with the given arguments. Used to send work to worker
+    processes.
+    """
+    return factor_statistics(*arguments)
+
+
+def regression(ind_filenames: List[str], dep_filename: str) -> Dict[str, Any]:
+    """Return the multiple linear regression of the target on every factor, or the reason it
+    could not be computed.
+    """
+    try:
+        dfs = pd_with_pandas.create_data_frames(ind_filenames, dep_filename)
+        coefficients, intercept, r_2 = stats_analysis.multiple_lin_reg(
+            *pd_with_pandas.common_years(dfs))
+    except Exception as error:  # pylint: disable=broad-except
+        return {'error': type(error).__name__ + ': ' + str(error)}
+    return {'factors': [df.columns[0] for df in dfs], 'coefficients': coefficients.tolist(),
+            'intercept': intercept, 'r_squared': r_2}
+
+
+def _jsonable(value: Any) -> Any:
+    """Return value with numpy values, tuples and NaNs made suitable for JSON."""
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def analyse(directory: str, target: str = DEFAULT_TARGET, jobs: Optional[int] = None,
+            chart_dir: Optional[str] = None, chart_format: str = 'png') -> Dict[str, Any]:
+    """Analyse every factor in directory against its target file, and return the report:
+    the statistics of each factor, the fit of every model to each factor, the multiple
+    linear regression on the factors whose statistics could be computed, the charts written
+    (if chart_dir is given) and the seconds taken by each stage.
+
+    The statistics, fits and charts are computed on jobs worker processes (one per CPU if
+    jobs is None), or in this process if jobs == 1.
+    Preconditions:
+        - os.path.isdir(directory)
+        - jobs is None or jobs > 0
+        - chart_format in FORMATS
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    ind_filenames, dep_filename = discover(directory, target)
+    timings['discover'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        pd_with_pandas.load_files(ind_filenames + [dep_filename], dep_filename=dep_filename)
+    except Exception:  # pylint: disable=broad-except
+        pass  # each file that cannot be read is reported with its own error below
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    arguments = [(ind_filename, dep_filename) for ind_filename in ind_filenames]
+    if jobs == 1:
+        statistics = [_factor_statistics_star(argument) for argument in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            statistics = list(executor.map(_factor_statistics_star, arguments))
+    timings['statistics'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fits = fit_batch(arguments, tuple(MODEL_FUNCTIONS), jobs=jobs)
+    timings['fits'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    regression_result = regression([row['ind_filename'] for row in statistics
+                                    if row['error'] is None], dep_filename)
+    timings['regression'] = time.perf_counter() - start
+
+    charts = []
+    if chart_dir is not None:
+        start = time.perf_counter()
+        succeeded = fits[fits['error'].isna()]
+        jobs_to_render = list(zip(succeeded['ind_filename'], succeeded['dep_filename'],
+                                  succeeded['model']))
+        charts = export_charts(jobs_to_render, chart_dir, chart_format, workers=jobs)
+        timings['charts'] = time.perf_counter() - start
+
+    return {'directory': os.path.abspath(directory), 'target': dep_filename,
+            'factors': ind_filenames, 'statistics': statistics,
+            'fits': fits.to_dict(orient='records'), 'regression': regression_result,
+            'charts': charts, 'timings': timings}
+
+
+def report_table(report: Dict[str, Any]) -> pd.DataFrame:
+    """Return the report as a table with one row per factor and model, holding the fit
+    results of the model followed by the statistics of the factor.
+    """
+    fits = pd.DataFrame(report['fits'])
+    statistics = pd.DataFrame(report['statistics']).rename(columns={'error': 'stats_error'})
+    return fits.merge(statistics, on='ind_filename', how='left')
+
+
+def write_report(report: Dict[str, Any], out_dir: str, formats: List[str]) -> List[str]:
+    """Write the report to report.json and/or report.csv in out_dir, and return the paths
+    written.
+    Preconditions:
+        - all(fmt in ('json', 'csv') for fmt in formats)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    if 'json' in formats:
+        paths.append(os.path.join(out_dir, 'report.json'))
+        with open(paths[-1], 'w') as file:
+            json.dump(_jsonable(report), file, indent=2)
+    if 'csv' in formats:
+        paths.append(os.path.join(out_dir, 'report.csv'))
+        report_table(report).to_csv(paths[-1], index=False)
+    return paths
+
+
+def main() -> None:
+    """Parse the command line, analyse the directory and write the report."""
+    parser = argparse.ArgumentParser(description='Analyse every dataset in a directory.')
+    parser.add_argument('directory', help='directory holding the factor and target files')
+    parser.add_argument('--target', default=DEFAULT_TARGET,
+                        help='part of the name of the target file (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='worker processes (default: one per CPU; 1 runs in-process)')
+    parser.add_argument('--out', default='report', help='directory to write the report to')
+    parser.add_argument('--format', choices=['json', 'csv', 'both'], default='both')
+    parser.add_argument('--charts', action='store_true',
+                        help='also render the chart of every fit into OUT/charts')
+    parser.add_argument('--chart-format', choices=FORMATS, default='png')
+    args = parser.parse_args()
+
+    chart_dir = os.path.join(args.out, 'charts') if args.charts else None
+    report = analyse(args.directory, args.target, args.jobs, chart_dir, args.chart_format)
+    formats = ['json', 'csv'] if args.format == 'both' else [args.format]
+    for path in write_report(report, args.out, formats):
+        print('Wrote ' + path)
+    for stage, seconds in report['timings'].items():
+        print(f'{stage:<12}{seconds:>10.3f} s')
+
+
+if __name__ == '__main__':
+    main()
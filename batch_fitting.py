@@ -0,0 +1,128 @@
+"""
+Contains functions for fitting many (dataset pair, model) combinations at once.
+
+The fits are split into chunks of work that run on a pool of worker processes. Each chunk
+holds fits of the same dataset pair where possible, so a worker parses each file once and
+answers the rest of its chunk from its dataset cache. A failing fit (e.g. curve_fit not
+converging) is recorded in its row of the results instead of stopping the batch.
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from curve_fitting import MODEL_FUNCTIONS, fit_model
+from lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    import pandas
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# A single fit: its position in the results, the independent and dependent filenames and
+# the model name
+FitTask = Tuple[int, str, str, str]
+
+RESULT_COLUMNS = ['ind_filename', 'dep_filename', 'model', 'parameters', 'parameter_errors',
+                  'rmse', 'mae', 'max_error', 'fit_seconds', 'task_seconds', 'error']
+
+
+def make_tasks(pairs: Iterable[Tuple[str, str]], models: Iterable[str]) -> List[FitTask]:
+    """Return one task for every model in models for every (ind_filename, dep_filename) pair
+    in pairs, numbered in that order.
+    Preconditions:
+        - all(model in MODEL_FUNCTIONS for model in models)
+    """
+    models = list(models)
+    tasks = []
+    for ind_filename, dep_filename in pairs:
+        for model in models:
+            tasks.append((len(tasks), ind_filename, dep_filename, model))
+    return tasks
+
+
+def chunk_tasks(tasks: List[FitTask], chunk_size: int) -> List[List[FitTask]]:
+    """Split tasks into consecutive chunks of at most chunk_size tasks.
+    Preconditions:
+        - chunk_size > 0
+    """
+    return [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+
+def run_task(task: FitTask) -> Dict[str, Any]:
+    """Run a single fit and return its row of results. Any exception raised by the fit is
+    recorded in the 'error' column rather than propagated.
+    """
+    _, ind_filename, dep_filename, model = task
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update(ind_filename=ind_filename, dep_filename=dep_filename, model=model)
+
+    start = time.perf_counter()
+    try:
+        fit = fit_model(ind_filename, dep_filename, model)
+    except Exception as error:  # pylint: disable=broad-except
+        row['error'] = type(error).__name__ + ': ' + str(error)
+    else:
+        row.update(parameters=tuple(fit.parameters.tolist()),
+                   parameter_errors=tuple(np.sqrt(np.diag(fit.covariance)).tolist()),
+                   rmse=fit.residuals.rmse, mae=fit.residuals.mae,
+                   max_error=fit.residuals.max_error, fit_seconds=fit.fit_seconds)
+    row['task_seconds'] = time.perf_counter() - start
+    return row
+
+
+def run_chunk(chunk: List[FitTask]) -> List[Tuple[int, Dict[str, Any]]]:
+    """Run every task in chunk and return each result row together with its task number."""
+    return [(task[0], run_task(task)) for task in chunk]
+
+
+def fit_batch(pairs: Iterable[Tuple[str, str]], models: Iterable[str] = tuple(MODEL_FUNCTIONS),
+              jobs: Optional[int] = None, chunk_size: int = 4) -> pandas.DataFrame:
+    """Fit every model in models to every (ind_filename, dep_filename) pair in pairs, and
+    return a table with one row per fit, in the order the pairs and models were given.
+
+    The fits run on a pool of jobs worker processes (one per CPU if jobs is None), or in this
+    process if jobs == 1. Rows of fits that raised an error have the error message in the
+    'error' column and no parameters.
+    Preconditions:
+        - all(model in MODEL_FUNCTIONS for model in models)
+        - jobs is None or jobs > 0
+        - chunk_size > 0
+    """
+    tasks = make_tasks(pairs, models)
+    chunks = chunk_tasks(tasks, chunk_size)
+
+    if jobs == 1:
+        chunk_results = [run_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunk_results = list(executor.map(run_chunk, chunks))
+
+    rows = sorted((result for results in chunk_results for result in results),
+                  key=lambda result: result[0])
+    return pd.DataFrame([row for _, row in rows], columns=RESULT_COLUMNS)
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'time', 'concurrent.futures',
+                          'curve_fitting', 'lazy_imports'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
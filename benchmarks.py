@@ -0,0 +1,501 @@
+"""
+Contains benchmarks for the data processing pipeline.
+
+Run this file directly to print the results, e.g.
+    python benchmarks.py extraction --rows 1000000
+    python benchmarks.py suite --sizes 1000 100000 --output after.json --baseline before.json
+    python benchmarks.py memory --points 1000000
+
+The suite times reading, extraction, the statistics, every curve model, multiple linear
+regression and rendering a chart to a file on synthetic climate-like series, and records the
+peak memory of each benchmark.
+Its results are saved as JSON so that runs on different commits can be compared; a benchmark
+that became slower than its baseline by more than the threshold is reported as a regression.
+
+The memory benchmark compares the memory held per point by the loaded values as lists of
+Python floats, float64 arrays and float32 arrays, and the peak memory of the statistics on
+each.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import decimation
+import plotting_data_with_pandas as pd_with_pandas
+import stats_analysis
+from curve_fitting import MODEL_FUNCTIONS, fit_arrays
+from dataset_cache import DATASET_CACHE
+from figure_export import render_fit
+
+DEFAULT_SIZES = [10 ** 3, 10 ** 4, 10 ** 5]
+
+# A benchmark is regressed if it takes more than this many times as long as its baseline
+DEFAULT_THRESHOLD = 1.25
+
+# Timings shorter than this, in seconds, are too noisy to be reported as regressions
+DEFAULT_MIN_SECONDS = 1e-3
+
+# The functions of stats_analysis taking a single list of values
+SINGLE_SERIES_STATS = ['mean', 'median', 'mode', 'sample_standard_deviation', 'variance']
+
+# The functions of stats_analysis taking a list of x values and a list of y values
+PAIRED_STATS = ['correlation', 'slope_of_best_fit', 'y_intercept_of_best_fit',
+                'best_fit_regression_equation', 'r_squared']
+
+
+@dataclass
+class Measurement:
+    """The cost of one benchmark.
+
+    Instance Attributes:
+        - seconds: the fastest wall-clock time of the benchmark, in seconds
+        - peak_bytes: the peak memory allocated while running the benchmark once, in bytes
+        - error: the error raised by the benchmark, or None if it ran successfully
+    """
+    seconds: Optional[float]
+    peak_bytes: Optional[int]
+    error: Optional[str] = None
+
+
+def best_time(function: Callable[[], object], repeat: int = 3) -> float:
+    """Return the fastest of repeat wall-clock timings of calling function, in seconds.
+    Preconditions:
+        - repeat > 0
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_memory(function: Callable[[], object]) -> int:
+    """Return the peak memory, in bytes, allocated by Python and numpy while calling function.
+
+    tracemalloc slows down allocation heavily, so this is measured in a separate call from
+    the timings.
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(function: Callable[[], object], repeat: int = 3,
+            setup: Optional[Callable[[], object]] = None) -> Measurement:
+    """Return the fastest of repeat timings of function and its peak memory. If setup is
+    given, it is called before every call of function, outside the timings. Any exception
+    raised by function is recorded in the measurement rather than propagated.
+    Preconditions:
+        - repeat > 0
+    """
+    timings = []
+    try:
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        if setup is not None:
+            setup()
+        peak = peak_memory(function)
+    except Exception as error:  # pylint: disable=broad-except
+        return Measurement(None, None, type(error).__name__ + ': ' + str(error))
+    return Measurement(min(timings), peak)
+
+
+def retained_memory(function: Callable[[], object]) -> int:
+    """Return the memory, in bytes, allocated by Python and numpy while calling function that
+    is still held by the value it returns.
+    """
+    tracemalloc.start()
+    try:
+        result = function()
+        retained = tracemalloc.get_traced_memory()[0]
+        del result
+        return retained
+    finally:
+        tracemalloc.stop()
+
+
+def footprint(values: Any) -> int:
+    """Return the bytes held by values: the buffer of an array, or a list and every float
+    object in it.
+    """
+    if isinstance(values, np.ndarray):
+        return values.nbytes
+    return sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+
+
+def synthetic_climate_series(points: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Return synthetic series shaped like the climate datasets, each with the given number of
+    points: rising CO2 levels, temperatures and sea levels, and falling glacier mass balance,
+    each a smooth trend plus noise.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, points)
+    return {
+        'Year': np.linspace(1880.0, 2020.0, points),
+        'CO2': 315.0 + 100.0 * t ** 1.5 + rng.normal(0.0, 0.5, points),
+        'Temperature': -0.3 + 1.2 * t ** 2 + rng.normal(0.0, 0.1, points),
+        'Glacier Mass Balance': -30.0 * t ** 1.2 + rng.normal(0.0, 0.5, points),
+        'Sea Level': -40.0 + 130.0 * t ** 1.3 + rng.normal(0.0, 2.0, points),
+    }
+
+
+def write_synthetic_files(points: int, directory: str, seed: int = 0) -> Dict[str, str]:
+    """Write csv files laid out like the climate datasets, with the given number of points,
+    into directory, and return the path of each file by the name of its series.
+
+    The CO2 file has a year column and twelve monthly columns in reverse year order, and the
+    sea level file holds its values in the column at index 4, as the pipeline expects.
+    """
+    series = synthetic_climate_series(points, seed)
+    months = np.arange(1, 13)
+    seasonal = 3.0 * np.sin(2.0 * np.pi * months / 12.0)
+    co2_monthly = (series['CO2'][:, np.newaxis] + seasonal)[::-1]
+    co2 = pd.DataFrame(co2_monthly, columns=['Month ' + str(month) for month in months])
+    co2.insert(0, 'Year', series['Year'][::-1])
+
+    frames = {
+        'CO2': ('CO2_Levels.csv', co2),
+        'Temperature': ('Mean_Global_Temperatures.csv',
+                        pd.DataFrame({'Year': series['Year'],
+                                      'Mean': series['Temperature']})),
+        'Glacier Mass Balance': ('Mean_Cumulative_Mass_Balance_of_Glaciers.csv',
+                                 pd.DataFrame({'Year': series['Year'],
+                                               'Mean': series['Glacier Mass Balance']})),
+        'Sea Level': ('Sea_Level.csv',
+                      pd.DataFrame({'Year': series['Year'],
+                                    'Observations': series['Sea Level'],
+                                    'Uncertainty': np.ones(points),
+                                    'Smoothed': series['Sea Level'],
+                                    'Global Mean Sea Levels': series['Sea Level']})),
+    }
+    paths = {}
+    for name, (filename, frame) in frames.items():
+        paths[name] = os.path.join(directory, filename)
+        frame.to_csv(paths[name], index=False)
+    return paths
+
+
+def _stats_arguments(name: str, x_values: List[float], y_values: List[float]) -> Tuple:
+    """Return the arguments the stats_analysis function called name is benchmarked with."""
+    if name in SINGLE_SERIES_STATS:
+        return (y_values,)
+    elif name == 'interpolation':
+        return ((min(x_values) + max(x_values)) / 2, x_values, y_values)
+    elif name == 'extrapolation':
+        return (500, 600, x_values, y_values)
+    elif name == 'root_mean_squared_error':
+        return (400, 500, x_values, y_values)
+    return (x_values, y_values)
+
+
+def benchmark_size(points: int, directory: str, repeat: int = 3) -> Dict[str, Measurement]:
+    """Return the measurement of every benchmark of the suite on synthetic datasets with the
+    given number of points, whose files are written into directory.
+    Preconditions:
+        - points > 3
+        - repeat > 0
+    """
+    paths = write_synthetic_files(points, directory)
+    factors = [paths['CO2'], paths['Temperature'], paths['Glacier Mass Balance']]
+    dep_filename = paths['Sea Level']
+    results = {}
+
+    def cold() -> None:
+        """Drop the parsed files, so that they are read from disk again."""
+        DATASET_CACHE.invalidate()
+
+    results['filenames_to_lists'] = measure(
+        lambda: pd_with_pandas.filenames_to_lists(factors[0], dep_filename), repeat, cold)
+    results['filenames_to_lists[cached]'] = measure(
+        lambda: pd_with_pandas.filenames_to_lists(factors[0], dep_filename), repeat)
+    results['filenames_to_arrays[cached]'] = measure(
+        lambda: pd_with_pandas.filenames_to_arrays(factors[0], dep_filename), repeat)
+    results['create_data_frame'] = measure(
+        lambda: pd_with_pandas.create_data_frame(factors[0], dep_filename), repeat, cold)
+
+    x_values, y_values = pd_with_pandas.filenames_to_lists(factors[0], dep_filename)
+    for name in SINGLE_SERIES_STATS + PAIRED_STATS + ['interpolation', 'extrapolation',
+                                                       'root_mean_squared_error']:
+        arguments = _stats_arguments(name, x_values, y_values)
+        function = getattr(stats_analysis, name)
+        results['stats.' + name] = measure(lambda f=function, a=arguments: f(*a), repeat)
+
+    x_array, y_array = np.asarray(x_values), np.asarray(y_values)
+    for model in MODEL_FUNCTIONS:
+        results['fit.' + model] = measure(lambda m=model: fit_arrays(x_array, y_array, m),
+                                          repeat)
+
+    dfs = pd_with_pandas.common_years([pd_with_pandas.create_data_frame(factor, dep_filename)
+                                       for factor in factors])
+    results['multiple_lin_reg'] = measure(lambda: stats_analysis.multiple_lin_reg(*dfs), repeat)
+
+    # draw the scatter plot and curve on an Agg canvas and save it, with the reductions of
+    # large datasets computed afresh each time
+    fit = fit_arrays(x_array, y_array, 'cubic')
+    chart_path = os.path.join(directory, 'chart.png')
+    results['render.data_with_curve'] = measure(
+        lambda: render_fit(fit, 'CO2 Levels', chart_path), repeat,
+        decimation.REDUCTION_CACHE.clear)
+
+    DATASET_CACHE.invalidate()
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    """Return the commit the working tree is checked out at, or None if it is unknown."""
+    try:
+        completed = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                   cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def run_suite(sizes: List[int], repeat: int = 3) -> Dict[str, Any]:
+    """Run the suite on synthetic datasets of each size in sizes, and return its results
+    together with a description of the run, ready to be saved as JSON.
+
+    Each result is keyed by the benchmark name and the number of points, e.g.
+    'fit.cubic@100000'.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for points in sizes:
+            for name, measurement in benchmark_size(points, directory, repeat).items():
+                results[name + '@' + str(points)] = asdict(measurement)
+    return {
+        'meta': {'commit': _git_commit(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 'python': platform.python_version(), 'numpy': np.__version__,
+                 'pandas': pd.__version__, 'machine': platform.machine(),
+                 'sizes': list(sizes), 'repeat': repeat},
+        'results': results,
+    }
+
+
+def save_results(results: Dict[str, Any], path: str) -> None:
+    """Save the results of run_suite to path as JSON."""
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """Return the results of run_suite saved to path."""
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = DEFAULT_THRESHOLD,
+                    min_seconds: float = DEFAULT_MIN_SECONDS) -> List[Tuple[str, float, float]]:
+    """Return the name, baseline time and current time of every benchmark in both baseline
+    and current that became more than threshold times slower. Benchmarks that now take less
+    than min_seconds, or that failed in either run, are not compared.
+    Preconditions:
+        - threshold >= 1.0
+    """
+    regressions = []
+    for name, measurement in sorted(current['results'].items()):
+        before = baseline['results'].get(name, {}).get('seconds')
+        after = measurement['seconds']
+        if before is None or after is None or after < min_seconds:
+            continue
+        if after > before * threshold:
+            regressions.append((name, before, after))
+    return regressions
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    """Return a table of the time and peak memory of every benchmark in results."""
+    lines = [f'{"benchmark":<40}{"seconds":>12}{"peak MiB":>12}']
+    for name, measurement in results['results'].items():
+        if measurement['error'] is not None:
+            lines.append(f'{name:<40}  failed: {measurement["error"]}')
+        else:
+            lines.append(f'{name:<40}{measurement["seconds"]:>12.6f}'
+                         f'{measurement["peak_bytes"] / 2 ** 20:>12.2f}')
+    return '\n'.join(lines)
+
+
+def synthetic_co2_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Return a DataFrame shaped like the CO2 workbook: a year column followed by twelve
+    monthly columns, with the given number of rows.
+    """
+    rng = np.random.default_rng(seed)
+    data = {'Year': np.arange(rows, dtype=float)}
+    for month in range(1, 13):
+        data['Month ' + str(month)] = 350.0 + rng.random(rows) * 50.0
+    return pd.DataFrame(data)
+
+
+def synthetic_sea_level_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Return a DataFrame shaped like the sea level file, with the sea level values in the
+    column at index 4 and the given number of rows.
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'Year': np.arange(rows, dtype=float),
+                         'Observations': rng.random(rows),
+                         'Uncertainty': rng.random(rows),
+                         'Smoothed': rng.random(rows),
+                         'Global Mean Sea Levels': rng.random(rows) * 3.0})
+
+
+def _row_loop_co2(df: pd.DataFrame) -> List[float]:
+    """Return the yearly CO2 averages computed with the row-by-row loop the pipeline used
+    before extraction was vectorized.
+    """
+    averages = []
+    for i in range(len(df)):
+        row = [df.iloc[i].iloc[x] for x in range(1, len(df.iloc[i]))]
+        averages.append(sum(row) / len(row))
+    averages.reverse()
+    return averages
+
+
+def _row_loop_column(df: pd.DataFrame, column: int) -> List[float]:
+    """Return the values of the column at index column, collected one row at a time as the
+    pipeline did before extraction was vectorized.
+    """
+    return [df.iloc[i].iloc[column] for i in range(len(df))]
+
+
+def benchmark_extraction(rows: int = 10 ** 6, loop_rows: int = 10 ** 4) -> Dict[str, float]:
+    """Return the time in seconds taken to extract the CO2 averages and the sea level column
+    from frames with the given number of rows, with the vectorized functions and with the old
+    row-by-row loops.
+
+    The row loops are timed on loop_rows rows and scaled up linearly, since running them on
+    millions of rows takes many minutes.
+    Preconditions:
+        - 0 < loop_rows <= rows
+    """
+    co2_df = synthetic_co2_frame(rows)
+    sea_level_df = synthetic_sea_level_frame(rows)
+    scale = rows / loop_rows
+
+    results = {
+        'co2_vectorized': best_time(lambda: pd_with_pandas.co2_processing_array(co2_df)),
+        'sea_level_vectorized':
+            best_time(lambda: pd_with_pandas.sea_level_data_array(sea_level_df)),
+        'co2_row_loop':
+            best_time(lambda: _row_loop_co2(co2_df.head(loop_rows)), repeat=1) * scale,
+        'sea_level_row_loop':
+            best_time(lambda: _row_loop_column(sea_level_df.head(loop_rows), 4),
+                      repeat=1) * scale,
+    }
+    results['co2_speedup'] = results['co2_row_loop'] / results['co2_vectorized']
+    results['sea_level_speedup'] = \
+        results['sea_level_row_loop'] / results['sea_level_vectorized']
+    return results
+
+
+def benchmark_memory(points: int = 10 ** 6) -> Dict[str, Dict[str, float]]:
+    """Return, for the values of a factor and the sea levels loaded as lists of Python floats,
+    as float64 arrays and as float32 arrays, the bytes per point they hold, the bytes per
+    point newly allocated to load them, and the time and peak memory of computing their line
+    of best fit statistics, on synthetic files with the given number of points.
+
+    The files are parsed before the measurements, so only the conversion from the parsed
+    DataFrames is measured; float64 arrays are views of the cached DataFrames, so loading
+    them allocates almost nothing.
+    Preconditions:
+        - points > 3
+    """
+    loaders = {
+        'list': lambda x, y: pd_with_pandas.filenames_to_lists(x, y),
+        'float64': lambda x, y: pd_with_pandas.filenames_to_arrays(x, y, np.float64),
+        'float32': lambda x, y: pd_with_pandas.filenames_to_arrays(x, y, np.float32),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_synthetic_files(points, directory)
+        factor, dep_filename = paths['Temperature'], paths['Sea Level']
+        pd_with_pandas.load_files([factor, dep_filename], dep_filename=dep_filename)
+        for name, loader in loaders.items():
+            allocated = retained_memory(lambda f=loader: f(factor, dep_filename))
+            x_values, y_values = loader(factor, dep_filename)
+            stats = measure(lambda x=x_values, y=y_values:
+                            stats_analysis.BivariateAccumulator(x, y).r_squared)
+            results[name] = {'bytes_per_point':
+                             (footprint(x_values) + footprint(y_values)) / (2 * points),
+                             'allocated_per_point': allocated / (2 * points),
+                             'stats_seconds': stats.seconds,
+                             'stats_peak_bytes_per_point': stats.peak_bytes / (2 * points)}
+        DATASET_CACHE.invalidate()
+    return results
+
+
+def main() -> None:
+    """Parse the command line and run the requested benchmark."""
+    parser = argparse.ArgumentParser(description='Benchmarks for the climate data pipeline.')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    extraction = subparsers.add_parser('extraction',
+                                       help='vectorized column extraction vs row loops')
+    extraction.add_argument('--rows', type=int, default=10 ** 6)
+    extraction.add_argument('--loop-rows', type=int, default=10 ** 4)
+
+    suite = subparsers.add_parser('suite', help='time and memory of the whole pipeline')
+    suite.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                       help='numbers of points to benchmark, e.g. 1000 10000000')
+    suite.add_argument('--repeat', type=int, default=3)
+    suite.add_argument('--output', help='save the results as JSON to this file')
+    suite.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    suite.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                       help='slowdown ratio above which a benchmark is a regression')
+    suite.add_argument('--min-seconds', type=float, default=DEFAULT_MIN_SECONDS,
+                       help='do not flag benchmarks faster than this')
+
+    memory = subparsers.add_parser('memory', help='memory per point of lists and arrays')
+    memory.add_argument('--points', type=int, default=10 ** 6)
+
+    args = parser.parse_args()
+    if args.benchmark == 'extraction':
+        results = benchmark_extraction(args.rows, args.loop_rows)
+        for name, value in results.items():
+            unit = 'x' if name.endswith('speedup') else ' s'
+            print(f'{name:<24}{value:>14.4f}{unit}')
+    elif args.benchmark == 'memory':
+        print(f'{"values":<10}{"bytes/point":>14}{"allocated/point":>18}{"stats s":>12}'
+              f'{"stats peak bytes/point":>26}')
+        for name, result in benchmark_memory(args.points).items():
+            print(f'{name:<10}{result["bytes_per_point"]:>14.2f}'
+                  f'{result["allocated_per_point"]:>18.2f}'
+                  f'{result["stats_seconds"]:>12.6f}'
+                  f'{result["stats_peak_bytes_per_point"]:>26.2f}')
+    elif args.benchmark == 'suite':
+        results = run_suite(args.sizes, args.repeat)
+        print(format_results(results))
+        if args.output:
+            save_results(results, args.output)
+        if args.baseline:
+            regressions = compare_results(load_results(args.baseline), results,
+                                          args.threshold, args.min_seconds)
+            for name, before, after in regressions:
+                print(f'REGRESSION {name}: {before:.6f} s -> {after:.6f} s '
+                      f'({after / before:.2f}x)')
+            if regressions:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+Contains a bootstrap engine for the uncertainty of the curve fits and the linear statistics.
+
+Each resample draws the observations with replacement, which is represented by the number of
+times each observation is drawn. For the models that are linear in their parameters (the
+polynomials) and for the linear statistics, every resample is then a weighted sum over the
+same data, so all resamples are solved together as batched matrix operations. The exponential
+model needs scipy's iterative curve_fit for every resample, so its resamples are split into
+fixed-size chunks spread across a pool of worker processes. Each chunk has its own child of
+one numpy SeedSequence, so the result for a given seed does not depend on the number of
+workers.
+"""
+from __future__ import annotations
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from curve_fitting import MODEL_FUNCTIONS, POLYNOMIAL_DEGREES, FitResult, fit_arrays, fit_model
+from lazy_imports import lazy_import
+from polynomial_fitting import scaled_vandermonde, scaling, unscaling_matrix
+
+if TYPE_CHECKING:
+    import numpy
+
+np = lazy_import('numpy')
+optimize = lazy_import('scipy.optimize')
+
+DEFAULT_RESAMPLES = 1000
+
+# Number of nonlinear resamples fitted by each task sent to a worker process
+NONLINEAR_CHUNK = 50
+
+# The statistics estimated by bootstrap_linear_stats
+LINEAR_STATS = ('slope', 'intercept', 'correlation', 'r_squared')
+
+
+@dataclass
+class BootstrapResult:
+    """The bootstrap distribution of the parameters of a fitted model.
+
+    Instance Attributes:
+        - model: the name of the model function, a key of MODEL_FUNCTIONS
+        - parameters: the parameters fitted to the original data
+        - samples: the parameters fitted to each successful resample, one row per resample
+        - failures: the number of resamples whose fit did not converge
+        - residuals: the residuals of the fit to the original data
+        - seed: the seed the resamples were drawn with
+    """
+    model: str
+    parameters: numpy.ndarray
+    samples: numpy.ndarray
+    failures: int
+    residuals: numpy.ndarray
+    seed: Optional[int]
+
+    def confidence_intervals(self, level: float = 0.95) -> numpy.ndarray:
+        """Return the percentile confidence interval of each parameter at the given level, as
+        one (lower, upper) row per parameter.
+        Preconditions:
+            - 0.0 < level < 1.0
+        """
+        tail = (1.0 - level) / 2 * 100
+        return np.percentile(self.samples, [tail, 100 - tail], axis=0).T
+
+    def prediction_band(self, x_values: numpy.ndarray, level: float = 0.95,
+                        observations: bool = False) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Return the lower and upper edges of the band around the fitted curve at x_values
+        containing the given share of the resampled curves. If observations is True, a
+        residual of the original fit is added to every resampled curve, so the band covers
+        new observations rather than only the curve itself.
+        Preconditions:
+            - 0.0 < level < 1.0
+        """
+        x_array = np.asarray(x_values, dtype=float)
+        curves = MODEL_FUNCTIONS[self.model](x_array[np.newaxis, :],
+                                             *self.samples.T[:, :, np.newaxis])
+        if observations:
+            rng = np.random.default_rng(self.seed)
+            curves = curves + rng.choice(self.residuals, size=curves.shape)
+        tail = (1.0 - level) / 2 * 100
+        lower, upper = np.percentile(curves, [tail, 100 - tail], axis=0)
+        return lower, upper
+
+
+def resample_counts(points: int, resamples: int, rng: numpy.random.Generator) -> numpy.ndarray:
+    """Return how many times each of points observations is drawn in each of resamples
+    resamples with replacement, one row per resample.
+    """
+    return rng.multinomial(points, np.full(points, 1.0 / points), size=resamples)
+
+
+def polynomial_samples(x_values: numpy.ndarray, y_values: numpy.ndarray, degree: int,
+                       counts: numpy.ndarray) -> numpy.ndarray:
+    """Return the coefficients of x ** 0, ..., x ** degree of the least-squares polynomial of
+    every resample described by a row of counts, one row per resample.
+
+    Every resample is a weighted least-squares problem on the same scaled Vandermonde matrix
+    V, so its normal equations V^T W V b = V^T W y are built for all resamples with one
+    einsum and solved with one batched solve.
+    """
+    centre, half_width = scaling(x_values)
+    vandermonde = scaled_vandermonde(x_values, degree, centre, half_width)
+    weights = counts.astype(float)
+    gram = np.einsum('bn,ni,nj->bij', weights, vandermonde, vandermonde)
+    moments = (weights * y_values) @ vandermonde
+    with np.errstate(all='ignore'):
+        try:
+            scaled = np.linalg.solve(gram, moments[..., np.newaxis])[..., 0]
+        except np.linalg.LinAlgError:
+            # a resample with too few distinct x values; solve one at a time to find it
+            scaled = np.array([_solve_or_nan(g, m) for g, m in zip(gram, moments)])
+    return scaled @ unscaling_matrix(degree, centre, half_width).T
+
+
+def _solve_or_nan(matrix: numpy.ndarray, vector: numpy.ndarray) -> numpy.ndarray:
+    """Return the solution of matrix @ b = vector, or NaNs if matrix is singular."""
+    try:
+        return np.linalg.solve(matrix, vector)
+    except np.linalg.LinAlgError:
+        return np.full(vector.shape, np.nan)
+
+
+def _nonlinear_chunk(arguments: Tuple[str, numpy.ndarray, numpy.ndarray, numpy.ndarray, int,
+                                      numpy.random.SeedSequence]) -> numpy.ndarray:
+    """Fit the model to resamples drawn with the given seed sequence, starting from the
+    parameters fitted to the original data, and return one row of parameters per resample,
+    with NaNs for fits that did not converge. Used to send work to worker processes.
+    """
+    model, x_values, y_values, initial, resamples, seed_sequence = arguments
+    rng = np.random.default_rng(seed_sequence)
+    function = MODEL_FUNCTIONS[model]
+    samples = np.full((resamples, initial.size), np.nan)
+    with warnings.catch_warnings():
+        # resamples with repeated points often have no covariance estimate, which is unused
+        warnings.simplefilter('ignore', optimize.OptimizeWarning)
+        for i in range(resamples):
+            indices = rng.integers(0, x_values.size, x_values.size)
+            try:
+                samples[i], _ = optimize.curve_fit(function, x_values[indices],
+                                                   y_values[indices], p0=initial)
+            except (RuntimeError, ValueError):
+                continue
+    return samples
+
+
+def nonlinear_samples(fit: FitResult, resamples: int, seed_sequence: numpy.random.SeedSequence,
+                      workers: Optional[int] = None) -> numpy.ndarray:
+    """Return the parameters of the model of fit fitted to each of resamples resamples of the
+    data of fit, starting from the parameters of fit, one row per resample, with NaNs for fits
+    that did not converge. The resamples are fitted in chunks of NONLINEAR_CHUNK on a pool of
+    worker processes (one per CPU if workers is None), or in this process if workers == 1.
+    Preconditions:
+        - workers is None or workers > 0
+    """
+    sizes = [min(NONLINEAR_CHUNK, resamples - start)
+             for start in range(0, resamples, NONLINEAR_CHUNK)]
+    arguments = [(fit.model, fit.x_values, fit.y_values, fit.parameters, size, child)
+                 for size, child in zip(sizes, seed_sequence.spawn(len(sizes)))]
+    if workers == 1:
+        chunks = [_nonlinear_chunk(argument) for argument in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(_nonlinear_chunk, arguments))
+    return np.vstack(chunks) if chunks else np.empty((0, fit.parameters.size))
+
+
+def bootstrap_fit(x_values: numpy.ndarray, y_values: numpy.ndarray, model: str,
+                  resamples: int = DEFAULT_RESAMPLES, seed: Optional[int] = None,
+                  workers: Optional[int] = None) -> BootstrapResult:
+    """Return the bootstrap distribution of the parameters of the model function named model
+    fitted to x_values and y_values, from the given number of resamples drawn with seed.
+    Preconditions:
+        - model in MODEL_FUNCTIONS
+        - len(x_values) == len(y_values)
+        - resamples > 0
+    """
+    fit = fit_arrays(x_values, y_values, model)
+    seed_sequence = np.random.SeedSequence(seed)
+
+    if model in POLYNOMIAL_DEGREES:
+        degree = POLYNOMIAL_DEGREES[model]
+        counts = resample_counts(fit.x_values.size, resamples,
+                                 np.random.default_rng(seed_sequence))
+        coefficients = polynomial_samples(fit.x_values, fit.y_values, degree, counts)
+        # the model functions take the coefficients of x, x ** 2, ... first and the constant
+        samples = coefficients[:, list(range(1, degree + 1)) + [0]]
+    else:
+        samples = nonlinear_samples(fit, resamples, seed_sequence, workers)
+
+    converged = np.all(np.isfinite(samples), axis=1)
+    return BootstrapResult(model, fit.parameters, samples[converged],
+                           int(np.count_nonzero(~converged)), fit.residuals.residuals, seed)
+
+
+def bootstrap_model(ind_filename: str, dep_filename: str, model: str,
+                    resamples: int = DEFAULT_RESAMPLES, seed: Optional[int] = None,
+                    workers: Optional[int] = None) -> BootstrapResult:
+    """Return the bootstrap_fit of the model function named model to the independent and
+    dependent variables indicated by ind_filename and dep_filename respectively.
+    """
+    fit = fit_model(ind_filename, dep_filename, model)
+    return bootstrap_fit(fit.x_values, fit.y_values, model, resamples, seed, workers)
+
+
+def linear_stats_samples(x_values: numpy.ndarray, y_values: numpy.ndarray,
+                         counts: numpy.ndarray) -> Dict[str, numpy.ndarray]:
+    """Return the slope, intercept, correlation and R squared value of the line of best fit
+    of every resample described by a row of counts.
+
+    The weighted means and centred second moments of all resamples are found with a few
+    matrix products. The data are centred on their overall means first, which keeps the
+    moments free of cancellation.
+    """
+    x_centred = x_values - x_values.mean()
+    y_centred = y_values - y_values.mean()
+    weights = counts / counts.sum(axis=1, keepdims=True)
+    mean_x = weights @ x_centred
+    mean_y = weights @ y_centred
+    var_x = weights @ (x_centred ** 2) - mean_x ** 2
+    var_y = weights @ (y_centred ** 2) - mean_y ** 2
+    cov_xy = weights @ (x_centred * y_centred) - mean_x * mean_y
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = cov_xy / var_x
+        correlation = cov_xy / np.sqrt(var_x * var_y)
+    intercept = (mean_y + y_values.mean()) - slope * (mean_x + x_values.mean())
+    return {'slope': slope, 'intercept': intercept, 'correlation': correlation,
+            'r_squared': correlation ** 2}
+
+
+def bootstrap_linear_stats(x_values: List[float], y_values: List[float],
+                           resamples: int = DEFAULT_RESAMPLES, level: float = 0.95,
+                           seed: Optional[int] = None) -> Dict[str, Tuple[float, float]]:
+    """Return the percentile confidence interval at the given level of the slope, intercept,
+    correlation and R squared value computed by stats_analysis, as a (lower, upper) pair for
+    each statistic.
+    Preconditions:
+        - len(x_values) == len(y_values)
+        - len(x_values) > 2
+        - 0.0 < level < 1.0
+    """
+    x_array = np.asarray(x_values, dtype=float)
+    y_array = np.asarray(y_values, dtype=float)
+    counts = resample_counts(x_array.size, resamples, np.random.default_rng(seed))
+    samples = linear_stats_samples(x_array, y_array, counts)
+    tail = (1.0 - level) / 2 * 100
+    intervals = {}
+    for name in LINEAR_STATS:
+        lower, upper = np.nanpercentile(samples[name], [tail, 100 - tail])
+        intervals[name] = (float(lower), float(upper))
+    return intervals
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'warnings', 'concurrent.futures',
+                          'curve_fitting', 'lazy_imports', 'polynomial_fitting'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,332 @@
+"""
+Contains an on-disk columnar store for datasets too large to read into memory.
+
+A source csv or Excel file is ingested once into a directory holding one .npy file per numeric
+column and a manifest.json describing them. The columns are then opened as read-only memory
+maps, so slicing them reads only the pages that are touched and nothing is copied into Python
+lists. csv files are ingested chunk by chunk, so they never have to fit in memory either.
+
+The manifest records the modification time and size of the source file; open_store ingests
+the file again when it has changed. Statistics and polynomial fits over the columns are
+computed chunk by chunk with chunked_statistics and polynomial_fitting.fit_polynomial_chunks,
+which keeps resident memory bounded by the chunk size rather than the length of the data.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
+
+import time_alignment
+from dataset_cache import file_key
+from instrumentation import count, span
+from lazy_imports import lazy_import
+from plotting_data_with_pandas import is_co2_file
+from polynomial_fitting import iter_chunks
+from stats_analysis import BivariateAccumulator
+
+if TYPE_CHECKING:
+    import numpy
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Number of rows read from a csv file, or copied between files, at a time
+DEFAULT_CHUNK_ROWS = 2 ** 20
+
+# Name of the derived column holding the annual means of the CO2 workbook
+CO2_MEANS_COLUMN = 'co2_annual_means'
+
+
+def default_store_dir(source: str) -> str:
+    """Return the directory the columns of source are stored in by default, next to it."""
+    return os.path.abspath(source) + '.columns'
+
+
+def _column_filename(index: int) -> str:
+    """Return the name of the .npy file holding the column at index."""
+    return 'col_' + str(index) + '.npy'
+
+
+def _read_chunks(source: str, chunk_rows: int) -> Any:
+    """Return an iterable of the DataFrames making up source, chunk_rows rows at a time for
+    csv files. Excel files cannot be read incrementally, so they are read whole.
+    """
+    if '.csv' in source:
+        return pd.read_csv(source, chunksize=chunk_rows)
+    return [pd.read_excel(source)]
+
+
+def _copy_raw_to_npy(raw_path: str, npy_path: str, dtype: str, rows: int,
+                     chunk_rows: int) -> None:
+    """Copy rows values of dtype from the headerless file raw_path into a new .npy file at
+    npy_path, chunk_rows values at a time.
+    """
+    output = np.lib.format.open_memmap(npy_path, mode='w+', dtype=dtype, shape=(rows,))
+    if rows > 0:
+        raw = np.memmap(raw_path, dtype=dtype, mode='r', shape=(rows,))
+        for start in range(0, rows, chunk_rows):
+            output[start:start + chunk_rows] = raw[start:start + chunk_rows]
+        del raw
+    output.flush()
+    del output
+
+
+def ingest(source: str, store_dir: Optional[str] = None, dtype: str = 'float64',
+           chunk_rows: int = DEFAULT_CHUNK_ROWS) -> ColumnarStore:
+    """Convert the csv or Excel file source into a columnar store in store_dir (by default
+    default_store_dir(source)), replacing any store already there, and return it.
+
+    Every column is converted to dtype; values that are not numbers become NaN.
+    Preconditions:
+        - '.csv' in source or '.xlsx' in source
+        - chunk_rows > 0
+    """
+    store_dir = store_dir or default_store_dir(source)
+    os.makedirs(store_dir, exist_ok=True)
+    key = file_key(source)
+    manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)  # the store is incomplete until the manifest is rewritten
+
+    with span('ingest', 'read', file=source):
+        names = None
+        rows = 0
+        raw_files = []
+        try:
+            for chunk in _read_chunks(source, chunk_rows):
+                if names is None:
+                    names = [str(name) for name in chunk.columns]
+                    raw_files = [open(os.path.join(store_dir, _column_filename(i) + '.raw'),
+                                      'wb') for i in range(len(names))]
+                for raw_file, name in zip(raw_files, chunk.columns):
+                    values = pd.to_numeric(chunk[name], errors='coerce')
+                    raw_file.write(values.to_numpy(dtype=dtype).tobytes())
+                rows += len(chunk)
+                count('rows_ingested', len(chunk))
+        finally:
+            for raw_file in raw_files:
+                raw_file.close()
+
+        columns = []
+        for i, name in enumerate(names or []):
+            raw_path = os.path.join(store_dir, _column_filename(i) + '.raw')
+            _copy_raw_to_npy(raw_path, os.path.join(store_dir, _column_filename(i)), dtype, rows,
+                             chunk_rows)
+            os.remove(raw_path)
+            columns.append({'name': name, 'file': _column_filename(i), 'dtype': dtype})
+
+    manifest = {'version': MANIFEST_VERSION, 'source': key[0], 'source_mtime_ns': key[1],
+                'source_size': key[2], 'rows': rows, 'columns': columns, 'derived': {}}
+    _write_manifest(store_dir, manifest)
+    return ColumnarStore(store_dir)
+
+
+def _write_manifest(store_dir: str, manifest: Dict[str, Any]) -> None:
+    """Write manifest to the manifest file of store_dir, replacing it atomically."""
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    temp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temp_path, path)
+
+
+class ColumnarStore:
+    """The columns of an ingested dataset, opened as read-only memory maps.
+
+    Instance Attributes:
+        - store_dir: the directory holding the column files and manifest
+        - source: the absolute path of the file the store was ingested from
+        - rows: the number of rows in every column
+    """
+    # Private Instance Attributes:
+    #   - _manifest: the contents of the store's manifest file
+    #   - _maps: the memory maps opened so far, by file name
+    store_dir: str
+    source: str
+    rows: int
+    _manifest: Dict[str, Any]
+    _maps: Dict[str, numpy.ndarray]
+
+    def __init__(self, store_dir: str) -> None:
+        """Open the store in store_dir.
+        Preconditions:
+            - os.path.exists(os.path.join(store_dir, MANIFEST_NAME))
+        """
+        with open(os.path.join(store_dir, MANIFEST_NAME)) as file:
+            self._manifest = json.load(file)
+        if self._manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError('unsupported columnar store version in ' + store_dir)
+        self.store_dir = store_dir
+        self.source = self._manifest['source']
+        self.rows = self._manifest['rows']
+        self._maps = {}
+
+    @property
+    def columns(self) -> List[str]:
+        """The names of the ingested columns, in the order of the source file."""
+        return [column['name'] for column in self._manifest['columns']]
+
+    def __len__(self) -> int:
+        """Return the number of rows in the store."""
+        return self.rows
+
+    def is_stale(self) -> bool:
+        """Return whether the source file has changed, or disappeared, since it was ingested."""
+        if not os.path.exists(self.source):
+            return True
+        _, mtime_ns, size = file_key(self.source)
+        return (mtime_ns, size) != (self._manifest['source_mtime_ns'],
+                                    self._manifest['source_size'])
+
+    def column(self, column: Union[str, int]) -> numpy.ndarray:
+        """Return a read-only memory map of the column with the given name, or at the given
+        position.
+        """
+        if isinstance(column, int):
+            entry = self._manifest['columns'][column]
+        else:
+            matches = [entry for entry in self._manifest['columns'] if entry['name'] == column]
+            if not matches:
+                raise KeyError(column)
+            entry = matches[0]
+        return self._open(entry['file'])
+
+    def derived(self, name: str) -> Optional[numpy.ndarray]:
+        """Return a read-only memory map of the derived column called name, or None if it has
+        not been computed.
+        """
+        filename = self._manifest['derived'].get(name)
+        return None if filename is None else self._open(filename)
+
+    def derived_path(self, name: str) -> str:
+        """Return the path the .npy file of the derived column called name is written to."""
+        return os.path.join(self.store_dir, 'derived_' + name + '.npy')
+
+    def register_derived(self, name: str) -> numpy.ndarray:
+        """Record the .npy file written to derived_path(name) in the manifest as the derived
+        column called name, and return its memory map.
+        """
+        filename = os.path.basename(self.derived_path(name))
+        self._maps.pop(filename, None)
+        self._manifest['derived'][name] = filename
+        _write_manifest(self.store_dir, self._manifest)
+        return self._open(filename)
+
+    def _open(self, filename: str) -> numpy.ndarray:
+        """Return the memory map of the .npy file filename, opening it the first time."""
+        if filename not in self._maps:
+            self._maps[filename] = np.load(os.path.join(self.store_dir, filename),
+                                           mmap_mode='r')
+        return self._maps[filename]
+
+
+def open_store(source: str, store_dir: Optional[str] = None, dtype: str = 'float64',
+               chunk_rows: int = DEFAULT_CHUNK_ROWS) -> ColumnarStore:
+    """Return the columnar store of source, ingesting it first if it has no store yet or has
+    changed since its store was written.
+    Preconditions:
+        - '.csv' in source or '.xlsx' in source
+    """
+    store_dir = store_dir or default_store_dir(source)
+    if os.path.exists(os.path.join(store_dir, MANIFEST_NAME)):
+        store = ColumnarStore(store_dir)
+        if not store.is_stale():
+            return store
+    return ingest(source, store_dir, dtype, chunk_rows)
+
+
+def co2_annual_means(store: ColumnarStore,
+                     chunk_rows: int = DEFAULT_CHUNK_ROWS) -> numpy.ndarray:
+    """Return the memory map of the mean of every column after the first of each row of the
+    CO2 store, in row order, so that it is keyed by the years in the first column as
+    plotting_data_with_pandas.co2_annual_series is.
+    The means are computed chunk by chunk the first time and kept as a derived column.
+    """
+    means = store.derived(CO2_MEANS_COLUMN)
+    if means is not None:
+        return means
+
+    monthly = [store.column(i) for i in range(1, len(store.columns))]
+    output = np.lib.format.open_memmap(store.derived_path(CO2_MEANS_COLUMN), mode='w+',
+                                       dtype=monthly[0].dtype, shape=(store.rows,))
+    for start in range(0, store.rows, chunk_rows):
+        stop = min(start + chunk_rows, store.rows)
+        total = np.zeros(stop - start)
+        for column in monthly:
+            total += column[start:stop]
+        output[start:stop] = total / len(monthly)
+    output.flush()
+    del output
+    return store.register_derived(CO2_MEANS_COLUMN)
+
+
+def filenames_to_columns(ind_filename: str, dep_filename: str,
+                         chunk_rows: int = DEFAULT_CHUNK_ROWS) \
+        -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the independent and dependent values of the given files paired by year, as
+    plotting_data_with_pandas.filenames_to_arrays returns them: the annual means of the CO2
+    workbook or the column at index 1 of any other independent file, and the sea levels in
+    the column at index 4 of the dependent file, in increasing year order, leaving out years
+    either file has no value for. Each file is ingested into its default store the first time.
+
+    When both files hold the same years in increasing order with no missing values, as the
+    large files this store is meant for usually do, the values are returned as views of the
+    memory maps rather than copied.
+    Preconditions:
+        - ind_filename != ''
+        - dep_filename != ''
+    """
+    ind_store = open_store(ind_filename, chunk_rows=chunk_rows)
+    dep_store = open_store(dep_filename, chunk_rows=chunk_rows)
+    if is_co2_file(ind_filename):
+        ind_values = co2_annual_means(ind_store, chunk_rows)
+    else:
+        ind_values = ind_store.column(1)
+
+    with span('align', 'extract'):
+        series = [time_alignment.resample(keys, values) for keys, values in
+                  ((ind_store.column(0), ind_values), (dep_store.column(0), dep_store.column(4)))]
+        _, (ind_values, dep_values) = time_alignment.drop_missing(*time_alignment.align(*series))
+    return (ind_values, dep_values)
+
+
+def chunked_statistics(x_values: Sequence[float], y_values: Sequence[float],
+                       chunk_rows: int = DEFAULT_CHUNK_ROWS) -> BivariateAccumulator:
+    """Return the accumulated summary statistics of x_values and y_values, read chunk_rows
+    values at a time, from which the correlation, line of best fit and R squared value are
+    available without holding all of the data in memory.
+    Preconditions:
+        - len(x_values) == len(y_values)
+        - chunk_rows > 0
+    """
+    if len(x_values) != len(y_values):
+        raise ValueError('x_values and y_values must have the same length')
+    return BivariateAccumulator.from_chunks(iter_chunks(x_values, y_values, chunk_rows))
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': ['ingest', '_write_manifest', 'ColumnarStore.__init__'],
+        'extra-imports': ['python_ta.contracts', 'json', 'os', 'dataset_cache',
+                          'instrumentation', 'lazy_imports', 'plotting_data_with_pandas',
+                          'polynomial_fitting', 'stats_analysis', 'time_alignment'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
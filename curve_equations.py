@@ -1,9 +1,7 @@
 """
 Contains functions for producing equations of curves of best fit.
 """
-from scipy.optimize import curve_fit
-import plotting_data_with_pandas as pd_with_pandas
-from curve_fitting import linear_function, quadratic_function, cubic_function, exponential_function
+from curve_fitting import fit_model
 
 
 def linear_equation_of_best_fit(ind_filename: str, dep_filename: str) -> str:
@@ -13,10 +11,7 @@ def linear_equation_of_best_fit(ind_filename: str, dep_filename: str) -> str:
         - independent_name != ''
         - variables != ()
     """
-    lists = pd_with_pandas.filenames_to_lists(ind_filename, dep_filename)
-    ind_list, dep_list = lists[0], lists[1]
-
-    optimal_values, _ = curve_fit(linear_function, ind_list, dep_list)
+    optimal_values = fit_model(ind_filename, dep_filename, 'linear').parameters
 
     return 'y = ' + str(optimal_values[0]) + ' * x ' + '+ ' + str(optimal_values[1])
 
@@ -28,10 +23,7 @@ def quadratic_equation_of_best_fit(ind_filename: str, dep_filename: str) -> str:
         - independent_name != ''
         - variables != ()
     """
-    lists = pd_with_pandas.filenames_to_lists(ind_filename, dep_filename)
-    ind_list, dep_list = lists[0], lists[1]
-
-    optimal_values, _ = curve_fit(quadratic_function, ind_list, dep_list)
+    optimal_values = fit_model(ind_filename, dep_filename, 'quadratic').parameters
 
     return 'y = ' + str(optimal_values[1]) + ' * x ^ 2 ' + '+ ' + str(optimal_values[0]) \
            + ' * x ' + '+ ' + str(optimal_values[2])
@@ -44,10 +36,7 @@ def cubic_equation_of_best_fit(ind_filename: str, dep_filename: str) -> str:
         - independent_name != ''
         - variables != ()
     """
-    lists = pd_with_pandas.filenames_to_lists(ind_filename, dep_filename)
-    ind_list, dep_list = lists[0], lists[1]
-
-    optimal_values, _ = curve_fit(cubic_function, ind_list, dep_list)
+    optimal_values = fit_model(ind_filename, dep_filename, 'cubic').parameters
 
     return 'y = ' + str(optimal_values[2]) + ' * x^3 ' + ' + ' + str(optimal_values[1]) + \
            ' * x ^ 2' + ' + ' + str(optimal_values[0]) + ' * x ' + ' + ' + str(optimal_values[3])
@@ -60,10 +49,7 @@ def exponential_equation_of_best_fit(ind_filename: str, dep_filename: str) -> st
         - independent_name != ''
         - variables != ()
     """
-    lists = pd_with_pandas.filenames_to_lists(ind_filename, dep_filename)
-    ind_list, dep_list = lists[0], lists[1]
-
-    optimal_values, _ = curve_fit(exponential_function, ind_list, dep_list)
+    optimal_values = fit_model(ind_filename, dep_filename, 'exponential').parameters
 
     return 'y = ' + str(optimal_values[0]) + ' ^ x ' + ' + ' + str(optimal_values[1])
 
@@ -79,7 +65,6 @@ if __name__ == '__main__':
         'allowed-io': ['read_csv_data'],
         'extra-imports': ['python_ta.contracts', 'csv', 'datetime',
                           'plotly.graph_objects', 'plotly.subplots',
-                          'scipy.optimize', 'plotting_data_with_pandas',
                           'curve_fitting'],
         'max-line-length': 100,
         'max-args': 6,
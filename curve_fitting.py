@@ -1,10 +1,27 @@
 """Module for finding various curve fits for given datasets."""
-from typing import List, Tuple
-import matplotlib.pyplot as plt
-from mpl_toolkits.axisartist import Axes
+from __future__ import annotations
 
-from scipy.optimize import curve_fit
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import decimation
 import plotting_data_with_pandas as pd_with_pandas
+import stats_analysis
+from dataset_cache import FileKey, file_key
+from instrumentation import count, span
+from lazy_imports import lazy_import
+from polynomial_fitting import fit_polynomial
+from residual_analysis import ResidualSummary, residual_summary
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+    from mpl_toolkits.axisartist import Axes
+
+np = lazy_import('numpy')
+plt = lazy_import('matplotlib.pyplot')
+optimize = lazy_import('scipy.optimize')
 
 
 def linear_function(x: float, m: float, b: float) -> float:
@@ -34,81 +51,179 @@ def exponential_function(x: float, a: float, b: float) -> float:
     return a ** x + b
 
 
-def linear_curve_fitting_and_plotting(ind_filename: str, dep_filename: str) -> Axes:
-    """Graph a scatter plot and a linear curve of best fit of the independent and dependent
-    variables indicated by ind_filename and dep_filename respectively
-    Preconditions:
-        - ind_filename != ''
-        - dep_filename != ''
+# The model functions only use arithmetic operators, so they also accept an array of x values
+# and evaluate every element of it in one call
+MODEL_FUNCTIONS: Dict[str, Callable[..., float]] = {
+    'linear': linear_function,
+    'quadratic': quadratic_function,
+    'cubic': cubic_function,
+    'exponential': exponential_function,
+}
+
+# Number of points prediction_grid evaluates a fit at by default
+DEFAULT_GRID_POINTS = 200
+
+# Degrees of the models that are polynomials, and so linear in their parameters
+POLYNOMIAL_DEGREES: Dict[str, int] = {'linear': 1, 'quadratic': 2, 'cubic': 3}
+
+
+@dataclass
+class FitResult:
+    """The result of fitting one of the model functions to a dataset.
+
+    Instance Attributes:
+        - model: the name of the model function, a key of MODEL_FUNCTIONS
+        - parameters: the optimal values of the model's parameters, in the order the model
+            function takes them
+        - covariance: the estimated covariance of parameters
+        - x_values: the independent values the model was fitted to
+        - y_values: the dependent values the model was fitted to
+        - residuals: the paired residuals of the fitted model and their error measures
+        - fit_seconds: the time taken to fit the model, in seconds
     """
-    independent_name = pd_with_pandas.get_name(ind_filename)  # title for the x-axis
-    lists = pd_with_pandas.filenames_to_lists(ind_filename, dep_filename)
-    ind_list, dep_list = lists[0], lists[1]
+    model: str
+    parameters: np.ndarray
+    covariance: np.ndarray
+    x_values: np.ndarray
+    y_values: np.ndarray
+    residuals: ResidualSummary
+    fit_seconds: float
 
-    n = len(ind_list)
-    y_values = []
-    variables = curve_fit(linear_function, ind_list, dep_list)
-    for i in range(n):
-        y_value = linear_function(ind_list[i], variables[0][0], variables[0][1])
-        y_values.append(y_value)
+    def predict(self, x_values: np.ndarray) -> np.ndarray:
+        """Return the values of the fitted model at x_values."""
+        return MODEL_FUNCTIONS[self.model](np.asarray(x_values, dtype=float), *self.parameters)
 
-    variables = (ind_list, dep_list, y_values)
 
-    ax = plotting_data_with_curve(independent_name, variables)
+def fit_arrays(x_values: np.ndarray, y_values: np.ndarray, model: str) -> FitResult:
+    """Return the result of fitting the model function named model to x_values and y_values.
 
-    return ax
+    float32 and float64 arrays are kept in the result as they are, like the arrays of
+    stats_analysis. The solvers need double precision, so float32 values are upcast to a
+    temporary float64 copy for the fit itself.
+    Preconditions:
+        - model in MODEL_FUNCTIONS
+        - len(x_values) == len(y_values)
+    """
+    x_array = stats_analysis.float_array(x_values)
+    y_array = stats_analysis.float_array(y_values)
+    function = MODEL_FUNCTIONS[model]
+
+    start = time.perf_counter()
+    with span('fit.' + model, 'fit', points=x_array.size):
+        x_fit, y_fit = x_array.astype(float, copy=False), y_array.astype(float, copy=False)
+        if model in POLYNOMIAL_DEGREES:
+            parameters, covariance = _fit_polynomial_model(x_fit, y_fit,
+                                                           POLYNOMIAL_DEGREES[model])
+        else:
+            parameters, covariance = optimize.curve_fit(function, x_fit, y_fit)
+    fit_seconds = time.perf_counter() - start
+    count('fits')
+    count('points_fitted', x_array.size)
+
+    residuals = residual_summary(lambda x: function(x, *parameters), x_array, y_array)
+    return FitResult(model, parameters, covariance, x_array, y_array, residuals, fit_seconds)
+
+
+def _fit_polynomial_model(x_values: np.ndarray, y_values: np.ndarray,
+                          degree: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the parameters and their covariance of the polynomial model of the given degree,
+    solved directly by least squares, in the order the model function takes them.
+    """
+    polynomial = fit_polynomial(x_values, y_values, degree)
+    # the model functions take the coefficients of x, x ** 2, ... first and the constant last
+    order = list(range(1, degree + 1)) + [0]
+    return (polynomial.coefficients[order],
+            polynomial.covariance[np.ix_(order, order)])
 
 
-def quadratic_curve_fitting_and_plotting(ind_filename: str, dep_filename: str) -> Axes:
-    """Graph a scatter plot and a quadratic curve of best fit of the independent and dependent
-    variables indicated by ind_filename and dep_filename respectively
+def fit_model(ind_filename: str, dep_filename: str, model: str) -> FitResult:
+    """Return the result of fitting the model function named model to the independent and
+    dependent variables indicated by ind_filename and dep_filename respectively.
+
+    Results are memoized by the identity (path, modification time and size) of both files and
+    the model name, so plotting a fit and writing out its equation share one curve_fit call,
+    and the fit is redone automatically if either file changes.
     Preconditions:
         - ind_filename != ''
         - dep_filename != ''
+        - model in MODEL_FUNCTIONS
     """
-    independent_name = pd_with_pandas.get_name(ind_filename)  # title for the x-axis
-    lists = pd_with_pandas.filenames_to_lists(ind_filename, dep_filename)
-    ind_list, dep_list = lists[0], lists[1]
+    return _fit_dataset(ind_filename, dep_filename, file_key(ind_filename),
+                        file_key(dep_filename), model)
 
-    n = len(ind_list)
-    y_values = []
-    variables = curve_fit(quadratic_function, ind_list, dep_list)
-    for i in range(n):
-        y_value = quadratic_function(ind_list[i], variables[0][0], variables[0][1], variables[0][2])
-        y_values.append(y_value)
 
-    variables = (ind_list, dep_list, y_values)
+@lru_cache(maxsize=128)
+def _fit_dataset(ind_filename: str, dep_filename: str, _ind_key: FileKey, _dep_key: FileKey,
+                 model: str) -> FitResult:
+    """Return the fit computed by fit_model. The file keys are only used as part of the
+    memoization key.
+    """
+    ind_values, dep_values = pd_with_pandas.filenames_to_arrays(ind_filename, dep_filename)
+    return fit_arrays(ind_values, dep_values, model)
 
-    ax = plotting_data_with_curve(independent_name, variables)
 
-    return ax
+def clear_fit_cache() -> None:
+    """Forget every memoized result of fit_model."""
+    _fit_dataset.cache_clear()
 
 
-def cubic_curve_fitting_and_plotting(ind_filename: str, dep_filename: str) -> Axes:
-    """Graph a scatter plot and a cubic curve of best fit of the independent and dependent
+def prediction_grid(fit: FitResult, x_values: Optional[np.ndarray] = None,
+                    num: int = DEFAULT_GRID_POINTS, start: Optional[float] = None,
+                    stop: Optional[float] = None,
+                    chunk_size: int = 2 ** 20) -> Tuple[np.ndarray, np.ndarray]:
+    """Return a grid of x values and the values of the fitted model at them.
+
+    The grid is x_values if they are given, and otherwise num evenly spaced points from start
+    to stop, which default to the smallest and largest x values the model was fitted to. The
+    model is evaluated on whole arrays of chunk_size points at a time, so grids of millions of
+    points are evaluated without any per-point Python overhead while temporaries stay small.
+    Preconditions:
+        - num > 1
+        - chunk_size > 0
+    """
+    if x_values is None:
+        start = float(fit.x_values.min()) if start is None else start
+        stop = float(fit.x_values.max()) if stop is None else stop
+        grid = np.linspace(start, stop, num)
+    else:
+        grid = np.asarray(x_values, dtype=float)
+
+    flat_grid = grid.reshape(-1)
+    predictions = np.empty(flat_grid.shape)
+    for chunk_start in range(0, flat_grid.size, chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        predictions[chunk] = fit.predict(flat_grid[chunk])
+    return grid, predictions.reshape(grid.shape)
+
+
+def linear_curve_fitting_and_plotting(ind_filename: str, dep_filename: str) -> Axes:
+    """Graph a scatter plot and a linear curve of best fit of the independent and dependent
     variables indicated by ind_filename and dep_filename respectively
     Preconditions:
         - ind_filename != ''
         - dep_filename != ''
     """
-    independent_name = pd_with_pandas.get_name(ind_filename)  # title for the x-axis
-    lists = pd_with_pandas.filenames_to_lists(ind_filename, dep_filename)
-    ind_list, dep_list = lists[0], lists[1]
-
-    n = len(ind_list)
-    y_values = []
-    variables = curve_fit(cubic_function, ind_list, dep_list)
+    return _fit_and_plot(ind_filename, dep_filename, 'linear')
 
-    for i in range(n):
-        y_value = cubic_function(ind_list[i], variables[0][0], variables[0][1], variables[0][2],
-                                 variables[0][3])
-        y_values.append(y_value)
 
-    variables = (ind_list, dep_list, y_values)
+def quadratic_curve_fitting_and_plotting(ind_filename: str, dep_filename: str) -> Axes:
+    """Graph a scatter plot and a quadratic curve of best fit of the independent and dependent
+    variables indicated by ind_filename and dep_filename respectively
+    Preconditions:
+        - ind_filename != ''
+        - dep_filename != ''
+    """
+    return _fit_and_plot(ind_filename, dep_filename, 'quadratic')
 
-    ax = plotting_data_with_curve(independent_name, variables)
 
-    return ax
+def cubic_curve_fitting_and_plotting(ind_filename: str, dep_filename: str) -> Axes:
+    """Graph a scatter plot and a cubic curve of best fit of the independent and dependent
+    variables indicated by ind_filename and dep_filename respectively
+    Preconditions:
+        - ind_filename != ''
+        - dep_filename != ''
+    """
+    return _fit_and_plot(ind_filename, dep_filename, 'cubic')
 
 
 def exponential_curve_fitting_and_plotting(ind_filename: str, dep_filename: str) -> Axes:
@@ -118,42 +233,63 @@ def exponential_curve_fitting_and_plotting(ind_filename: str, dep_filename: str)
         - ind_filename != ''
         - dep_filename != ''
     """
-    independent_name = pd_with_pandas.get_name(ind_filename)  # title for the x-axis
-    lists = pd_with_pandas.filenames_to_lists(ind_filename, dep_filename)
-    ind_list, dep_list = lists[0], lists[1]
+    return _fit_and_plot(ind_filename, dep_filename, 'exponential')
 
-    n = len(ind_list)
-    y_values = []
-    variables = curve_fit(exponential_function, ind_list, dep_list)
-    for i in range(n):
-        y_value = exponential_function(ind_list[i], variables[0][0], variables[0][1])
-        y_values.append(y_value)
 
-    variables = (ind_list, dep_list, y_values)
+def _fit_and_plot(ind_filename: str, dep_filename: str, model: str) -> Axes:
+    """Graph a scatter plot and the curve of best fit of the model function named model for
+    the independent and dependent variables indicated by ind_filename and dep_filename.
+    """
+    independent_name = pd_with_pandas.get_name(ind_filename)  # title for the x-axis
+    fit = fit_model(ind_filename, dep_filename, model)
+
+    variables = (fit.x_values, fit.y_values, fit.predict(fit.x_values))
+    ax = plotting_data_with_curve(independent_name, variables, curve=prediction_grid(fit))
 
-    ax = plotting_data_with_curve(independent_name, variables)
     return ax
 
 
-def plotting_data_with_curve(independent_name: str, variables: Tuple[List, List, List]) -> Axes:
-    """Plot the data in a scatter plot together with the curve of best fit
+def plotting_data_with_curve(independent_name: str, variables: Tuple[List, List, List],
+                             curve: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Axes:
+    """Plot the data in a scatter plot together with the curve of best fit on a new pyplot
+    figure, and return its axes. The curve is drawn through the (x, y) arrays in curve if
+    given, and otherwise through the fitted values in variables[2] at the observed x values.
+    The figure is not shown, so scripts and headless callers are not blocked; call
+    plt.show() to open it.
     Preconditions:
         - independent_name != ''
         - variables != ()
     """
     fig, ax = plt.subplots()
-    plt.scatter(variables[0], variables[1])  # line connecting dots with matplotlib
-    plt.plot(variables[0], variables[2], '--', color='red')
-    plt.show()
-    # creating title and axes titles
-    plt.figtext(.5, .9, independent_name + ' Against Global Mean Sea Level Changes from '
-                '1993 to 2014', fontsize=7.5, ha='center')
-    plt.xlabel(independent_name)
-    plt.ylabel('Global Mean Sea Level Change (inches)')
+    draw_data_with_curve(fig, ax, independent_name, variables, curve)
 
     return ax
 
 
+def draw_data_with_curve(fig: Figure, ax: Axes, independent_name: str,
+                         variables: Tuple[List, List, List],
+                         curve: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> None:
+    """Draw the scatter plot, curve of best fit, title and axis labels of
+    plotting_data_with_curve onto the given figure and axes, without going through pyplot.
+    Above decimation.SCATTER_THRESHOLD points the scatter plot is drawn as a density
+    histogram, and a curve with more points than the axes can show is decimated.
+    Preconditions:
+        - independent_name != ''
+        - variables != ()
+    """
+    if curve is None:
+        curve = (variables[0], variables[2])
+
+    with span('render.data_with_curve', 'render', points=len(variables[0])):
+        decimation.draw_scatter(ax, variables[0], variables[1])
+        decimation.draw_line(ax, curve[0], curve[1], '--', color='red')  # curve of best fit
+        # creating title and axes titles
+        fig.text(.5, .9, independent_name + ' Against Global Mean Sea Level Changes from '
+                 '1993 to 2014', fontsize=7.5, ha='center')
+        ax.set_xlabel(independent_name)
+        ax.set_ylabel('Global Mean Sea Level Change (inches)')
+
+
 if __name__ == '__main__':
     # When you are ready to check your work with python_ta, uncomment the following lines.
     # (Delete the "#" and space before each line.)
@@ -165,8 +301,11 @@ if __name__ == '__main__':
         'allowed-io': ['read_csv_data'],
         'extra-imports': ['python_ta.contracts', 'csv', 'datetime',
                           'plotly.graph_objects', 'plotly.subplots',
-                          'matplotlib.pyplot', 'mpl_toolkits.axisartist',
-                          'plotting_data_with_pandas', 'scipy.optimize'],
+                          'matplotlib.figure', 'mpl_toolkits.axisartist',
+                          'decimation', 'plotting_data_with_pandas', 'dataset_cache',
+                          'instrumentation',
+                          'lazy_imports',
+                          'residual_analysis', 'polynomial_fitting', 'stats_analysis'],
         'max-line-length': 100,
         'max-args': 6,
         'max-locals': 25,
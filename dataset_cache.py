@@ -0,0 +1,291 @@
+"""
+Contains a process-wide cache for datasets read in from disk.
+
+Entries are keyed by the absolute path, modification time and size of the file, so editing a
+file invalidates its entry automatically. The cache holds a bounded number of DataFrames and
+evicts the least recently used one when full. It can optionally write a binary .npz sidecar
+for each file so that later processes can skip the text/Excel parse as well; loads marked
+persistent (such as Excel workbooks, whose parse is slowest) always get one. The time spent
+parsing source files and loading sidecars is recorded for each file, and report summarizes it.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from instrumentation import count, span
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+FileKey = Tuple[str, int, int]
+
+# Name of the directory, next to a file, that its persistent sidecars are written to when the
+# cache has no sidecar directory of its own
+DEFAULT_SIDECAR_DIRNAME = '.dataset_cache'
+
+
+def file_key(filename: str) -> FileKey:
+    """Return the (absolute path, mtime in nanoseconds, size in bytes) triple identifying the
+    current contents of the file with filename.
+    Preconditions:
+        - os.path.exists(filename)
+    """
+    stat = os.stat(filename)
+    return (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+
+
+@dataclass
+class LoadStats:
+    """The loads of one file (and variant) through a DatasetCache.
+
+    Instance Attributes:
+        - memory_hits: the number of loads answered from memory
+        - sidecar_loads: the number of loads answered from the on-disk sidecar
+        - sidecar_seconds: the total time spent loading the sidecar
+        - parses: the number of loads that parsed the source file
+        - parse_seconds: the total time spent parsing the source file
+    """
+    memory_hits: int = 0
+    sidecar_loads: int = 0
+    sidecar_seconds: float = 0.0
+    parses: int = 0
+    parse_seconds: float = 0.0
+
+
+class DatasetCache:
+    """A bounded, least-recently-used cache of DataFrames read in from files.
+
+    DataFrames returned by the cache are shared between callers and must not be mutated.
+
+    Instance Attributes:
+        - hits: number of loads answered from memory
+        - sidecar_hits: number of loads answered from an on-disk sidecar
+        - misses: number of loads that had to parse the source file
+    """
+    # Private Instance Attributes:
+    #   - _entries: maps (path, variant) to the file key the DataFrame was read with and the
+    #       DataFrame itself, ordered from least to most recently used
+    #   - _max_entries: the maximum number of DataFrames kept in memory
+    #   - _sidecar_dir: the directory sidecar files are written to, or None if sidecars are
+    #       disabled
+    #   - _stats: the LoadStats of each (path, variant) loaded so far
+    #   - _lock: guards _entries and the counters when loading from several threads
+    hits: int
+    sidecar_hits: int
+    misses: int
+    _entries: OrderedDict
+    _max_entries: int
+    _sidecar_dir: Optional[str]
+    _stats: Dict[Tuple[str, str], LoadStats]
+    _lock: threading.Lock
+
+    def __init__(self, max_entries: int = 32, sidecar_dir: Optional[str] = None) -> None:
+        """Initialize an empty cache.
+        Preconditions:
+            - max_entries > 0
+        """
+        self.hits = 0
+        self.sidecar_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._sidecar_dir = sidecar_dir
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def configure(self, max_entries: Optional[int] = None,
+                  sidecar_dir: Optional[str] = '') -> None:
+        """Change the size limit and/or sidecar directory of this cache. Passing
+        sidecar_dir=None disables sidecars; leaving it as '' keeps the current setting.
+        """
+        with self._lock:
+            if max_entries is not None:
+                self._max_entries = max_entries
+                self._evict()
+            if sidecar_dir != '':
+                self._sidecar_dir = sidecar_dir
+
+    def load(self, filename: str, reader: Callable[[str], pd.DataFrame],
+             variant: str = '', persist: bool = False) -> pd.DataFrame:
+        """Return the DataFrame for filename, calling reader(filename) only if there is no
+        up-to-date entry in memory or on disk. variant distinguishes different ways of reading
+        the same file (e.g. different sheets or column projections). If persist is True, a
+        sidecar is kept for the file even when this cache has no sidecar directory, in the
+        DEFAULT_SIDECAR_DIRNAME directory next to the file.
+        Preconditions:
+            - os.path.exists(filename)
+        """
+        key = file_key(filename)
+        entry_name = (key[0], variant)
+        with self._lock:
+            stats = self._stats.setdefault(entry_name, LoadStats())
+            entry = self._entries.get(entry_name)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(entry_name)
+                self.hits += 1
+                stats.memory_hits += 1
+                return entry[1]
+
+        sidecar_dir = self._sidecar_dir
+        if sidecar_dir is None and persist:
+            sidecar_dir = os.path.join(os.path.dirname(key[0]), DEFAULT_SIDECAR_DIRNAME)
+
+        start = time.perf_counter()
+        with span('read_sidecar', 'read', file=filename):
+            df = self._read_sidecar(key, variant, sidecar_dir)
+        if df is not None:
+            with self._lock:
+                self.sidecar_hits += 1
+                stats.sidecar_loads += 1
+                stats.sidecar_seconds += time.perf_counter() - start
+            count('sidecar_hits')
+        else:
+            start = time.perf_counter()
+            df = reader(filename)
+            with self._lock:
+                self.misses += 1
+                stats.parses += 1
+                stats.parse_seconds += time.perf_counter() - start
+            self._write_sidecar(key, variant, df, sidecar_dir)
+
+        with self._lock:
+            self._entries[entry_name] = (key, df)
+            self._entries.move_to_end(entry_name)
+            self._evict()
+        return df
+
+    def invalidate(self, filename: Optional[str] = None) -> None:
+        """Drop every in-memory entry for filename, or every entry if filename is None.
+        Sidecar files are left in place; they are revalidated against the source on load.
+        """
+        with self._lock:
+            if filename is None:
+                self._entries.clear()
+                return
+            path = os.path.abspath(filename)
+            for entry_name in [name for name in self._entries if name[0] == path]:
+                del self._entries[entry_name]
+
+    def __len__(self) -> int:
+        """Return the number of DataFrames currently held in memory."""
+        return len(self._entries)
+
+    def load_stats(self) -> Dict[Tuple[str, str], LoadStats]:
+        """Return a copy of the LoadStats of every (path, variant) loaded so far."""
+        with self._lock:
+            return {name: LoadStats(**vars(stats)) for name, stats in self._stats.items()}
+
+    def report(self) -> str:
+        """Return a table of the parses, sidecar loads and memory hits of every file loaded
+        so far, with the time spent parsing and loading sidecars.
+        """
+        lines = [f'{"file":<40}{"parses":>8}{"parse s":>10}{"sidecar":>9}{"sidecar s":>11}'
+                 f'{"hits":>7}']
+        for (path, variant), stats in sorted(self.load_stats().items()):
+            name = os.path.basename(path) + (' [' + variant + ']' if variant else '')
+            lines.append(f'{name:<40}{stats.parses:>8}{stats.parse_seconds:>10.4f}'
+                         f'{stats.sidecar_loads:>9}{stats.sidecar_seconds:>11.4f}'
+                         f'{stats.memory_hits:>7}')
+        return '\n'.join(lines)
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache is within its size limit.
+        Must be called with _lock held.
+        """
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _sidecar_path(key: FileKey, variant: str, sidecar_dir: str) -> str:
+        """Return the path of the sidecar file in sidecar_dir for the given file key and
+        variant.
+        """
+        digest = hashlib.sha1((key[0] + '\0' + variant).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(sidecar_dir, os.path.basename(key[0]) + '.' + digest + '.npz')
+
+    def _read_sidecar(self, key: FileKey, variant: str,
+                      sidecar_dir: Optional[str]) -> Optional[pd.DataFrame]:
+        """Return the DataFrame stored in the sidecar for key in sidecar_dir, or None if
+        sidecar_dir is None or the sidecar is missing or out of date.
+        """
+        if sidecar_dir is None:
+            return None
+        path = self._sidecar_path(key, variant, sidecar_dir)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['__mtime_ns__']) != key[1] or int(data['__size__']) != key[2]:
+                    return None
+                columns = data['__columns__'].tolist()
+                return pd.DataFrame({name: data['col_' + str(i)]
+                                     for i, name in enumerate(columns)},
+                                    columns=columns)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _write_sidecar(self, key: FileKey, variant: str, df: pd.DataFrame,
+                       sidecar_dir: Optional[str]) -> None:
+        """Write df to the sidecar for key in sidecar_dir, unless sidecar_dir is None or df
+        contains columns that cannot be stored without pickling. A sidecar that cannot be
+        written, e.g. next to a file in a read-only directory, is skipped.
+        """
+        if sidecar_dir is None:
+            return
+        if not all(isinstance(name, str) for name in df.columns):
+            return
+        arrays = {}
+        for i, name in enumerate(df.columns):
+            values = df[name].to_numpy()
+            if values.dtype == object:
+                if not all(isinstance(value, str) for value in values):
+                    return
+                values = values.astype(str)
+            arrays['col_' + str(i)] = values
+        path = self._sidecar_path(key, variant, sidecar_dir)
+        temp_path = path + '.' + str(os.getpid()) + '.tmp.npz'
+        try:
+            os.makedirs(sidecar_dir, exist_ok=True)
+            np.savez(temp_path, __columns__=np.array(df.columns, dtype=str),
+                     __mtime_ns__=np.int64(key[1]), __size__=np.int64(key[2]), **arrays)
+            os.replace(temp_path, path)
+        except OSError:
+            return
+
+
+DATASET_CACHE = DatasetCache()
+
+
+def configure_cache(max_entries: Optional[int] = None, sidecar_dir: Optional[str] = '') -> None:
+    """Configure the process-wide dataset cache. See DatasetCache.configure."""
+    DATASET_CACHE.configure(max_entries, sidecar_dir)
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'hashlib', 'os', 'threading', 'time',
+                          'collections', 'instrumentation', 'lazy_imports'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
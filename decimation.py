@@ -0,0 +1,348 @@
+"""
+Contains the reduction of large datasets to what can be seen on a chart before it is drawn.
+
+A curve of more points than the axes are pixels wide is decimated: either by keeping, in each
+pixel-wide bucket of x values, the first, last, lowest and highest point (min/max decimation,
+which draws exactly the same pixels as the full curve), or by the Largest-Triangle-Three-Buckets
+algorithm (LTTB), which keeps the points that best preserve the curve's visual shape. A
+scatter plot of more than SCATTER_THRESHOLD points is drawn as a 2D histogram of the point
+density instead of one marker per point.
+
+Reductions are kept in REDUCTION_CACHE, keyed by the dataset and the viewport (the x and y
+ranges shown and the size of the axes in pixels), and are recomputed for the new viewport
+when the chart is zoomed or panned.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple, TYPE_CHECKING
+
+from instrumentation import count, span
+from lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    import numpy
+    from matplotlib.image import AxesImage
+    from matplotlib.lines import Line2D
+    from mpl_toolkits.axisartist import Axes
+
+np = lazy_import('numpy')
+
+# Number of points above which a scatter plot is drawn as a density histogram
+SCATTER_THRESHOLD = 20000
+
+# Number of points per pixel of axes width above which a curve is decimated
+LINE_POINTS_PER_PIXEL = 4
+
+# Width and height, in pixels, of each bin of a density histogram
+DENSITY_BIN_PIXELS = 4
+
+METHODS = ('minmax', 'lttb')
+
+# (x minimum, x maximum, y minimum, y maximum, width in pixels, height in pixels)
+Viewport = Tuple[float, float, float, float, int, int]
+
+
+class ReductionCache:
+    """A bounded, least-recently-used cache of reductions of datasets for a viewport.
+
+    Instance Attributes:
+        - hits: number of reductions answered from memory
+        - misses: number of reductions that had to be computed
+    """
+    # Private Instance Attributes:
+    #   - _entries: maps a reduction key to its result, ordered from least to most recently
+    #       used
+    #   - _max_entries: the maximum number of reductions kept in memory
+    #   - _lock: guards _entries and the counters when drawing from several threads
+    hits: int
+    misses: int
+    _entries: OrderedDict
+    _max_entries: int
+    _lock: threading.Lock
+
+    def __init__(self, max_entries: int = 64) -> None:
+        """Initialize an empty cache.
+        Preconditions:
+            - max_entries > 0
+        """
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the reduction for key, calling compute only if it is not in memory."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        result = compute()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = result
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        """Remove every reduction from the cache and reset its counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+REDUCTION_CACHE = ReductionCache()
+
+
+def dataset_key(x_values: numpy.ndarray, y_values: numpy.ndarray) -> Tuple[int, str]:
+    """Return a key identifying the contents of x_values and y_values."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(x_values).tobytes())
+    digest.update(np.ascontiguousarray(y_values).tobytes())
+    return (len(x_values), digest.hexdigest())
+
+
+def lttb(x_values: numpy.ndarray, y_values: numpy.ndarray, points: int) -> numpy.ndarray:
+    """Return the positions of the points points chosen by the Largest-Triangle-Three-Buckets
+    algorithm from x_values and y_values, in increasing order. The first and last points are
+    always kept, and every point of the whole series is returned if there are at most points
+    of them.
+    Preconditions:
+        - x_values is sorted in non-decreasing order
+        - len(x_values) == len(y_values)
+        - points >= 3
+    """
+    n = len(x_values)
+    if n <= points:
+        return np.arange(n)
+
+    # points - 2 buckets split the points between the first and the last
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x_values[1:n - 1], edges[:-1] - 1) / sizes
+    mean_y = np.add.reduceat(y_values[1:n - 1], edges[:-1] - 1) / sizes
+    mean_x = np.append(mean_x[1:], x_values[n - 1])
+    mean_y = np.append(mean_y[1:], y_values[n - 1])
+
+    selected = np.empty(points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        # twice the area of the triangle of the previous point, each candidate in this bucket
+        # and the mean of the next bucket
+        areas = np.abs((x_values[previous] - mean_x[bucket])
+                       * (y_values[low:high] - y_values[previous])
+                       - (x_values[previous] - x_values[low:high])
+                       * (mean_y[bucket] - y_values[previous]))
+        previous = low + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def min_max_decimate(x_values: numpy.ndarray, y_values: numpy.ndarray, x_min: float,
+                     x_max: float, buckets: int) -> numpy.ndarray:
+    """Return the positions, in increasing order, of the first, last, lowest and highest point
+    of each of buckets equal-width buckets of x values from x_min to x_max.
+    Preconditions:
+        - x_values is sorted in non-decreasing order
+        - len(x_values) == len(y_values)
+        - buckets > 0
+    """
+    if len(x_values) == 0:
+        return np.arange(0)
+    width = (x_max - x_min) / buckets if x_max > x_min else 1.0
+    bucket = np.clip(((x_values - x_min) / width).astype(int), 0, buckets - 1)
+    starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+    ends = np.append(starts[1:], len(x_values)) - 1
+    # ordered by bucket, and by y value within each bucket
+    order = np.lexsort((y_values, bucket))
+    return np.unique(np.concatenate([starts, ends, order[starts], order[ends]]))
+
+
+def viewport_of(ax: Axes) -> Viewport:
+    """Return the viewport currently shown by ax."""
+    x_min, x_max = sorted(ax.get_xlim())
+    y_min, y_max = sorted(ax.get_ylim())
+    extent = ax.get_window_extent()
+    return (x_min, x_max, y_min, y_max, max(int(extent.width), 1), max(int(extent.height), 1))
+
+
+def reduce_line(x_values: numpy.ndarray, y_values: numpy.ndarray, viewport: Viewport,
+                method: str = 'minmax',
+                key: Optional[Hashable] = None) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the points of the curve through x_values and y_values to draw in viewport: the
+    points inside its x range and their neighbours outside it, decimated with method if there
+    are more than LINE_POINTS_PER_PIXEL per pixel of width. The result is cached under key,
+    if given, and the viewport.
+    Preconditions:
+        - x_values is sorted in non-decreasing order
+        - len(x_values) == len(y_values)
+        - method in METHODS
+    """
+    if method not in METHODS:
+        raise ValueError('method must be one of ' + ', '.join(METHODS))
+    x_min, x_max, _, _, width, _ = viewport
+
+    def compute() -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Return the reduced curve."""
+        with span('render.decimate_line', 'render', points=len(x_values), method=method):
+            low = max(int(np.searchsorted(x_values, x_min, 'left')) - 1, 0)
+            high = int(np.searchsorted(x_values, x_max, 'right')) + 1
+            x_shown, y_shown = x_values[low:high], y_values[low:high]
+            if len(x_shown) <= LINE_POINTS_PER_PIXEL * width:
+                return x_shown, y_shown
+            if method == 'lttb':
+                selected = lttb(x_shown, y_shown, max(2 * width, 3))
+            else:
+                selected = min_max_decimate(x_shown, y_shown, x_min, x_max, width)
+            count('points_decimated', len(x_shown) - len(selected))
+            return x_shown[selected], y_shown[selected]
+
+    if key is None:
+        return compute()
+    return REDUCTION_CACHE.get(('line', key, method, x_min, x_max, width), compute)
+
+
+def density_grid(x_values: numpy.ndarray, y_values: numpy.ndarray, viewport: Viewport,
+                 key: Optional[Hashable] = None) -> numpy.ndarray:
+    """Return the number of points of x_values and y_values in each bin of a grid over
+    viewport, with bins of DENSITY_BIN_PIXELS pixels square, as one row per y bin. The result
+    is cached under key, if given, and the viewport.
+    Preconditions:
+        - len(x_values) == len(y_values)
+    """
+    x_min, x_max, y_min, y_max, width, height = viewport
+    bins = (max(height // DENSITY_BIN_PIXELS, 1), max(width // DENSITY_BIN_PIXELS, 1))
+
+    def compute() -> numpy.ndarray:
+        """Return the histogram."""
+        with span('render.density', 'render', points=len(x_values)):
+            counts, _, _ = np.histogram2d(y_values, x_values, bins=bins,
+                                          range=[[y_min, y_max], [x_min, x_max]])
+        return counts
+
+    if key is None:
+        return compute()
+    return REDUCTION_CACHE.get(('density', key, viewport), compute)
+
+
+def _data_viewport(ax: Axes, x_values: numpy.ndarray,
+                   y_values: numpy.ndarray) -> Optional[Viewport]:
+    """Return the viewport spanning the finite values of x_values and y_values on ax, or None
+    if either has no finite values.
+    """
+    x_finite = x_values[np.isfinite(x_values)]
+    y_finite = y_values[np.isfinite(y_values)]
+    if x_finite.size == 0 or y_finite.size == 0:
+        return None
+    extent = ax.get_window_extent()
+    return (float(x_finite.min()), float(x_finite.max()), float(y_finite.min()),
+            float(y_finite.max()), max(int(extent.width), 1), max(int(extent.height), 1))
+
+
+def draw_line(ax: Axes, x_values: Any, y_values: Any, *args: Any, method: str = 'minmax',
+              **kwargs: Any) -> Line2D:
+    """Plot the curve through x_values and y_values on ax, passing args and kwargs on to
+    ax.plot, and return the line. If there are more points than LINE_POINTS_PER_PIXEL per
+    pixel of the width of ax, the curve is sorted by x, decimated with method, and decimated
+    again for the new viewport whenever ax is zoomed or panned. A curve with no finite points
+    is passed to ax.plot as it is.
+    Preconditions:
+        - len(x_values) == len(y_values)
+        - method in METHODS
+    """
+    x_array = np.asarray(x_values, dtype=float)
+    y_array = np.asarray(y_values, dtype=float)
+    width = max(int(ax.get_window_extent().width), 1)
+    viewport = None
+    if x_array.size > LINE_POINTS_PER_PIXEL * width:
+        viewport = _data_viewport(ax, x_array, y_array)
+    if viewport is None:
+        line, = ax.plot(x_array, y_array, *args, **kwargs)
+        return line
+
+    if np.any(np.diff(x_array) < 0):
+        order = np.argsort(x_array, kind='stable')
+        x_array, y_array = x_array[order], y_array[order]
+    key = dataset_key(x_array, y_array)
+    line, = ax.plot(*reduce_line(x_array, y_array, viewport, method, key), *args, **kwargs)
+
+    def update(axes: Axes) -> None:
+        """Decimate the curve again for the viewport of axes."""
+        line.set_data(*reduce_line(x_array, y_array, viewport_of(axes), method, key))
+
+    ax.callbacks.connect('xlim_changed', update)
+    return line
+
+
+def draw_scatter(ax: Axes, x_values: Any, y_values: Any, cmap: str = 'Blues',
+                 **kwargs: Any) -> Any:
+    """Draw the scatter plot of x_values and y_values on ax, passing kwargs on to ax.scatter,
+    and return the artist drawn. Above SCATTER_THRESHOLD points, the density of the points is
+    drawn instead, as an image of a 2D histogram coloured with cmap (bins with no points are
+    left blank), recomputed for the new viewport whenever ax is zoomed or panned. Points with
+    no finite values are passed to ax.scatter as they are.
+    Preconditions:
+        - len(x_values) == len(y_values)
+    """
+    x_array = np.asarray(x_values, dtype=float)
+    y_array = np.asarray(y_values, dtype=float)
+    viewport = None
+    if x_array.size > SCATTER_THRESHOLD:
+        viewport = _data_viewport(ax, x_array, y_array)
+    if viewport is None:
+        return ax.scatter(x_array, y_array, **kwargs)
+
+    key = dataset_key(x_array, y_array)
+    image = ax.imshow(np.ma.masked_equal(density_grid(x_array, y_array, viewport, key), 0),
+                      extent=viewport[:4], origin='lower', aspect='auto',
+                      interpolation='nearest', cmap=cmap)
+    updating = []
+
+    def update(axes: Axes) -> None:
+        """Recompute the density for the viewport of axes."""
+        if updating:  # setting the extent may change the limits again
+            return
+        updating.append(True)
+        try:
+            new_viewport = viewport_of(axes)
+            image.set_data(np.ma.masked_equal(
+                density_grid(x_array, y_array, new_viewport, key), 0))
+            image.set_extent(new_viewport[:4])
+        finally:
+            updating.clear()
+
+    ax.callbacks.connect('xlim_changed', update)
+    ax.callbacks.connect('ylim_changed', update)
+    return image
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'hashlib', 'threading', 'collections',
+                          'matplotlib.image', 'matplotlib.lines', 'mpl_toolkits.axisartist',
+                          'instrumentation', 'lazy_imports'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
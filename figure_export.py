@@ -0,0 +1,115 @@
+"""
+Contains functions for rendering curve-of-best-fit charts straight to image files.
+
+Figures are built with matplotlib's object-oriented API on an Agg canvas, so rendering never
+goes through pyplot, never opens a window, and never blocks. Each figure is dropped as soon
+as it has been saved, so rendering hundreds of charts does not grow memory. Batches of charts
+can be rendered across worker processes.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import plotting_data_with_pandas as pd_with_pandas
+from curve_fitting import FitResult, draw_data_with_curve, fit_model, prediction_grid
+from instrumentation import span
+
+FORMATS = ('png', 'svg', 'pdf')
+
+# A chart to export: the independent and dependent filenames and the model name
+ChartJob = Tuple[str, str, str]
+
+
+def render_fit(fit: FitResult, independent_name: str, path: str, dpi: int = 100) -> str:
+    """Render the scatter plot and curve of best fit of fit to path, and return path. The
+    image format is taken from the extension of path.
+    Preconditions:
+        - os.path.splitext(path)[1][1:] in FORMATS
+    """
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    variables = (fit.x_values, fit.y_values, fit.predict(fit.x_values))
+    draw_data_with_curve(fig, ax, independent_name, variables, prediction_grid(fit))
+    try:
+        with span('render.savefig', 'render', file=path):
+            fig.savefig(path, dpi=dpi)
+    finally:
+        fig.clear()
+    return path
+
+
+def chart_filename(ind_filename: str, dep_filename: str, model: str, fmt: str) -> str:
+    """Return the name of the image file for the chart of model fitted to dep_filename against
+    ind_filename. Both names are included, so charts of the same factor against different
+    targets do not overwrite each other.
+    """
+    names = [pd_with_pandas.get_name(os.path.basename(filename)).replace(' ', '_')
+             for filename in (ind_filename, dep_filename)]
+    return names[0] + '_vs_' + names[1] + '_' + model + '.' + fmt
+
+
+def export_chart(job: ChartJob, out_dir: str, fmt: str = 'png', dpi: int = 100) -> str:
+    """Fit and render the chart described by job into out_dir, and return its path.
+    Preconditions:
+        - fmt in FORMATS
+    """
+    ind_filename, dep_filename, model = job
+    fit = fit_model(ind_filename, dep_filename, model)
+    independent_name = pd_with_pandas.get_name(os.path.basename(ind_filename))
+    path = os.path.join(out_dir, chart_filename(ind_filename, dep_filename, model, fmt))
+    return render_fit(fit, independent_name, path, dpi)
+
+
+def _export_chart_star(arguments: Tuple[ChartJob, str, str, int]) -> str:
+    """Call export_chart with the given arguments. Used to send work to worker processes."""
+    return export_chart(*arguments)
+
+
+def export_charts(jobs: Iterable[ChartJob], out_dir: str, fmt: str = 'png', dpi: int = 100,
+                  workers: Optional[int] = None) -> List[str]:
+    """Render the chart of every (ind_filename, dep_filename, model) in jobs into out_dir,
+    and return the paths written, in the order of jobs.
+
+    The charts are rendered on a pool of worker processes (one per CPU if workers is None),
+    or in this process if workers == 1.
+    Preconditions:
+        - fmt in FORMATS
+        - workers is None or workers > 0
+    """
+    if fmt not in FORMATS:
+        raise ValueError('fmt must be one of ' + ', '.join(FORMATS))
+    os.makedirs(out_dir, exist_ok=True)
+    arguments = [(job, out_dir, fmt, dpi) for job in jobs]
+
+    if workers == 1:
+        return [_export_chart_star(argument) for argument in arguments]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_export_chart_star, arguments))
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'os', 'concurrent.futures',
+                          'matplotlib.backends.backend_agg', 'matplotlib.figure',
+                          'plotting_data_with_pandas', 'curve_fitting', 'instrumentation'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,276 @@
+"""
+Contains opt-in timing spans and counters for the stages of the pipeline.
+
+The pipeline wraps its reading, extraction, fitting, statistics and drawing in spans, and
+counts the rows and fits it processes. Nothing is recorded until enable is called (or the
+CLIMATE_TRACE environment variable is set before the window is launched); while disabled, a
+span is a shared do-nothing context manager and a count returns straight away, so the hooks
+cost a single function call.
+
+The recorded spans can be exported as Chrome trace-event JSON, to be opened in
+chrome://tracing or https://ui.perfetto.dev, or printed as a summary table, e.g.
+    import instrumentation
+    instrumentation.enable()
+    ...
+    print(instrumentation.summary())
+    instrumentation.export_chrome_trace('trace.json')
+"""
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, ContextManager, Dict, List, Optional
+
+# Name of the environment variable holding the path to export a trace to when the program
+# exits
+TRACE_ENVIRONMENT_VARIABLE = 'CLIMATE_TRACE'
+
+# Returned by span while recording is disabled
+_NULL_SPAN = contextlib.nullcontext()
+
+
+@dataclass
+class SpanRecord:
+    """A single completed span.
+
+    Instance Attributes:
+        - name: the name of the span, e.g. 'fit.cubic'
+        - category: the pipeline stage the span belongs to, e.g. 'fit'
+        - start_ns: the time the span started, from time.perf_counter_ns
+        - duration_ns: the time the span took, in nanoseconds
+        - thread_id: the identifier of the thread that ran the span
+        - args: extra details about the span, such as the file being read
+    """
+    name: str
+    category: str
+    start_ns: int
+    duration_ns: int
+    thread_id: int
+    args: Dict[str, Any]
+
+
+class Recorder:
+    """A thread-safe record of the spans and counter increments of the pipeline.
+
+    Instance Attributes:
+        - enabled: whether spans and counts are currently being recorded
+    """
+    # Private Instance Attributes:
+    #   - _spans: the completed spans, in the order they finished
+    #   - _counters: the current total of each counter
+    #   - _counter_events: the time and new total of every counter increment, for the trace
+    #   - _origin_ns: the time the recorder was created or last reset, the zero of the trace
+    #   - _lock: guards the records, as spans finish on several threads
+    enabled: bool
+    _spans: List[SpanRecord]
+    _counters: Dict[str, int]
+    _counter_events: List[tuple]
+    _origin_ns: int
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        """Initialize a disabled recorder with nothing recorded."""
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget every recorded span and counter."""
+        with self._lock:
+            self._spans = []
+            self._counters = {}
+            self._counter_events = []
+            self._origin_ns = time.perf_counter_ns()
+
+    def record_span(self, record: SpanRecord) -> None:
+        """Add a completed span."""
+        with self._lock:
+            self._spans.append(record)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add amount to the counter called name."""
+        with self._lock:
+            total = self._counters.get(name, 0) + amount
+            self._counters[name] = total
+            self._counter_events.append((name, time.perf_counter_ns(), total))
+
+    def spans(self) -> List[SpanRecord]:
+        """Return a copy of the completed spans."""
+        with self._lock:
+            return list(self._spans)
+
+    def counters(self) -> Dict[str, int]:
+        """Return a copy of the current total of every counter."""
+        with self._lock:
+            return dict(self._counters)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Return the recorded spans and counters as a Chrome trace-event document. Spans are
+        complete ('X') events and counter increments are counter ('C') events, with times in
+        microseconds since the recorder was last reset.
+        """
+        pid = os.getpid()
+        with self._lock:
+            events = [{'name': record.name, 'cat': record.category, 'ph': 'X',
+                       'ts': (record.start_ns - self._origin_ns) / 1000,
+                       'dur': record.duration_ns / 1000, 'pid': pid,
+                       'tid': record.thread_id, 'args': record.args}
+                      for record in self._spans]
+            events.extend({'name': name, 'ph': 'C', 'ts': (time_ns - self._origin_ns) / 1000,
+                           'pid': pid, 'tid': 0, 'args': {name: total}}
+                          for name, time_ns, total in self._counter_events)
+        events.sort(key=lambda event: event['ts'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def summary(self) -> str:
+        """Return a table of the number of calls and the total, mean and longest time of each
+        span name, longest total first, followed by the total of every counter.
+        """
+        totals = {}
+        for record in self.spans():
+            calls, total_ns, longest_ns = totals.get(record.name, (0, 0, 0))
+            totals[record.name] = (calls + 1, total_ns + record.duration_ns,
+                                   max(longest_ns, record.duration_ns))
+
+        lines = [f'{"span":<36}{"calls":>8}{"total ms":>12}{"mean ms":>12}{"max ms":>12}']
+        for name, (calls, total_ns, longest_ns) in sorted(totals.items(),
+                                                          key=lambda item: -item[1][1]):
+            lines.append(f'{name:<36}{calls:>8}{total_ns / 1e6:>12.3f}'
+                         f'{total_ns / calls / 1e6:>12.3f}{longest_ns / 1e6:>12.3f}')
+        counters = self.counters()
+        if counters:
+            lines.append('')
+            lines.append(f'{"counter":<36}{"total":>12}')
+            for name, total in sorted(counters.items()):
+                lines.append(f'{name:<36}{total:>12}')
+        return '\n'.join(lines)
+
+
+class _Span:
+    """A context manager timing one span into a recorder."""
+    # Private Instance Attributes:
+    #   - _recorder: the recorder the span is added to when it ends
+    #   - _name: the name of the span
+    #   - _category: the pipeline stage of the span
+    #   - _args: extra details about the span
+    #   - _start_ns: the time the span was entered
+    _recorder: Recorder
+    _name: str
+    _category: str
+    _args: Dict[str, Any]
+    _start_ns: int
+
+    def __init__(self, recorder: Recorder, name: str, category: str,
+                 args: Dict[str, Any]) -> None:
+        """Initialize a span that has not been entered yet."""
+        self._recorder = recorder
+        self._name = name
+        self._category = category
+        self._args = args
+        self._start_ns = 0
+
+    def __enter__(self) -> '_Span':
+        """Start timing the span."""
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Stop timing the span and record it."""
+        end_ns = time.perf_counter_ns()
+        self._recorder.record_span(SpanRecord(self._name, self._category, self._start_ns,
+                                              end_ns - self._start_ns,
+                                              threading.get_ident(), self._args))
+
+
+RECORDER = Recorder()
+
+
+def span(name: str, category: str = '', **args: Any) -> ContextManager:
+    """Return a context manager timing the code in its block as a span called name in the
+    given pipeline stage, with args as extra details. While recording is disabled, this is a
+    shared context manager that does nothing.
+    """
+    if not RECORDER.enabled:
+        return _NULL_SPAN
+    return _Span(RECORDER, name, category, args)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add amount to the counter called name, if recording is enabled."""
+    if RECORDER.enabled:
+        RECORDER.count(name, amount)
+
+
+def enable() -> None:
+    """Start recording spans and counters."""
+    RECORDER.enabled = True
+
+
+def disable() -> None:
+    """Stop recording spans and counters, keeping what has been recorded so far."""
+    RECORDER.enabled = False
+
+
+def reset() -> None:
+    """Forget every recorded span and counter."""
+    RECORDER.reset()
+
+
+def summary() -> str:
+    """Return the summary table of the recorded spans and counters."""
+    return RECORDER.summary()
+
+
+def export_chrome_trace(path: str) -> str:
+    """Write the recorded spans and counters to path as Chrome trace-event JSON, and return
+    path.
+    """
+    with open(path, 'w') as file:
+        json.dump(RECORDER.chrome_trace(), file)
+    return path
+
+
+def enable_from_environment() -> Optional[str]:
+    """If the CLIMATE_TRACE environment variable holds a path, start recording, arrange for
+    the trace to be exported to that path and the summary printed when the program exits, and
+    return the path. Otherwise return None.
+    """
+    path = os.environ.get(TRACE_ENVIRONMENT_VARIABLE)
+    if not path:
+        return None
+    enable()
+    atexit.register(_export_at_exit, path)
+    return path
+
+
+def _export_at_exit(path: str) -> None:
+    """Export the trace to path and print the summary table."""
+    export_chrome_trace(path)
+    print(summary())
+    print('Trace written to ' + path)
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': ['export_chrome_trace', '_export_at_exit'],
+        'extra-imports': ['python_ta.contracts', 'atexit', 'contextlib', 'json', 'os',
+                          'threading', 'time'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,73 @@
+"""
+Contains a helper for deferring the import of heavy dependencies.
+
+numpy, pandas, scipy, matplotlib and sklearn each take from a hundred milliseconds to
+seconds to import. A module that binds them with lazy_import instead of an import statement
+only pays that cost the first time one of their attributes is used, so scripts that only
+need a few light functions start quickly.
+
+Names used only in annotations should be imported under typing.TYPE_CHECKING, with
+'from __future__ import annotations' at the top of the module, so that defining a function
+does not load the module either.
+"""
+import importlib
+import threading
+import types
+from typing import Any, Dict
+
+_lazy_modules: Dict[str, 'LazyModule'] = {}
+_lazy_modules_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """A stand-in for a module that imports the real module on first attribute access.
+
+    Once loaded, the real module's attributes are copied onto the stand-in, so later
+    attribute lookups are as fast as on the real module.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        """Import the real module, and return its attribute called name."""
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+    def __dir__(self) -> list:
+        """Return the attribute names of the real module, importing it if needed."""
+        return dir(importlib.import_module(self.__name__))
+
+    def __repr__(self) -> str:
+        """Return a representation of this stand-in."""
+        return '<lazy module ' + repr(self.__name__) + '>'
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a stand-in for the module with the fully qualified name, which is imported the
+    first time one of its attributes is accessed.
+    """
+    with _lazy_modules_lock:
+        if name not in _lazy_modules:
+            _lazy_modules[name] = LazyModule(name)
+        return _lazy_modules[name]
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'importlib', 'threading', 'types'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,137 @@
+"""
+Contains a load test for the service in service.py.
+
+A number of concurrent clients each keep one connection open and send requests, cycling
+through a list of paths, until the requested total has been sent. The latency of every
+request is recorded and the throughput and latency percentiles are reported.
+
+Run this file directly, either against a running service
+    python load_test.py --port 8080 --requests 5000 --concurrency 32
+or starting a local instance for the duration of the test
+    python load_test.py --serve Sea_Level.csv CO2_Levels.csv Mean_Global_Temperatures.csv
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from math import ceil
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PATHS = ['/stats?factor=0', '/fit?factor=0&model=linear',
+                 '/fit?factor=0&model=quadratic', '/fit?factor=0&model=cubic',
+                 '/fit?factor=0&model=exponential', '/regression',
+                 '/predict?factor=0&model=cubic&x=1,2,3']
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Return the q-th percentile of sorted_values by the nearest-rank method.
+    Preconditions:
+        - sorted_values != []
+        - 0 < q <= 100
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 50)
+    2.0
+    """
+    return sorted_values[max(ceil(q / 100 * len(sorted_values)) - 1, 0)]
+
+
+async def _client(host: str, port: int, paths: List[str], requests: int,
+                  offset: int) -> Tuple[List[float], int]:
+    """Send requests requests on one connection, cycling through paths starting at offset,
+    and return the latency of each one in seconds and the number of non-200 answers.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    latencies = []
+    errors = 0
+    try:
+        for i in range(requests):
+            path = paths[(offset + i) % len(paths)]
+            start = time.perf_counter()
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode('latin-1'))
+            await writer.drain()
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if status_line.split()[1] != b'200':
+                errors += 1
+    finally:
+        writer.close()
+    return latencies, errors
+
+
+async def run_load(host: str, port: int, paths: List[str], requests: int,
+                   concurrency: int) -> Dict[str, float]:
+    """Send requests requests to the service on host and port from concurrency concurrent
+    clients, and return the throughput and latency percentiles, in milliseconds.
+    Preconditions:
+        - paths != []
+        - requests >= concurrency > 0
+    """
+    shares = [requests // concurrency + (1 if i < requests % concurrency else 0)
+              for i in range(concurrency)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*[_client(host, port, paths, share, i)
+                                     for i, share in enumerate(shares)])
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency * 1000 for client, _ in results for latency in client)
+    return {'requests': len(latencies), 'errors': sum(errors for _, errors in results),
+            'seconds': elapsed, 'requests_per_second': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 50), 'p90_ms': percentile(latencies, 90),
+            'p99_ms': percentile(latencies, 99), 'max_ms': latencies[-1]}
+
+
+def start_service(filenames: List[str], host: str) -> Tuple[subprocess.Popen, int]:
+    """Start service.py on any free port in a new process with the given sea level file
+    followed by factor files, and return the process and the port once it is listening.
+    """
+    service_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'service.py')
+    process = subprocess.Popen([sys.executable, service_path, *filenames, '--host', host,
+                                '--port', '0'], stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('Listening on'):
+        process.kill()
+        raise RuntimeError('the service did not start')
+    return process, int(line.rsplit(':', 1)[1])
+
+
+def main() -> None:
+    """Parse the command line, run the load test and print its report."""
+    parser = argparse.ArgumentParser(description='Load test for the analysis service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument('--serve', nargs='+', metavar='FILE',
+                        help='start a local service with this sea level file and factor files')
+    args = parser.parse_args()
+
+    process: Optional[subprocess.Popen] = None
+    port = args.port
+    if args.serve:
+        process, port = start_service(args.serve, args.host)
+    try:
+        report = asyncio.run(run_load(args.host, port, args.paths, args.requests,
+                                      args.concurrency))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    for name, value in report.items():
+        print(f'{name:<22}{value:>12.3f}' if isinstance(value, float) else
+              f'{name:<22}{value:>12}')
+
+
+if __name__ == '__main__':
+    main()
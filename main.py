@@ -2,19 +2,31 @@
 which will display a panel of buttons that the user can interact with
 to learn more about the relationship between rising sea levels and other
 environmental factors related to climate change."""
-from typing import List
-import matplotlib.pyplot as plt
-import pandas as pd
-from matplotlib.backend_bases import Event
+from __future__ import annotations
 
-from matplotlib.widgets import Button
+from typing import List, Optional, Tuple, TYPE_CHECKING
 
-import stats_analysis
-from curve_equations import cubic_equation_of_best_fit, exponential_equation_of_best_fit, \
-    quadratic_equation_of_best_fit
+import instrumentation
 from curve_fitting import cubic_curve_fitting_and_plotting, exponential_curve_fitting_and_plotting, \
     linear_curve_fitting_and_plotting, quadratic_curve_fitting_and_plotting
-from plotting_data_with_pandas import create_data_frame
+from plotting_data_with_pandas import create_data_frames
+from precompute import ResultStore
+from lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from matplotlib.axes import Axes
+    from matplotlib.backend_bases import Event
+    from matplotlib.widgets import Button
+
+plt = lazy_import('matplotlib.pyplot')
+widgets = lazy_import('matplotlib.widgets')
+
+CURVE_PLOTTING_FUNCTIONS = {
+    'exponential': exponential_curve_fitting_and_plotting,
+    'quadratic': quadratic_curve_fitting_and_plotting,
+    'cubic': cubic_curve_fitting_and_plotting,
+}
 
 
 class ButtonHandler:
@@ -29,6 +41,8 @@ class ButtonHandler:
     #       of the independent variables
     #   - _ind_filename3: name of the file containing data on one
     #       of the independent variables
+    #   - _results: the fits, equations and statistics shown by the buttons,
+    #       possibly being computed in the background
     _df1: pd.DataFrame
     _df2: pd.DataFrame
     _df3: pd.DataFrame
@@ -36,11 +50,13 @@ class ButtonHandler:
     _ind_filename2: str
     _ind_filename3: str
     _dep_filename: str
+    _results: ResultStore
 
     def __init__(self, ind_filename1: str, ind_filename2: str,
                  ind_filename3: str, dep_filename: str, df1: pd.DataFrame, df2: pd.DataFrame,
-                 df3: pd.DataFrame):
-        """Intialize a new ButtonHandler object."""
+                 df3: pd.DataFrame, results: Optional[ResultStore] = None):
+        """Intialize a new ButtonHandler object. If results is not given, every result is
+        computed when its button is clicked."""
         self._df1 = df1
         self._df2 = df2
         self._df3 = df3
@@ -48,64 +64,34 @@ class ButtonHandler:
         self._ind_filename2 = ind_filename2
         self._ind_filename3 = ind_filename3
         self._dep_filename = dep_filename
+        if results is None:
+            results = ResultStore([ind_filename1, ind_filename2, ind_filename3], dep_filename,
+                                  [df1, df2, df3])
+        self._results = results
 
     def line1(self, _: Event) -> None:
         """Plot the scatter plot and line of best fit for the data in df1."""
-        ax = linear_curve_fitting_and_plotting(self._ind_filename1, self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        x_vals = self._df1[self._df1.columns[0]].values.tolist()
-        y_vals = self._df1['Global Mean Sea Levels'].values.tolist()
-        line_equation = stats_analysis.best_fit_regression_equation(x_vals, y_vals)
-        correlation = str(stats_analysis.correlation(x_vals, y_vals))
-        r_squared = str(stats_analysis.r_squared(x_vals, y_vals))
-
-        ax.set_xlabel(self._df1.columns[0] + '\nCorrelation of Data: ' + correlation +
-                      '\nEquation of line fit: ' + line_equation +
-                      '\nR Squared Value: ' + r_squared)
-        plt.draw()
+        self._plot_line(0)
 
     def line2(self, _: Event) -> None:
         """Plot the scatter plot and line of best fit for the data in df2."""
-        ax = linear_curve_fitting_and_plotting(self._ind_filename2, self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        x_vals = self._df2[self._df2.columns[0]].values.tolist()
-        y_vals = self._df2['Global Mean Sea Levels'].values.tolist()
-
-        line_equation = stats_analysis.best_fit_regression_equation(x_vals, y_vals)
-        correlation = str(stats_analysis.correlation(x_vals, y_vals))
-        r_squared = str(stats_analysis.r_squared(x_vals, y_vals))
-
-        ax.set_xlabel(self._df2.columns[0] + '\nCorrelation of Data: ' + correlation +
-                      '\nEquation of line fit: ' + line_equation +
-                      '\nR Squared Value: ' + r_squared)
-        plt.draw()
+        self._plot_line(1)
 
     def line3(self, _: Event) -> None:
         """Plot the scatter plot and line of best fit for the data in df3."""
-        ax = linear_curve_fitting_and_plotting(self._ind_filename3, self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        x_vals = self._df3[self._df3.columns[0]].values.tolist()
-        y_vals = self._df3['Global Mean Sea Levels'].values.tolist()
-
-        line_equation = stats_analysis.best_fit_regression_equation(x_vals, y_vals)
-        correlation = str(stats_analysis.correlation(x_vals, y_vals))
-        r_squared = str(stats_analysis.r_squared(x_vals, y_vals))
-
-        ax.set_xlabel(self._df3.columns[0] + '\nCorrelation of Data: ' + correlation +
-                      '\nEquation of line fit: ' + line_equation +
-                      '\nR Squared Value: ' + r_squared)
-
-        plt.draw()
+        self._plot_line(2)
 
     def stats(self, _: Event) -> None:
         """Display the results of performing multiple linear regression on the data,
         as well as the root mean squared error for each independent variable in the
         dataframes."""
+        with instrumentation.span('button.stats', 'ui'):
+            self._draw_stats()
+
+    def _draw_stats(self) -> None:
+        """Draw the text of the stats button."""
         _, ax = plt.subplots()
-        coef, intercept, r_2 = stats_analysis.multiple_lin_reg(self._df1, self._df2, self._df3)
+        coef, intercept, r_2, rmse = self._results.regression()
         coef_new = [round(co, 8) for co in coef]
 
         ax.set_title('Please full screen this window.')
@@ -117,132 +103,99 @@ class ButtonHandler:
                  + ' + ' + self._df2.columns[0] + ' * ' + str(coef_new[1]) + ' + ' +
                  self._df3.columns[0] + ' * ' + str(coef_new[2]) + ' + ' + str(intercept))
 
-        # calculating and displaying the root mean square error
-        x_vals = self._df1[self._df1.columns[0]].values.tolist()
-        y_vals = self._df1['Global Mean Sea Levels'].values.tolist()
-        plt.text(0.0, 0.575, '\n Root Mean Squared Error (' + self._df1.columns[0] + '): ' +
-                 str(stats_analysis.root_mean_squared_error(5, 25, x_vals, y_vals)) +
-                 '\n Root Mean Squared Error (' + self._df2.columns[0] + '): ' +
-                 str(stats_analysis.root_mean_squared_error(100, 120, x_vals, y_vals)) +
-                 '\n Root Mean Squared Error (' + self._df3.columns[0] + '): ' +
-                 str(stats_analysis.root_mean_squared_error(-10, -5, x_vals, y_vals)))
+        # displaying the root mean squared error of each factor's line of best fit,
+        # from the paired residuals of its own data
+        rmse_text = ''
+        for df, error in zip((self._df1, self._df2, self._df3), rmse):
+            rmse_text += '\n Root Mean Squared Error (' + df.columns[0] + '): ' + str(error)
+        plt.text(0.0, 0.575, rmse_text)
 
         plt.draw()
 
     def exponential1(self, _: Event) -> None:
         """Plot the scatter plot and the exponential curve of best fit
         for the data in df1."""
-        ax = exponential_curve_fitting_and_plotting(self._ind_filename1,
-                                                    self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        ax.set_xlabel(self._df1.columns[0] + '\n\nEquation: \n' +
-                      exponential_equation_of_best_fit(self._ind_filename1,
-                                                       self._dep_filename))
-
-        plt.draw()
+        self._plot_curve('exponential', 0)
 
     def exponential2(self, _: Event) -> None:
         """Plot the scatter plot and the exponential curve of best fit
         for the data in df2."""
-        ax = exponential_curve_fitting_and_plotting(self._ind_filename2,
-                                                    self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        ax.set_xlabel(self._df2.columns[0] + '\n\nEquation: \n' +
-                      exponential_equation_of_best_fit(self._ind_filename2,
-                                                       self._dep_filename))
-
-        plt.draw()
+        self._plot_curve('exponential', 1)
 
     def exponential3(self, _: Event) -> None:
         """Plot the scatter plot and the exponential curve of best fit
         for the data in df3."""
-        ax = exponential_curve_fitting_and_plotting(self._ind_filename3,
-                                                    self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        ax.set_xlabel(self._df3.columns[0] + '\n\nEquation: \n' +
-                      exponential_equation_of_best_fit(self._ind_filename3,
-                                                       self._dep_filename))
-
-        plt.draw()
+        self._plot_curve('exponential', 2)
 
     def quadratic1(self, _: Event) -> None:
         """Plot the scatter plot and the quadratic curve of best fit
         for the data in df1."""
-        ax = quadratic_curve_fitting_and_plotting(self._ind_filename1,
-                                                  self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        ax.set_xlabel(self._df1.columns[0] + '\n\nEquation: \n' +
-                      quadratic_equation_of_best_fit(self._ind_filename1,
-                                                     self._dep_filename))
-
-        plt.draw()
+        self._plot_curve('quadratic', 0)
 
     def quadratic2(self, _: Event) -> None:
         """Plot the scatter plot and the quadratic curve of best fit
         for the data in df2."""
-        ax = quadratic_curve_fitting_and_plotting(self._ind_filename2,
-                                                  self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        ax.set_xlabel(self._df2.columns[0] + '\n\nEquation: \n' +
-                      quadratic_equation_of_best_fit(self._ind_filename2,
-                                                     self._dep_filename))
-
-        plt.draw()
+        self._plot_curve('quadratic', 1)
 
     def quadratic3(self, _: Event) -> None:
         """Plot the scatter plot and the quadratic curve of best fit
         for the data in df3."""
-        ax = quadratic_curve_fitting_and_plotting(self._ind_filename3,
-                                                  self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        ax.set_xlabel(self._df3.columns[0] + '\n\nEquation: \n' +
-                      quadratic_equation_of_best_fit(self._ind_filename3,
-                                                     self._dep_filename))
-
-        plt.draw()
+        self._plot_curve('quadratic', 2)
 
     def cubic1(self, _: Event) -> None:
         """Plot the scatter plot and the cubic curve of best fit
         for the data in df1."""
-        ax = cubic_curve_fitting_and_plotting(self._ind_filename1,
-                                              self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        ax.set_xlabel(self._df1.columns[0] + '\n\nEquation: \n' +
-                      cubic_equation_of_best_fit(self._ind_filename1,
-                                                 self._dep_filename))
-
-        plt.draw()
+        self._plot_curve('cubic', 0)
 
     def cubic2(self, _: Event) -> None:
         """Plot the scatter plot and the cubic curve of best fit
         for the data in df2."""
-        ax = cubic_curve_fitting_and_plotting(self._ind_filename2,
-                                              self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
-
-        ax.set_xlabel(self._df2.columns[0] + '\n\nEquation: \n' +
-                      cubic_equation_of_best_fit(self._ind_filename2,
-                                                 self._dep_filename))
-
-        plt.draw()
+        self._plot_curve('cubic', 1)
 
     def cubic3(self, _: Event) -> None:
         """Plot the scatter plot and the cubic curve of best fit
         for the data in df3."""
-        ax = cubic_curve_fitting_and_plotting(self._ind_filename3, self._dep_filename)
-        plt.subplots_adjust(bottom=0.25)
+        self._plot_curve('cubic', 2)
 
-        ax.set_xlabel(self._df3.columns[0] + '\n\nEquation: ' +
-                      cubic_equation_of_best_fit(self._ind_filename3, self._dep_filename))
+    def _factor(self, index: int) -> Tuple[str, pd.DataFrame]:
+        """Return the filename and DataFrame of the factor at index."""
+        return [(self._ind_filename1, self._df1), (self._ind_filename2, self._df2),
+                (self._ind_filename3, self._df3)][index]
 
-        plt.draw()
+    def _plot_line(self, index: int) -> None:
+        """Plot the scatter plot and line of best fit for the factor at index, labelled with
+        its correlation, equation and R squared value."""
+        ind_filename, df = self._factor(index)
+        with instrumentation.span('button.line', 'ui', factor=df.columns[0]):
+            line_equation, correlation, r_squared = self._results.line(index)
+            ax = linear_curve_fitting_and_plotting(ind_filename, self._dep_filename)
+            plt.subplots_adjust(bottom=0.25)
+
+            ax.set_xlabel(df.columns[0] + '\nCorrelation of Data: ' + str(correlation) +
+                          '\nEquation of line fit: ' + line_equation +
+                          '\nR Squared Value: ' + str(r_squared))
+            _draw_chart(ax)
+
+    def _plot_curve(self, model: str, index: int) -> None:
+        """Plot the scatter plot and the curve of best fit of model for the factor at index,
+        labelled with its equation."""
+        ind_filename, df = self._factor(index)
+        with instrumentation.span('button.' + model, 'ui', factor=df.columns[0]):
+            equation = self._results.curve(model, index)
+            ax = CURVE_PLOTTING_FUNCTIONS[model](ind_filename, self._dep_filename)
+            plt.subplots_adjust(bottom=0.25)
+
+            ax.set_xlabel(df.columns[0] + '\n\nEquation: \n' + equation)
+
+            _draw_chart(ax)
+
+
+def _draw_chart(ax: Axes) -> None:
+    """Draw the figure of ax now rather than when the window is next idle, so the time
+    taken to render it is recorded, and open its window without blocking."""
+    with instrumentation.span('render.draw', 'render'):
+        ax.figure.canvas.draw()
+    plt.show(block=False)
 
 
 def run_program(ind_filename1: str, ind_filename2: str, ind_filename3: str, dep_filename: str) -> \
@@ -256,18 +209,28 @@ def run_program(ind_filename1: str, ind_filename2: str, ind_filename3: str, dep_
         - ind_filename2 != ''
         - ind_filename3 != ''
         - dep_filename != ''
+
+    Set the CLIMATE_TRACE environment variable to a file path to record how long each stage
+    takes; the trace is written there and a summary printed when the program exits.
     """
-    # creating the dataframes from the given data
-    df1 = create_data_frame(ind_filename1, dep_filename)
-    df2 = create_data_frame(ind_filename2, dep_filename)
-    df3 = create_data_frame(ind_filename3, dep_filename)
+    instrumentation.enable_from_environment()
+
+    # creating the dataframes from the given data, reading each distinct file once and
+    # all of them at the same time
+    df1, df2, df3 = create_data_frames([ind_filename1, ind_filename2, ind_filename3],
+                                       dep_filename)
+
+    # start computing every fit and statistic in the background while the window is built
+    results = ResultStore([ind_filename1, ind_filename2, ind_filename3], dep_filename,
+                          [df1, df2, df3])
+    results.start()
 
     callback = ButtonHandler(ind_filename1, ind_filename2, ind_filename3,
-                             dep_filename, df1, df2, df3)
+                             dep_filename, df1, df2, df3, results)
 
     # buttons and axes for statistics
     axstats = plt.axes([0.0, 0.85, 0.5, 0.10])
-    bstats = Button(axstats, 'General Statistical Analysis')
+    bstats = widgets.Button(axstats, 'General Statistical Analysis')
     bstats.on_clicked(callback.stats)
 
     # axes for line buttons
@@ -276,11 +239,11 @@ def run_program(ind_filename1: str, ind_filename2: str, ind_filename3: str, dep_
     axline3 = plt.axes([0.0, 0.75, 0.5, 0.10])
 
     # buttons for lines
-    bfirst = Button(axline1, 'Line - Factor: ' + df1.columns[0])
+    bfirst = widgets.Button(axline1, 'Line - Factor: ' + df1.columns[0])
     bfirst.on_clicked(callback.line1)
-    bsecond = Button(axline2, 'Line - Factor: ' + df2.columns[0])
+    bsecond = widgets.Button(axline2, 'Line - Factor: ' + df2.columns[0])
     bsecond.on_clicked(callback.line2)
-    bthree = Button(axline3, 'Line - Factor: ' + df3.columns[0])
+    bthree = widgets.Button(axline3, 'Line - Factor: ' + df3.columns[0])
     bthree.on_clicked(callback.line3)
 
     # axes for exponentials
@@ -289,11 +252,11 @@ def run_program(ind_filename1: str, ind_filename2: str, ind_filename3: str, dep_
     ax_exp_third = plt.axes([0.0, 0.25, 0.5, 0.10])
 
     # buttons for exponentials
-    bexp_first = Button(ax_exp_first, 'Exponential - Factor: ' + df1.columns[0])
+    bexp_first = widgets.Button(ax_exp_first, 'Exponential - Factor: ' + df1.columns[0])
     bexp_first.on_clicked(callback.exponential1)
-    bexp_second = Button(ax_exp_second, 'Exponential - Factor: ' + df2.columns[0])
+    bexp_second = widgets.Button(ax_exp_second, 'Exponential - Factor: ' + df2.columns[0])
     bexp_second.on_clicked(callback.exponential2)
-    bexp_third = Button(ax_exp_third, 'Exponential - Factor: ' + df3.columns[0])
+    bexp_third = widgets.Button(ax_exp_third, 'Exponential - Factor: ' + df3.columns[0])
     bexp_third.on_clicked(callback.exponential3)
 
     # axes for quadratics
@@ -302,11 +265,11 @@ def run_program(ind_filename1: str, ind_filename2: str, ind_filename3: str, dep_
     ax_quad_third = plt.axes([0.5, 0.75, 0.5, 0.10])
 
     # buttons for quadratics
-    bquad_first = Button(ax_quad_first, 'Quadratic - Factor: ' + df1.columns[0])
+    bquad_first = widgets.Button(ax_quad_first, 'Quadratic - Factor: ' + df1.columns[0])
     bquad_first.on_clicked(callback.quadratic1)
-    bquad_second = Button(ax_quad_second, 'Quadratic - Factor: ' + df2.columns[0])
+    bquad_second = widgets.Button(ax_quad_second, 'Quadratic - Factor: ' + df2.columns[0])
     bquad_second.on_clicked(callback.quadratic2)
-    bquad_third = Button(ax_quad_third, 'Quadratic - Factor: ' + df3.columns[0])
+    bquad_third = widgets.Button(ax_quad_third, 'Quadratic - Factor: ' + df3.columns[0])
     bquad_third.on_clicked(callback.quadratic3)
 
     # axes for cubics
@@ -315,14 +278,15 @@ def run_program(ind_filename1: str, ind_filename2: str, ind_filename3: str, dep_
     ax_cubic_third = plt.axes([0.5, 0.25, 0.5, 0.10])
 
     # buttons for cubics
-    bcub_first = Button(ax_cubic_first, 'Cubic - Factor: ' + df1.columns[0])
+    bcub_first = widgets.Button(ax_cubic_first, 'Cubic - Factor: ' + df1.columns[0])
     bcub_first.on_clicked(callback.cubic1)
-    bcub_second = Button(ax_cubic_second, 'Cubic - Factor: ' + df2.columns[0])
+    bcub_second = widgets.Button(ax_cubic_second, 'Cubic - Factor: ' + df2.columns[0])
     bcub_second.on_clicked(callback.cubic2)
-    bcub_third = Button(ax_cubic_third, 'Cubic - Factor: ' + df3.columns[0])
+    bcub_third = widgets.Button(ax_cubic_third, 'Cubic - Factor: ' + df3.columns[0])
     bcub_third.on_clicked(callback.cubic3)
 
     plt.show()
+    results.shutdown()
 
     return [bfirst, bsecond, bthree, bstats,
             bexp_first, bexp_second, bexp_third,
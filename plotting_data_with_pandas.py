@@ -1,11 +1,23 @@
 """
 Contains functions for reading in data and plotting data.
 """
+from __future__ import annotations
 
-from typing import List, Tuple
-import pandas as pd
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union, TYPE_CHECKING
 
-from pandas import DataFrame
+import time_alignment
+from dataset_cache import DATASET_CACHE
+from instrumentation import count, span
+from lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
 
 
 def get_name(filename: str) -> str:
@@ -22,111 +34,306 @@ def get_name(filename: str) -> str:
     return new_filename.replace('_', ' ')
 
 
-def check_file_format(filename: str) -> pd.DataFrame:
-    """Check whether the file with filename is a csv doc or excel doc
+def check_file_format(filename: str, sheet_name: Union[int, str] = 0,
+                      usecols: Optional[List[Union[int, str]]] = None) -> pd.DataFrame:
+    """Check whether the file with filename is a csv doc or excel doc, and return its
+    DataFrame, holding only the columns in usecols (all of them if None). Repeat calls are
+    answered from the process-wide dataset cache until the file changes on disk, so the
+    returned DataFrame must not be mutated.
+
+    For Excel workbooks, only the sheet sheet_name is read, and the result is converted once
+    into a binary sidecar next to the workbook, so later runs skip the Excel parse until the
+    workbook changes.
     Preconditions
         - '.csv' or '.xlsx' in filename
     """
     if '.csv' in filename:
-        return read_csv_file(filename)  # checking whether the files are in csv format or excel
+        # checking whether the files are in csv format or excel
+        variant = '' if usecols is None else 'usecols=' + str(usecols)
+        return DATASET_CACHE.load(filename, partial(read_csv_file, usecols=usecols), variant)
 
-    return read_excel_file(filename)
+    variant = 'sheet=' + str(sheet_name) + ';usecols=' + str(usecols)
+    return DATASET_CACHE.load(filename,
+                              partial(read_excel_file, sheet_name=sheet_name, usecols=usecols),
+                              variant, persist=True)
 
 
-def read_excel_file(filename: str) -> pd.DataFrame:
+def read_excel_file(filename: str, sheet_name: Union[int, str] = 0,
+                    usecols: Optional[List[Union[int, str]]] = None) -> pd.DataFrame:
     """Return the DataFrame created by reading in an Excel
-    file with pandas.
+    file with pandas, reading only the sheet sheet_name and the columns in usecols (all of
+    them if None).
     """
-    df_excel = pd.read_excel(filename)
+    with span('read_excel', 'read', file=filename):
+        df_excel = pd.read_excel(filename, sheet_name=sheet_name, usecols=usecols)
+    count('rows_read', len(df_excel))
     return df_excel
 
 
-def read_csv_file(filename: str) -> pd.DataFrame:
+def read_csv_file(filename: str,
+                  usecols: Optional[List[Union[int, str]]] = None) -> pd.DataFrame:
     """Return the DataFrame created by reading in a csv file
-    with pandas.
+    with pandas, reading only the columns in usecols (all of them if None).
     """
-    df_csv = pd.read_csv(filename)
+    with span('read_csv', 'read', file=filename):
+        df_csv = pd.read_csv(filename, usecols=usecols)
+    count('rows_read', len(df_csv))
     return df_csv
 
 
+def is_co2_file(filename: str) -> bool:
+    """Return whether the file with filename holds the monthly CO2 values, judging by its name
+    alone so that the directories it is in do not matter.
+    """
+    return 'CO2' in os.path.basename(filename)
+
+
+def data_columns(filename: str, dependent: bool = False) -> Optional[List[int]]:
+    """Return the positions of the columns the pipeline reads from the file with filename,
+    for the usecols of check_file_format: every column of the CO2 file, the year and the sea
+    levels (columns 0 and 4) of the dependent file, and the year and the values (columns 0
+    and 1) of any other file.
+    """
+    if dependent:
+        return [0, 4]
+    elif is_co2_file(filename):
+        return None  # the year and every monthly value
+    return [0, 1]
+
+
+def co2_processing_array(df: pd.DataFrame, dtype: Any = float) -> np.ndarray:
+    """Process co2 data by taking averages for each year, returning them as a contiguous
+    array of dtype in the reverse of the row order of df. The average of each row is taken
+    over every column after the first, in double precision.
+    This function is only called for CO2 data processing.
+    """
+    with span('extract.co2', 'extract', rows=len(df)):
+        monthly_values = df.iloc[:, 1:].to_numpy(dtype=float)
+        averages = np.ascontiguousarray(monthly_values.mean(axis=1)[::-1], dtype=dtype)
+    count('rows_extracted', len(df))
+    return averages
+
+
 def co2_processing_data(df: pd.DataFrame) -> List:
     """Process co2 data by taking averages for each year.
     This function is only called for CO2 data processing.
     """
-    averages = []
-    for i in range(len(df)):
-        row = [df.loc[i][x] for x in range(1, len(df.loc[i]))]
-        average = sum(row) / len(row)
-        averages.append(average)
+    return co2_processing_array(df).tolist()
 
-    averages.reverse()
 
-    return averages
+def sea_level_data_array(data_df: pd.DataFrame, dtype: Any = float) -> np.ndarray:
+    """Return the annual sea level values, taken from the column at index 4 of data_df,
+    as a contiguous array of dtype.
+    """
+    with span('extract.sea_level', 'extract', rows=len(data_df)):
+        values = np.ascontiguousarray(data_df.iloc[:, 4].to_numpy(dtype=dtype))
+    count('rows_extracted', len(data_df))
+    return values
 
 
 def sea_level_data_processing(data_df: pd.DataFrame) -> List[float]:
     """Convert the data from a dataframe object to a list, and return
     the list.
     """
-    annual_values = []
-    for i in range(len(data_df)):
-        annual_values.append(data_df.loc[i][4])
+    return sea_level_data_array(data_df).tolist()
 
-    return annual_values
+
+def filenames_to_arrays(ind_filename: str, dep_filename: str,
+                        dtype: Any = float) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the independent and dependent variables in the files with the filenames as
+    contiguous arrays of dtype, which is float64 by default; float32 halves their memory.
+    The values are paired by the year in the first column of each file, as in
+    filenames_to_aligned_arrays, so the files may cover different years and be in any order.
+    The stats_analysis and curve_fitting functions take these arrays as they are.
+    Preconditions:
+        - ind_filename != ''
+        - dep_filename != ''
+        - np.dtype(dtype) in (np.float32, np.float64)
+    """
+    _, independent_values, dependent_values = \
+        filenames_to_aligned_arrays(ind_filename, dep_filename, dtype=dtype)
+    return (independent_values, dependent_values)
 
 
 def filenames_to_lists(ind_filename: str, dep_filename: str) -> Tuple[List, List]:
-    """Convert the files in the filenames to lists, and return these lists.
+    """Convert the files in the filenames to lists, and return these lists. Prefer
+    filenames_to_arrays, which does not box every value as a Python float.
     Preconditions:
         - ind_filename != ''
         - dep_filename != ''
     """
-    df_independent = check_file_format(ind_filename)  # check file format of both variables
-    df_dependent = check_file_format(dep_filename)
-
-    if 'CO2' in ind_filename:
-        # process CO2 data by computing averages
-        independent_list = co2_processing_data(df_independent)
-    else:
-        independent_list = convert_data_to_list(df_independent)
+    independent_values, dependent_values = filenames_to_arrays(ind_filename, dep_filename)
+    return (independent_values.tolist(), dependent_values.tolist())
 
-    # process sea level data by taking data in the column at index 4
-    dependent_list = sea_level_data_processing(df_dependent)
 
-    return (independent_list, dependent_list)
+def convert_data_to_array(data_df: pd.DataFrame, dtype: Any = float) -> np.ndarray:
+    """Return the values in the column at index 1 of data_df as a contiguous array of
+    dtype.
+    """
+    with span('extract.column', 'extract', rows=len(data_df)):
+        values = np.ascontiguousarray(data_df.iloc[:, 1].to_numpy(dtype=dtype))
+    count('rows_extracted', len(data_df))
+    return values
 
 
 def convert_data_to_list(data_df: pd.DataFrame) -> List[float]:
     """Convert the data from a dataframe object to a list, and
     return the list.
     """
-    annual_values = []
-    for i in range(len(data_df)):
-        annual_values.append(data_df.loc[i][1])
+    return convert_data_to_array(data_df).tolist()
 
-    return annual_values
 
-
-def create_data_frame(ind_filename: str, dep_filename: str) -> DataFrame:
+def create_data_frame(ind_filename: str, dep_filename: str, dtype: Any = float) -> DataFrame:
     """Return a dataframe containing the data needed to graph a dependent variable
-    against and an independent variable using pandas.
+    against and an independent variable using pandas, with columns of dtype. Its rows are
+    the years both files have data for, paired by year and indexed by year.
     """
     independent_name = get_name(ind_filename)  # title for x-axis
 
-    df_independent = check_file_format(ind_filename)  # check format of each file
-    df_dependent = check_file_format(dep_filename)  # and convert to datafame object
+    years, independent_values, dependent_values = \
+        filenames_to_aligned_arrays(ind_filename, dep_filename, dtype=dtype)
 
-    if 'CO2' in ind_filename:
-        independent_list = co2_processing_data(df_independent)
-    else:
-        independent_list = convert_data_to_list(df_independent)
+    new_df = pd.DataFrame({independent_name: independent_values,
+                           'Global Mean Sea Levels': dependent_values},
+                          index=pd.Index(years, name='Year'))
 
-    dependent_list = sea_level_data_processing(df_dependent)
+    return new_df
 
-    new_df = pd.DataFrame({independent_name: independent_list,
-                           'Global Mean Sea Levels': dependent_list})
 
-    return new_df
+def load_files(filenames: Iterable[str], workers: Optional[int] = None,
+               dep_filename: Optional[str] = None) -> Dict[str, DataFrame]:
+    """Return the DataFrame of every file in filenames, keyed by filename, reading each
+    distinct file once, and the distinct files concurrently on a pool of threads (one per file
+    if workers is None). Only the data_columns of each file are read, dep_filename being the
+    dependent file.
+
+    Names referring to the same file, e.g. a relative and an absolute path, are read once.
+    The DataFrames are also left in the dataset cache, so later calls of check_file_format on
+    the same files and columns do not read them again.
+    Preconditions:
+        - workers is None or workers > 0
+    """
+    filenames = list(filenames)
+    paths = {filename: os.path.abspath(filename) for filename in filenames}
+    distinct = list(dict.fromkeys(paths.values()))
+    if not distinct:
+        return {}
+    dep_path = None if dep_filename is None else os.path.abspath(dep_filename)
+
+    def read(path: str) -> DataFrame:
+        """Read the data columns of the file at path."""
+        return check_file_format(path, usecols=data_columns(path, path == dep_path))
+
+    with span('load_files', 'read', files=len(distinct)):
+        with ThreadPoolExecutor(max_workers=workers or len(distinct),
+                                thread_name_prefix='load') as executor:
+            frames = dict(zip(distinct, executor.map(read, distinct)))
+    return {filename: frames[path] for filename, path in paths.items()}
+
+
+def create_data_frames(ind_filenames: List[str], dep_filename: str,
+                       workers: Optional[int] = None, dtype: Any = float) -> List[DataFrame]:
+    """Return the create_data_frame, with columns of dtype, of each independent file in
+    ind_filenames against dep_filename. Each frame holds every year its own file and
+    dep_filename have data for, the same rows fit_model fits; use common_years to restrict
+    them to the years every file has data for, e.g. for stats_analysis.multiple_lin_reg.
+
+    The distinct files are read concurrently with load_files first, so the dependent file is
+    parsed once and the whole load takes about as long as its slowest file.
+    Preconditions:
+        - ind_filenames != []
+        - dep_filename != ''
+    """
+    load_files(list(ind_filenames) + [dep_filename], workers, dep_filename)
+    return [create_data_frame(ind_filename, dep_filename, dtype)
+            for ind_filename in ind_filenames]
+
+
+def common_years(dfs: List[DataFrame]) -> List[DataFrame]:
+    """Return the frames in dfs, as returned by create_data_frames, restricted to the years
+    every frame has a row for, so they have the same rows and the same target values and can
+    be used together by stats_analysis.multiple_lin_reg.
+    Preconditions:
+        - dfs != []
+    """
+    with span('align', 'extract', files=len(dfs)):
+        _, positions = time_alignment.align(*((df.index.to_numpy(), np.arange(len(df)))
+                                              for df in dfs))
+    return [df if len(position) == len(df) else df.iloc[position]
+            for df, position in zip(dfs, positions)]
+
+
+def co2_monthly_series(df: pd.DataFrame) -> time_alignment.Series:
+    """Return the keys and values of the monthly CO2 values in df, one per month in the
+    middle of that month, with the year in the first column and one month per column after it.
+    This function is only called for CO2 data processing.
+    """
+    years = df.iloc[:, 0].to_numpy(dtype=float)
+    monthly_values = df.iloc[:, 1:].to_numpy(dtype=float)
+    months = monthly_values.shape[1]
+    offsets = (np.arange(months) + 0.5) / months
+    return ((years[:, np.newaxis] + offsets).ravel(), monthly_values.ravel())
+
+
+def keyed_column(data_df: pd.DataFrame, column: int) -> time_alignment.Series:
+    """Return the values in the column at index column of data_df, keyed by the years in its
+    first column.
+    """
+    return (data_df.iloc[:, 0].to_numpy(dtype=float),
+            data_df.iloc[:, column].to_numpy(dtype=float))
+
+
+def co2_annual_series(df: pd.DataFrame) -> time_alignment.Series:
+    """Return the years in the first column of df, and the average of the monthly values in
+    every column after it for each year, in double precision, in the row order of df.
+    This function is only called for CO2 data processing.
+    """
+    with span('extract.co2', 'extract', rows=len(df)):
+        averages = df.iloc[:, 1:].to_numpy(dtype=float).mean(axis=1)
+    return (df.iloc[:, 0].to_numpy(dtype=float), averages)
+
+
+def filenames_to_aligned_arrays(ind_filename: str, dep_filename: str, start: Optional[Any] = None,
+                                stop: Optional[Any] = None, annual: bool = False,
+                                dtype: Any = float) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the years both files have data for, and the independent and dependent
+    variables in those years as contiguous arrays of dtype, restricted to the years from
+    start to stop if they are given. Years in which either variable is missing (NaN) are
+    left out.
+
+    The values are paired by the year in the first column of each file rather than by row,
+    so the files may cover different years and be in any order; the values of a year that
+    appears in several rows are averaged. If annual is True, every series is first resampled
+    to annual means, so that files holding monthly and annual data can be paired.
+    Preconditions:
+        - ind_filename != ''
+        - dep_filename != ''
+        - np.dtype(dtype) in (np.float32, np.float64)
+    """
+    df_independent = check_file_format(ind_filename, usecols=data_columns(ind_filename))
+    df_dependent = check_file_format(dep_filename, usecols=data_columns(dep_filename, True))
+
+    with span('align', 'extract'):
+        if is_co2_file(ind_filename) and annual:
+            ind_series = co2_monthly_series(df_independent)
+        elif is_co2_file(ind_filename):
+            ind_series = co2_annual_series(df_independent)
+        else:
+            ind_series = keyed_column(df_independent, 1)
+        dep_series = keyed_column(df_dependent, 1)  # the sea levels, read from column 4
+
+        resampled = []
+        for keys, values in (ind_series, dep_series):
+            labels = time_alignment.annual_labels(keys) if annual else keys
+            keys, values = time_alignment.resample(labels, values)
+            resampled.append(time_alignment.filter_range(keys, values, start, stop))
+        years, (independent_values, dependent_values) = time_alignment.drop_missing(
+            *time_alignment.align(*resampled))
+        count('rows_extracted', len(df_independent) + len(df_dependent))
+
+    return (years, np.ascontiguousarray(independent_values, dtype=dtype),
+            np.ascontiguousarray(dependent_values, dtype=dtype))
 
 
 if __name__ == '__main__':
@@ -138,8 +345,11 @@ if __name__ == '__main__':
 
     python_ta.check_all(config={
         'allowed-io': ['read_csv_data'],
-        'extra-imports': ['python_ta.contracts', 'csv', 'datetime',
-                          'plotly.graph_objects', 'plotly.subplots', 'pandas'],
+        'extra-imports': ['python_ta.contracts', 'csv', 'datetime', 'os',
+                          'concurrent.futures', 'functools', 'plotly.graph_objects',
+                          'plotly.subplots', 'pandas',
+                          'dataset_cache', 'instrumentation', 'lazy_imports',
+                          'time_alignment'],
         'max-line-length': 100,
         'max-args': 6,
         'max-locals': 25,
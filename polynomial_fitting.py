@@ -0,0 +1,206 @@
+"""
+Contains a direct least-squares solver for polynomial models.
+
+Polynomial models are linear in their parameters, so they can be fitted exactly by one QR
+decomposition of the Vandermonde matrix instead of scipy's iterative curve_fit. The x values
+are centred and scaled to [-1, 1] before the matrix is built, which keeps it well conditioned
+even for x values such as years or CO2 concentrations in the hundreds or thousands. Several
+dependent series sharing the same x values are fitted in the same solve.
+
+Series too long to hold in memory, such as memory-mapped columns, are fitted one chunk at a
+time by fit_polynomial_chunks, which only ever keeps a small triangular factor between chunks.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from math import comb
+from typing import Iterable, Iterator, Sequence, Tuple
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+linalg = lazy_import('scipy.linalg')
+
+
+@dataclass
+class PolynomialFit:
+    """The least-squares polynomial fit of one or more dependent series.
+
+    Instance Attributes:
+        - degree: the degree of the fitted polynomial
+        - coefficients: the coefficients of x ** 0, x ** 1, ..., x ** degree, with one column per
+            dependent series if several were fitted
+        - covariance: the estimated covariance of the coefficients, with a leading axis of one
+            matrix per dependent series if several were fitted
+        - residual_sum_squares: the sum of squared residuals of each dependent series
+    """
+    degree: int
+    coefficients: np.ndarray
+    covariance: np.ndarray
+    residual_sum_squares: np.ndarray
+
+    def predict(self, x_values: Iterable[float]) -> np.ndarray:
+        """Return the values of the fitted polynomial(s) at x_values."""
+        x_array = np.asarray(x_values, dtype=float)
+        if self.coefficients.ndim == 2:
+            x_array = x_array[..., None]  # one column of predictions per series
+        result = np.zeros(np.broadcast_shapes(x_array.shape, self.coefficients.shape[1:]))
+        # Horner's scheme, one array operation per coefficient
+        for coefficient in self.coefficients[::-1]:
+            result = result * x_array + coefficient
+        return result
+
+
+def scaling(x_values: np.ndarray) -> Tuple[float, float]:
+    """Return the centre and half-width that map x_values onto [-1, 1]."""
+    low, high = float(np.min(x_values)), float(np.max(x_values))
+    half_width = (high - low) / 2
+    return (low + high) / 2, half_width if half_width > 0 else 1.0
+
+
+def scaled_vandermonde(x_values: np.ndarray, degree: int, centre: float,
+                       half_width: float) -> np.ndarray:
+    """Return the Vandermonde matrix, with increasing powers, of the scaled x values."""
+    return np.vander((x_values - centre) / half_width, degree + 1, increasing=True)
+
+
+def unscaling_matrix(degree: int, centre: float, half_width: float) -> np.ndarray:
+    """Return the matrix T such that T @ b gives the coefficients in powers of x of the
+    polynomial whose coefficients in powers of (x - centre) / half_width are b.
+    """
+    transform = np.zeros((degree + 1, degree + 1))
+    for j in range(degree + 1):
+        for i in range(j + 1):
+            transform[i, j] = comb(j, i) * (-centre) ** (j - i) / half_width ** j
+    return transform
+
+
+def fit_polynomial(x_values: Iterable[float], y_values: Iterable, degree: int) -> PolynomialFit:
+    """Return the least-squares polynomial of the given degree through x_values and y_values.
+    y_values may be a single series or a 2D array with one dependent series per column.
+    Preconditions:
+        - degree >= 0
+        - len(x_values) == len(y_values)
+    """
+    x_array = np.asarray(x_values, dtype=float)
+    y_array = np.asarray(y_values, dtype=float)
+    single_series = y_array.ndim == 1
+    y_matrix = y_array.reshape(y_array.shape[0], -1)
+    if x_array.shape[0] != y_matrix.shape[0]:
+        raise ValueError('x_values and y_values must have the same length')
+    if x_array.size <= degree:
+        raise ValueError('at least degree + 1 points are needed to fit a polynomial')
+
+    centre, half_width = scaling(x_array)
+    q_matrix, r_matrix = np.linalg.qr(scaled_vandermonde(x_array, degree, centre, half_width))
+    scaled_coefficients = linalg.solve_triangular(r_matrix, q_matrix.T @ y_matrix)
+
+    residuals = y_matrix - q_matrix @ (r_matrix @ scaled_coefficients)
+    residual_sum_squares = np.einsum('ij,ij->j', residuals, residuals)
+
+    coefficients, covariance = _unscaled_solution(r_matrix, scaled_coefficients,
+                                                  residual_sum_squares, x_array.size,
+                                                  centre, half_width)
+    if single_series:
+        return PolynomialFit(degree, coefficients[:, 0], covariance[0], residual_sum_squares[0])
+    return PolynomialFit(degree, coefficients, covariance, residual_sum_squares)
+
+
+def fit_polynomial_chunks(x_values: Sequence[float], y_values: Sequence[float], degree: int,
+                          chunk_rows: int = 2 ** 20) -> PolynomialFit:
+    """Return the least-squares polynomial of the given degree through x_values and y_values,
+    reading them chunk_rows values at a time, so that they can be memory-mapped arrays larger
+    than memory.
+
+    This is a tall-skinny QR: each chunk's scaled Vandermonde matrix, with y appended as an
+    extra column, is stacked under the triangular factor of the chunks before it and
+    factorized again. The final factor holds R, Q^T y and the residual norm, so the data is
+    read twice (once for the scaling) and never held in memory as a whole.
+    Preconditions:
+        - degree >= 0
+        - len(x_values) == len(y_values)
+        - chunk_rows > 0
+    """
+    if len(x_values) != len(y_values):
+        raise ValueError('x_values and y_values must have the same length')
+    if len(x_values) <= degree:
+        raise ValueError('at least degree + 1 points are needed to fit a polynomial')
+
+    low, high = np.inf, -np.inf
+    for x_chunk, _ in iter_chunks(x_values, y_values, chunk_rows):
+        low, high = min(low, float(np.min(x_chunk))), max(high, float(np.max(x_chunk)))
+    centre, half_width = scaling(np.array([low, high]))
+
+    factor = np.empty((0, degree + 2))
+    for x_chunk, y_chunk in iter_chunks(x_values, y_values, chunk_rows):
+        block = np.column_stack([scaled_vandermonde(x_chunk, degree, centre, half_width),
+                                 y_chunk])
+        factor = np.linalg.qr(np.vstack([factor, block]), mode='r')
+
+    r_matrix = factor[:degree + 1, :degree + 1]
+    scaled_coefficients = linalg.solve_triangular(r_matrix, factor[:degree + 1, degree + 1:])
+    residual_sum_squares = np.array([factor[degree + 1, degree + 1] ** 2
+                                     if factor.shape[0] > degree + 1 else 0.0])
+
+    coefficients, covariance = _unscaled_solution(r_matrix, scaled_coefficients,
+                                                  residual_sum_squares, len(x_values),
+                                                  centre, half_width)
+    return PolynomialFit(degree, coefficients[:, 0], covariance[0], residual_sum_squares[0])
+
+
+def iter_chunks(x_values: Sequence[float], y_values: Sequence[float],
+                chunk_rows: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Yield consecutive (x, y) chunks of at most chunk_rows values of x_values and y_values
+    as float arrays.
+    Preconditions:
+        - chunk_rows > 0
+    """
+    for start in range(0, len(x_values), chunk_rows):
+        yield (np.asarray(x_values[start:start + chunk_rows], dtype=float),
+               np.asarray(y_values[start:start + chunk_rows], dtype=float))
+
+
+def _unscaled_solution(r_matrix: np.ndarray, scaled_coefficients: np.ndarray,
+                       residual_sum_squares: np.ndarray, points: int, centre: float,
+                       half_width: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the coefficients in powers of x, one column per series, and their covariance,
+    one matrix per series, of the fit with triangular factor r_matrix whose coefficients in
+    the scaled basis are scaled_coefficients.
+    """
+    degree = r_matrix.shape[0] - 1
+    transform = unscaling_matrix(degree, centre, half_width)
+    coefficients = transform @ scaled_coefficients
+
+    # Cov(b) = s^2 (R^T R)^-1 in the scaled basis, carried over to powers of x by T
+    degrees_of_freedom = points - (degree + 1)
+    r_inverse = linalg.solve_triangular(r_matrix, np.eye(degree + 1))
+    unscaled = transform @ r_inverse
+    base_covariance = unscaled @ unscaled.T
+    if degrees_of_freedom > 0:
+        variances = residual_sum_squares / degrees_of_freedom
+    else:
+        variances = np.full(residual_sum_squares.shape, np.inf)
+    return coefficients, variances[:, None, None] * base_covariance
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'dataclasses', 'math',
+                          'lazy_imports'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,179 @@
+"""
+Contains a store that computes, in the background, every result shown by the buttons of the
+interactive window.
+
+All the fits, equation strings and statistics are submitted to a thread pool as soon as the
+window is created, so by the time a button is clicked its handler usually only has to draw.
+Asking for a result that is not ready yet never fails: if its computation has not started,
+it is taken off the pool and computed straight away; if it is running, the caller waits for
+it to finish instead of repeating the work.
+"""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, TYPE_CHECKING
+
+import stats_analysis
+from curve_equations import cubic_equation_of_best_fit, exponential_equation_of_best_fit, \
+    linear_equation_of_best_fit, quadratic_equation_of_best_fit
+from curve_fitting import MODEL_FUNCTIONS, fit_model
+from plotting_data_with_pandas import common_years
+from residual_analysis import linear_fit_residuals
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+EQUATION_FUNCTIONS: Dict[str, Callable[[str, str], str]] = {
+    'linear': linear_equation_of_best_fit,
+    'quadratic': quadratic_equation_of_best_fit,
+    'cubic': cubic_equation_of_best_fit,
+    'exponential': exponential_equation_of_best_fit,
+}
+
+TARGET_COLUMN = 'Global Mean Sea Levels'
+
+
+def line_statistics(df: pd.DataFrame) -> Tuple[str, float, float]:
+    """Return the equation of the line of best fit, the correlation and the R squared value
+    of the factor in the first column of df against the sea levels.
+    """
+    x_vals = df[df.columns[0]].values
+    y_vals = df[TARGET_COLUMN].values
+    return (stats_analysis.best_fit_regression_equation(x_vals, y_vals),
+            stats_analysis.correlation(x_vals, y_vals),
+            stats_analysis.r_squared(x_vals, y_vals))
+
+
+def curve_equation(ind_filename: str, dep_filename: str, model: str) -> str:
+    """Fit the model named model to the given files and return its equation of best fit."""
+    fit_model(ind_filename, dep_filename, model)
+    return EQUATION_FUNCTIONS[model](ind_filename, dep_filename)
+
+
+def regression_statistics(dfs: List[pd.DataFrame]) -> Tuple[Any, float, float, List[float]]:
+    """Return the coefficients, intercept and R squared value of the multiple linear
+    regression of the sea levels on every factor in dfs, over the years they all have data
+    for, followed by the root mean squared error of each factor's own line of best fit, over
+    all of that factor's years.
+    """
+    coef, intercept, r_2 = stats_analysis.multiple_lin_reg(*common_years(dfs))
+    rmse = [linear_fit_residuals(df[df.columns[0]].values, df[TARGET_COLUMN].values).rmse
+            for df in dfs]
+    return (coef, intercept, r_2, rmse)
+
+
+class ResultStore:
+    """The results shown by the buttons of the interactive window, computed in the
+    background.
+    """
+    # Private Instance Attributes:
+    #   - _tasks: maps the key of each result to the function that computes it
+    #   - _futures: maps the key of each result submitted to the pool to its future
+    #   - _executor: the thread pool computing results, or None if it has not been started
+    #   - _lock: guards _futures when results are requested from several threads
+    _tasks: Dict[Hashable, Callable[[], Any]]
+    _futures: Dict[Hashable, Future]
+    _executor: Optional[ThreadPoolExecutor]
+    _lock: threading.Lock
+
+    def __init__(self, ind_filenames: List[str], dep_filename: str,
+                 dfs: List[pd.DataFrame]) -> None:
+        """Initialize a store of the results for the factors in ind_filenames, whose data
+        against dep_filename is in the DataFrames in dfs. Nothing is computed until start is
+        called or a result is requested.
+        Preconditions:
+            - len(ind_filenames) == len(dfs)
+        """
+        self._tasks = {('regression',): partial(regression_statistics, list(dfs))}
+        for index, (ind_filename, df) in enumerate(zip(ind_filenames, dfs)):
+            self._tasks[('line', index)] = partial(line_statistics, df)
+            for model in MODEL_FUNCTIONS:
+                self._tasks[('curve', model, index)] = \
+                    partial(curve_equation, ind_filename, dep_filename, model)
+        self._futures = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self, workers: Optional[int] = None) -> None:
+        """Start computing every result on a pool of worker threads."""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=workers,
+                                                thread_name_prefix='precompute')
+            for key, task in self._tasks.items():
+                if key not in self._futures:  # not already computed by _get
+                    self._futures[key] = self._executor.submit(task)
+
+    def shutdown(self) -> None:
+        """Stop the pool, dropping any results that have not started computing."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def progress(self) -> Tuple[int, int]:
+        """Return the number of results that are ready and the total number of results."""
+        with self._lock:
+            done = sum(1 for future in self._futures.values()
+                       if future.done() and not future.cancelled())
+        return (done, len(self._tasks))
+
+    def line(self, index: int) -> Tuple[str, float, float]:
+        """Return the line_statistics of the factor at index."""
+        return self._get(('line', index))
+
+    def curve(self, model: str, index: int) -> str:
+        """Return the equation of the curve of best fit of model for the factor at index.
+        The fit itself is then memoized by curve_fitting.fit_model.
+        """
+        return self._get(('curve', model, index))
+
+    def regression(self) -> Tuple[Any, float, float, List[float]]:
+        """Return the regression_statistics of all the factors."""
+        return self._get(('regression',))
+
+    def _get(self, key: Hashable) -> Any:
+        """Return the result for key, computing it now if it has not been started yet."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None or future.cancel():
+                # not submitted yet, or taken off the queue before it started; mark it as
+                # running before releasing the lock so that no other thread can cancel it
+                future = Future()
+                future.set_running_or_notify_cancel()
+                self._futures[key] = future
+                compute_here = True
+            else:
+                compute_here = False
+
+        if compute_here:
+            try:
+                future.set_result(self._tasks[key]())
+            except Exception as error:  # pylint: disable=broad-except
+                future.set_exception(error)
+        return future.result()
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'threading', 'concurrent.futures',
+                          'functools', 'stats_analysis', 'curve_equations', 'curve_fitting',
+                          'plotting_data_with_pandas', 'residual_analysis'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,174 @@
+"""
+Contains a bounded-memory streaming quantile sketch for series too large to hold in memory.
+
+The sketch follows Karnin, Lang and Liberty's KLL design: values are kept in a stack of
+compactors, where an item at level h stands for 2 ** h original values. When a level fills
+up it is sorted and every other item (starting at a random offset) is promoted to the next
+level, halving its size. Lower levels get geometrically smaller capacities, so the sketch
+holds O(k) items no matter how many values are added, and two sketches merge by
+concatenating their levels and compacting again.
+"""
+import math
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from stats_analysis import EmptyDatasetError
+
+# Capacity of each level relative to the one above it.
+_CAPACITY_DECAY = 2.0 / 3.0
+
+
+class QuantileSketch:
+    """A mergeable KLL sketch approximating the quantiles of a stream of values.
+
+    Instance Attributes:
+        - k: the accuracy parameter; larger values give smaller errors and use more memory
+        - n: the number of values added so far
+    """
+    # Private Instance Attributes:
+    #   - _levels: _levels[h] holds the retained items at level h, each standing for
+    #       2 ** h values of the stream
+    #   - _rng: the random generator choosing which half of a level is promoted
+    k: int
+    n: int
+    _levels: List[np.ndarray]
+    _rng: np.random.Generator
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None) -> None:
+        """Initialize an empty sketch.
+        Preconditions:
+            - k >= 8
+        """
+        self.k = k
+        self.n = 0
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def normalized_rank_error(self) -> float:
+        """The a-priori bound on the rank error of quantile(), as a fraction of n.
+
+        Ranks of answers are within this fraction of their exact rank with about 99%
+        confidence. The constants are the empirical characterisation of KLL published with
+        the Apache DataSketches library.
+        """
+        return 2.296 / self.k ** 0.9723
+
+    @property
+    def num_retained(self) -> int:
+        """The number of items currently stored by the sketch."""
+        return sum(level.size for level in self._levels)
+
+    def add(self, value: float) -> None:
+        """Add a single value to the sketch."""
+        self.update([value])
+
+    def update(self, values: Iterable[float]) -> None:
+        """Add every value in values to the sketch."""
+        array = np.asarray(values, dtype=float).ravel()
+        start = 0
+        while start < array.size:
+            # feed level 0 in blocks of at most k items; compacting a block of k items at the
+            # bottom level adds no more rank error than compacting the top level would
+            room = max(self.k - self._levels[0].size, 1)
+            piece = array[start:start + room]
+            self._levels[0] = np.concatenate((self._levels[0], piece))
+            self.n += piece.size
+            start += piece.size
+            if self._levels[0].size >= self._capacity(0):
+                self._compact(0)
+            self._compress()
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Add every value summarized by other to this sketch.
+        Preconditions:
+            - self.k == other.k
+        """
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for h, level in enumerate(other._levels):
+            self._levels[h] = np.concatenate((self._levels[h], level))
+        self.n += other.n
+        self._compress()
+
+    def quantile(self, q: float) -> float:
+        """Return an approximation of the q-th quantile of the values added so far.
+        Preconditions:
+            - 0.0 <= q <= 1.0
+        """
+        items, cumulative_weights = self._sorted_view()
+        target = q * self.n
+        index = int(np.searchsorted(cumulative_weights, target, side='left'))
+        return float(items[min(index, items.size - 1)])
+
+    def rank(self, value: float) -> float:
+        """Return an approximation of the fraction of added values that are <= value."""
+        items, cumulative_weights = self._sorted_view()
+        index = int(np.searchsorted(items, value, side='right'))
+        if index == 0:
+            return 0.0
+        return float(cumulative_weights[index - 1] / self.n)
+
+    def _sorted_view(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the retained items in sorted order together with their cumulative
+        weights.
+        """
+        if self.n == 0:
+            raise EmptyDatasetError
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(level.size, 2.0 ** h)
+                                  for h, level in enumerate(self._levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def _capacity(self, h: int) -> int:
+        """Return the number of items level h may hold before it is compacted."""
+        depth = len(self._levels) - h - 1
+        return max(2, int(math.ceil(self.k * _CAPACITY_DECAY ** depth)))
+
+    def _compress(self) -> None:
+        """Compact full levels, lowest first, until the sketch is within its total
+        capacity.
+        """
+        while self.num_retained > sum(self._capacity(h) for h in range(len(self._levels))):
+            for h, level in enumerate(self._levels):
+                if level.size >= self._capacity(h):
+                    self._compact(h)
+                    break
+            else:
+                return
+
+    def _compact(self, h: int) -> None:
+        """Sort level h and promote every other item of it to level h + 1."""
+        if h + 1 == len(self._levels):
+            self._levels.append(np.empty(0))
+        level = np.sort(self._levels[h])
+        # an odd item out stays behind, so the total weight of the sketch is preserved
+        keep = level[level.size - level.size % 2:]
+        offset = int(self._rng.integers(2))
+        promoted = level[offset:level.size - level.size % 2:2]
+        self._levels[h] = keep
+        self._levels[h + 1] = np.concatenate((self._levels[h + 1], promoted))
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'math', 'numpy', 'stats_analysis'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,114 @@
+"""
+Contains functions for measuring how well fitted models predict the observed data.
+
+A fitted model is any callable that maps an array of x values to an array of predicted y
+values in one vectorized call. Residuals are always paired: the prediction at x_values[i] is
+compared with y_values[i].
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, TYPE_CHECKING
+
+from lazy_imports import lazy_import
+from stats_analysis import BivariateAccumulator, EmptyDatasetError
+
+if TYPE_CHECKING:
+    import numpy
+
+np = lazy_import('numpy')
+
+Predictor = Callable[['numpy.ndarray'], 'numpy.ndarray']
+
+
+@dataclass
+class ResidualSummary:
+    """The paired residuals of a model's predictions and the error measures derived from them.
+
+    Instance Attributes:
+        - residuals: the observed minus the predicted value at each x value
+        - rmse: the root mean squared error
+        - mae: the mean absolute error
+        - max_error: the largest absolute error
+    """
+    residuals: np.ndarray
+    rmse: float
+    mae: float
+    max_error: float
+
+
+def residual_summary(model: Predictor, x_values: Iterable[float],
+                     y_values: Iterable[float]) -> ResidualSummary:
+    """Return the residual summary of model against the aligned x_values and y_values.
+    Preconditions:
+        - len(x_values) == len(y_values)
+        - len(x_values) != 0
+    """
+    return residual_summaries([model], x_values, y_values)[0]
+
+
+def residual_summaries(models: List[Predictor], x_values: Iterable[float],
+                       y_values: Iterable[float]) -> List[ResidualSummary]:
+    """Return the residual summary of every model in models against the same aligned
+    x_values and y_values. The predictions are stacked into one matrix, so the residuals and
+    error measures of every model are computed in a single vectorized pass.
+    Preconditions:
+        - len(x_values) == len(y_values)
+        - len(x_values) != 0
+    """
+    x_array = np.asarray(x_values, dtype=float)
+    y_array = np.asarray(y_values, dtype=float)
+    if x_array.shape != y_array.shape:
+        raise ValueError('x_values and y_values must have the same length')
+    if x_array.size == 0:
+        raise EmptyDatasetError
+
+    predictions = np.empty((len(models), x_array.size))
+    for i, model in enumerate(models):
+        predictions[i] = model(x_array)
+
+    residuals = y_array - predictions
+    absolute = np.abs(residuals)
+    rmse = np.sqrt(np.einsum('ij,ij->i', residuals, residuals) / x_array.size)
+    mae = absolute.mean(axis=1)
+    max_error = absolute.max(axis=1)
+
+    return [ResidualSummary(residuals[i], float(rmse[i]), float(mae[i]), float(max_error[i]))
+            for i in range(len(models))]
+
+
+def linear_fit_residuals(x_values: Iterable[float], y_values: Iterable[float]) \
+        -> ResidualSummary:
+    """Return the residual summary of the least-squares line of best fit of y_values against
+    x_values.
+    Preconditions:
+        - len(x_values) == len(y_values)
+        - len(x_values) > 1
+    """
+    x_array = np.asarray(x_values, dtype=float)
+    accumulator = BivariateAccumulator(x_array, y_values)
+    slope, intercept = accumulator.slope, accumulator.intercept
+    return residual_summary(lambda x: slope * x + intercept, x_array, y_values)
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'dataclasses', 'lazy_imports',
+                          'stats_analysis'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,262 @@
+"""
+Contains functions for the line of best fit over a sliding window of a time-ordered series.
+
+rolling_regression computes the slope, intercept, correlation and R squared value of every
+window of a whole series at once: the sums the line of best fit needs are running (prefix)
+sums, so the sums over any window are the difference of two of them, and every window costs
+the same few array operations however long it is. RollingRegression keeps the same sums for
+a window that observations are pushed into one at a time, such as a live feed, adding and
+removing an observation in constant time.
+
+The values are shifted by a local mean before they are summed, and RollingRegression
+updates the means and centred sums of its window directly (Welford's method, run forwards to
+add an observation and backwards to remove one), recomputing them exactly from the window
+every window observations. This keeps the sums of squares from losing precision to values
+such as years, timestamps or CO2 concentrations that are large compared to their spread,
+however long the series or stream is.
+"""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Tuple, TYPE_CHECKING
+
+from lazy_imports import lazy_import
+from stats_analysis import EmptyDatasetError
+
+if TYPE_CHECKING:
+    import numpy
+
+np = lazy_import('numpy')
+
+
+@dataclass
+class RollingResult:
+    """The line of best fit of every window of a series.
+
+    Instance Attributes:
+        - starts: the position in the series of the first observation of each window
+        - window: the number of observations in each window
+        - slope: the slope of the line of best fit of each window
+        - intercept: the y-intercept of the line of best fit of each window
+        - correlation: the correlation of x and y in each window
+        - r_squared: the coefficient of determination of each window
+    """
+    starts: numpy.ndarray
+    window: int
+    slope: numpy.ndarray
+    intercept: numpy.ndarray
+    correlation: numpy.ndarray
+    r_squared: numpy.ndarray
+
+
+def _window_sums(values: numpy.ndarray, starts: numpy.ndarray, window: int) -> numpy.ndarray:
+    """Return the sum of values over each window of the given length starting at starts."""
+    prefix = np.concatenate([[0.0], np.cumsum(values)])
+    return prefix[starts + window] - prefix[starts]
+
+
+def _segment_regression(x_values: numpy.ndarray, y_values: numpy.ndarray, starts: numpy.ndarray,
+                        window: int) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """Return the slope, intercept and correlation of each window of the given length starting
+    at starts, from running sums of x_values and y_values shifted by their means.
+    """
+    x_shift, y_shift = x_values.mean(), y_values.mean()
+    x_centred = x_values - x_shift
+    y_centred = y_values - y_shift
+
+    sum_x = _window_sums(x_centred, starts, window)
+    sum_y = _window_sums(y_centred, starts, window)
+    # centred sums of squares and products of each window
+    s_xx = _window_sums(x_centred * x_centred, starts, window) - sum_x * sum_x / window
+    s_yy = _window_sums(y_centred * y_centred, starts, window) - sum_y * sum_y / window
+    s_xy = _window_sums(x_centred * y_centred, starts, window) - sum_x * sum_y / window
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = s_xy / s_xx
+        correlation = s_xy / np.sqrt(s_xx * s_yy)
+    intercept = (sum_y / window + y_shift) - slope * (sum_x / window + x_shift)
+    return slope, intercept, correlation
+
+
+def rolling_regression(x_values: numpy.ndarray, y_values: numpy.ndarray, window: int,
+                       step: int = 1) -> RollingResult:
+    """Return the line of best fit of every window of window consecutive observations of
+    x_values and y_values, starting a new window every step observations.
+
+    The running sums are restarted, and the values shifted by their local means, every
+    max(16 * window, 1024) observations, so that rounding errors stay proportional to the
+    size of a window rather than the length of the series, even for trending series.
+    Windows in which x or y does not vary have a NaN slope, correlation and R squared value.
+    Preconditions:
+        - len(x_values) == len(y_values)
+        - 2 <= window <= len(x_values)
+        - step > 0
+    """
+    x_array = np.asarray(x_values, dtype=float)
+    y_array = np.asarray(y_values, dtype=float)
+    if x_array.shape != y_array.shape:
+        raise ValueError('x_values and y_values must have the same length')
+    if not 2 <= window <= x_array.size:
+        raise ValueError('window must be at least 2 and at most the length of the series')
+
+    starts = np.arange(0, x_array.size - window + 1, step)
+    slope, intercept, correlation = (np.empty(starts.size) for _ in range(3))
+    block = max(16 * window, 1024)
+    for block_start in range(0, x_array.size - window + 1, block):
+        low, high = np.searchsorted(starts, [block_start, block_start + block])
+        if low == high:
+            continue
+        first, last = starts[low], starts[high - 1] + window
+        slope[low:high], intercept[low:high], correlation[low:high] = _segment_regression(
+            x_array[first:last], y_array[first:last], starts[low:high] - first, window)
+    return RollingResult(starts, window, slope, intercept, correlation, correlation ** 2)
+
+
+class RollingRegression:
+    """The line of best fit of the most recent observations of a stream, up to a maximum
+    window.
+
+    Pushing an observation into a full window removes the oldest one; both take constant
+    time, as only the means and centred sums of the observations in the window are kept.
+    They are recomputed from the window every window pushes, so rounding errors cannot build
+    up over a long stream, at an amortized cost of a constant per push.
+
+    Instance Attributes:
+        - window: the maximum number of observations kept
+    """
+    # Private Instance Attributes:
+    #   - _observations: the (x, y) observations in the window, oldest first
+    #   - _mean_x: the mean of the x values in the window
+    #   - _mean_y: the mean of the y values in the window
+    #   - _s_xx: the sum of the squared deviations of the x values from _mean_x
+    #   - _s_yy: the sum of the squared deviations of the y values from _mean_y
+    #   - _s_xy: the sum of the products of the deviations of the x and y values
+    #   - _updates: the number of pushes since the sums were last recomputed exactly
+    window: int
+    _observations: Deque[Tuple[float, float]]
+    _mean_x: float
+    _mean_y: float
+    _s_xx: float
+    _s_yy: float
+    _s_xy: float
+    _updates: int
+
+    def __init__(self, window: int) -> None:
+        """Initialize an empty window holding at most window observations.
+        Preconditions:
+            - window >= 2
+        """
+        self.window = window
+        self._observations = deque()
+        self._mean_x = self._mean_y = 0.0
+        self._s_xx = self._s_yy = self._s_xy = 0.0
+        self._updates = 0
+
+    def __len__(self) -> int:
+        """Return the number of observations in the window."""
+        return len(self._observations)
+
+    def push(self, x: float, y: float) -> None:
+        """Add an observation, removing the oldest one first if the window is full."""
+        if len(self._observations) == self.window:
+            self.pop()
+        self._observations.append((x, y))
+        self._updates += 1
+        if self._updates >= self.window:
+            self._recompute()
+            return
+        n = len(self._observations)
+        dx = x - self._mean_x
+        dy = y - self._mean_y
+        self._mean_x += dx / n
+        self._mean_y += dy / n
+        self._s_xx += dx * (x - self._mean_x)
+        self._s_yy += dy * (y - self._mean_y)
+        self._s_xy += dx * (y - self._mean_y)
+
+    def pop(self) -> None:
+        """Remove the oldest observation.
+        Preconditions:
+            - len(self) > 0
+        """
+        x, y = self._observations.popleft()
+        n = len(self._observations)
+        if n == 0:
+            self._mean_x = self._mean_y = 0.0
+            self._s_xx = self._s_yy = self._s_xy = 0.0
+            return
+        # Welford's update in reverse: the same deviations, from the means without (x, y)
+        dx = x - self._mean_x
+        dy = y - self._mean_y
+        self._mean_x -= dx / n
+        self._mean_y -= dy / n
+        self._s_xx = max(self._s_xx - dx * (x - self._mean_x), 0.0)
+        self._s_yy = max(self._s_yy - dy * (y - self._mean_y), 0.0)
+        self._s_xy -= dx * (y - self._mean_y)
+
+    def _recompute(self) -> None:
+        """Recompute the means and centred sums exactly from the observations in the
+        window.
+        """
+        n = len(self._observations)
+        self._mean_x = sum(x for x, _ in self._observations) / n
+        self._mean_y = sum(y for _, y in self._observations) / n
+        self._s_xx = self._s_yy = self._s_xy = 0.0
+        for x, y in self._observations:
+            dx, dy = x - self._mean_x, y - self._mean_y
+            self._s_xx += dx * dx
+            self._s_yy += dy * dy
+            self._s_xy += dx * dy
+        self._updates = 0
+
+    def _centred_sums(self) -> Tuple[float, float, float]:
+        """Return the centred sums of squares of x and y, and of their products."""
+        if len(self._observations) < 2:
+            raise EmptyDatasetError
+        return (self._s_xx, self._s_yy, self._s_xy)
+
+    @property
+    def slope(self) -> float:
+        """The slope of the line of best fit of the window."""
+        s_xx, _, s_xy = self._centred_sums()
+        return s_xy / s_xx
+
+    @property
+    def intercept(self) -> float:
+        """The y-intercept of the line of best fit of the window."""
+        return self._mean_y - self.slope * self._mean_x
+
+    @property
+    def correlation(self) -> float:
+        """The correlation of x and y in the window."""
+        s_xx, s_yy, s_xy = self._centred_sums()
+        return s_xy / (s_xx * s_yy) ** 0.5
+
+    @property
+    def r_squared(self) -> float:
+        """The coefficient of determination of the line of best fit of the window."""
+        return self.correlation ** 2
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'collections', 'lazy_imports',
+                          'stats_analysis'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,311 @@
+"""
+Contains a local HTTP service answering queries about the fits and statistics as JSON.
+
+The datasets are read once when the service starts. Every result is computed on a thread pool
+the first time it is asked for and then kept in memory, so repeated queries are answered
+without recomputing anything. Identical queries that arrive while their result is still being
+computed wait for that one computation instead of starting their own.
+
+Endpoints (all GET, parameters in the query string):
+    /health                                  whether the service is up
+    /factors                                 the names of the factors
+    /stats?factor=F                          line of best fit statistics of factor F
+    /fit?factor=F&model=M                    parameters of model M fitted to factor F
+    /predict?factor=F&model=M&x=1,2,3        values of that fitted model at the given x values
+    /regression                              multiple linear regression on every factor
+    /metrics                                 computation, coalescing and cache counters
+A factor is given by its name or its position, e.g. factor=0 or factor=CO2%20Levels.
+
+Run this file directly to start the service, e.g.
+    python service.py Sea_Level.csv CO2_Levels.csv Mean_Global_Temperatures.csv --port 8080
+"""
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import stats_analysis
+from curve_fitting import MODEL_FUNCTIONS, FitResult, fit_model
+from lazy_imports import lazy_import
+from plotting_data_with_pandas import common_years, create_data_frames
+from residual_analysis import linear_fit_residuals
+
+np = lazy_import('numpy')
+
+TARGET_COLUMN = 'Global Mean Sea Levels'
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+
+
+class QueryError(Exception):
+    """Raised when a query cannot be answered because of its parameters.
+
+    Instance Attributes:
+        - status: the HTTP status code to answer with
+    """
+    status: int
+
+    def __init__(self, status: int, message: str) -> None:
+        """Initialize an error answered with status and the given message."""
+        super().__init__(message)
+        self.status = status
+
+
+def _to_json(value: Any) -> Any:
+    """Return value with numpy arrays and scalars replaced by lists and Python numbers."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+class AnalysisService:
+    """The fits and statistics of a set of factors against the sea levels, computed on
+    demand and kept in memory.
+
+    Instance Attributes:
+        - ind_filenames: the files of the factors
+        - dep_filename: the file of the sea levels
+        - computations: the number of results computed
+        - coalesced: the number of queries that waited for an identical query's computation
+        - cache_hits: the number of queries answered from memory
+    """
+    # Private Instance Attributes:
+    #   - _executor: the threads results are computed on
+    #   - _factors: the name, filename and DataFrame of each factor, in order
+    #   - _results: the computed results, by query key
+    #   - _pending: the futures of the results being computed, by query key
+    ind_filenames: List[str]
+    dep_filename: str
+    computations: int
+    coalesced: int
+    cache_hits: int
+    _executor: ThreadPoolExecutor
+    _factors: List[Tuple[str, str, Any]]
+    _results: Dict[Hashable, Any]
+    _pending: Dict[Hashable, asyncio.Future]
+
+    def __init__(self, ind_filenames: List[str], dep_filename: str,
+                 workers: Optional[int] = None) -> None:
+        """Initialize a service for the given files. The files are read by load."""
+        self.ind_filenames = list(ind_filenames)
+        self.dep_filename = dep_filename
+        self.computations = self.coalesced = self.cache_hits = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='service')
+        self._factors = []
+        self._results = {}
+        self._pending = {}
+
+    async def load(self) -> None:
+        """Read every file once, concurrently."""
+        loop = asyncio.get_running_loop()
+        dfs = await loop.run_in_executor(self._executor, create_data_frames,
+                                         self.ind_filenames, self.dep_filename)
+        self._factors = [(df.columns[0], filename, df)
+                         for filename, df in zip(self.ind_filenames, dfs)]
+
+    async def query(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the result for key, calling compute on the thread pool only if it has not
+        been computed and is not being computed already.
+        """
+        if key in self._results:
+            self.cache_hits += 1
+            return self._results[key]
+        if key in self._pending:
+            self.coalesced += 1
+            return await asyncio.shield(self._pending[key])
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, compute)
+        self._pending[key] = future
+        try:
+            result = await future
+        finally:
+            del self._pending[key]
+        self.computations += 1
+        self._results[key] = result
+        return result
+
+    def factor(self, params: Dict[str, str]) -> int:
+        """Return the position of the factor named, or numbered, by the factor parameter."""
+        name = params.get('factor')
+        if name is None:
+            raise QueryError(400, 'missing parameter: factor')
+        if name.isdigit() and int(name) < len(self._factors):
+            return int(name)
+        for index, (factor_name, _, _) in enumerate(self._factors):
+            if factor_name == name:
+                return index
+        raise QueryError(404, 'unknown factor: ' + name)
+
+    @staticmethod
+    def model(params: Dict[str, str]) -> str:
+        """Return the model named by the model parameter."""
+        model = params.get('model')
+        if model not in MODEL_FUNCTIONS:
+            raise QueryError(400, 'model must be one of ' + ', '.join(MODEL_FUNCTIONS))
+        return model
+
+    async def fit(self, index: int, model: str) -> FitResult:
+        """Return the fit of model to the factor at index."""
+        _, filename, _ = self._factors[index]
+        return await self.query(('fit', index, model),
+                                lambda: fit_model(filename, self.dep_filename, model))
+
+    async def handle(self, path: str, params: Dict[str, str]) -> Dict[str, Any]:
+        """Return the JSON answer to a query of path with params.
+        Raise QueryError if the query is not valid.
+        """
+        if path == '/health':
+            return {'status': 'ok'}
+        if path == '/factors':
+            return {'factors': [name for name, _, _ in self._factors]}
+        if path == '/metrics':
+            return {'computations': self.computations, 'coalesced': self.coalesced,
+                    'cache_hits': self.cache_hits, 'cached_results': len(self._results)}
+        if path == '/regression':
+            return await self.query(('regression',), self._regression)
+        if path == '/stats':
+            index = self.factor(params)
+            return await self.query(('stats', index), lambda: self._stats(index))
+        if path == '/fit':
+            index, model = self.factor(params), self.model(params)
+            fit = await self.fit(index, model)
+            return {'factor': self._factors[index][0], 'model': model,
+                    'points': fit.x_values.size, 'parameters': fit.parameters,
+                    'parameter_errors': np.sqrt(np.diag(fit.covariance)),
+                    'rmse': fit.residuals.rmse, 'mae': fit.residuals.mae,
+                    'max_error': fit.residuals.max_error}
+        if path == '/predict':
+            index, model = self.factor(params), self.model(params)
+            try:
+                x_values = [float(x) for x in params.get('x', '').split(',')]
+            except ValueError:
+                raise QueryError(400, 'x must be a comma-separated list of numbers') from None
+            fit = await self.fit(index, model)
+            return {'factor': self._factors[index][0], 'model': model, 'x': x_values,
+                    'y': fit.predict(np.array(x_values))}
+        raise QueryError(404, 'unknown endpoint: ' + path)
+
+    def _stats(self, index: int) -> Dict[str, Any]:
+        """Return the statistics of the line of best fit of the factor at index, over the same
+        years fit fits it to.
+        """
+        name, _, df = self._factors[index]
+        x_values = df[name].to_numpy(dtype=float)
+        y_values = df[TARGET_COLUMN].to_numpy(dtype=float)
+        accumulator = stats_analysis.BivariateAccumulator(x_values, y_values)
+        return {'factor': name, 'points': accumulator.n,
+                'correlation': accumulator.correlation, 'slope': accumulator.slope,
+                'intercept': accumulator.intercept, 'r_squared': accumulator.r_squared,
+                'rmse': linear_fit_residuals(x_values, y_values).rmse,
+                'mean': accumulator.mean_x, 'median': stats_analysis.median(x_values)}
+
+    def _regression(self) -> Dict[str, Any]:
+        """Return the multiple linear regression of the sea levels on every factor."""
+        coefficients, intercept, r_2 = stats_analysis.multiple_lin_reg(
+            *common_years([df for _, _, df in self._factors]))
+        return {'factors': [name for name, _, _ in self._factors],
+                'coefficients': coefficients, 'intercept': intercept, 'r_squared': r_2}
+
+    async def respond(self, target: str) -> Tuple[int, Dict[str, Any]]:
+        """Return the status and JSON body of the answer to a request for target."""
+        parts = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        try:
+            return 200, _to_json(await self.handle(unquote(parts.path), params))
+        except QueryError as error:
+            return error.status, {'error': str(error)}
+        except Exception as error:  # pylint: disable=broad-except
+            return 500, {'error': type(error).__name__ + ': ' + str(error)}
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Answer the HTTP requests sent on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip().lower()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3 or parts[0] != 'GET':
+                    status, body = 400, {'error': 'only GET requests are supported'}
+                else:
+                    status, body = await self.respond(parts[1])
+
+                payload = json.dumps(body).encode('utf-8')
+                keep_alive = headers.get('connection') != 'close'
+                writer.write(f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                             f'Content-Type: application/json\r\n'
+                             f'Content-Length: {len(payload)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+                             .encode('latin-1') + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def shutdown(self) -> None:
+        """Stop the thread pool."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def serve(service: AnalysisService, host: str = '127.0.0.1', port: int = 8080,
+                ready: Optional[Callable[[int], None]] = None) -> None:
+    """Load the datasets of service and answer requests on host and port until cancelled.
+    If ready is given, it is called with the port being listened on once requests can be
+    answered, which is useful with port 0 (any free port).
+    """
+    await service.load()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.shutdown()
+
+
+def main() -> None:
+    """Parse the command line and run the service."""
+    parser = argparse.ArgumentParser(description='JSON service for the climate analysis.')
+    parser.add_argument('dep_filename', help='the sea level file')
+    parser.add_argument('ind_filenames', nargs='+', help='the factor files')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='threads computing results (default: chosen by Python)')
+    args = parser.parse_args()
+
+    service = AnalysisService(args.ind_filenames, args.dep_filename, args.workers)
+
+    def ready(port: int) -> None:
+        """Report that the service is listening."""
+        print(f'Listening on http://{args.host}:{port}', flush=True)
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
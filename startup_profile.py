@@ -0,0 +1,126 @@
+"""
+Contains a harness for measuring how long the analysis modules take to import.
+
+Each measurement runs in a fresh interpreter, so nothing is already cached in sys.modules.
+Run this file directly to print a report, e.g.
+    python startup_profile.py stats_analysis main --top 15
+"""
+import argparse
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import List
+
+DEFAULT_MODULES = ['stats_analysis', 'plotting_data_with_pandas', 'curve_fitting',
+                   'curve_equations', 'main']
+
+# Code timed by basic_stats_milliseconds: importing stats_analysis and using its basic stats
+BASIC_STATS_SNIPPET = '''
+import time
+start = time.perf_counter()
+import stats_analysis
+values = [3.0, 4.0, 6.0, 6.0, 8.0, 9.0, 11.0]
+stats_analysis.mean(values)
+stats_analysis.mode(values)
+stats_analysis.sample_standard_deviation(values)
+print((time.perf_counter() - start) * 1000)
+import sys
+print(' '.join(sys.modules))
+'''
+
+# Libraries that take long enough to import that the basic stats should not load them
+HEAVY_MODULES = ['numpy', 'pandas', 'scipy', 'matplotlib', 'sklearn']
+
+
+@dataclass
+class ImportCost:
+    """The cost of importing one module, as reported by python -X importtime.
+
+    Instance Attributes:
+        - module: the fully qualified name of the module
+        - self_ms: the time spent in the module itself, in milliseconds
+        - cumulative_ms: the time spent in the module and the imports it triggered
+        - depth: how deeply nested the import was, 0 for the module that was asked for
+    """
+    module: str
+    self_ms: float
+    cumulative_ms: float
+    depth: int
+
+
+def import_costs(module: str) -> List[ImportCost]:
+    """Return the cost of importing module in a fresh interpreter followed by the cost of
+    every import it triggered, excluding the interpreter's own startup imports.
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                               capture_output=True, text=True, check=True)
+    costs = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # nested imports are indented by two more spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        costs.append(ImportCost(name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000,
+                                depth))
+
+    # the imports triggered by module are listed, nested, right before module itself
+    end = max(i for i, cost in enumerate(costs) if cost.module == module and cost.depth == 0)
+    start = end
+    while start > 0 and costs[start - 1].depth > 0:
+        start -= 1
+    return [costs[end]] + costs[start:end]
+
+
+def basic_stats_milliseconds() -> float:
+    """Return the time, in milliseconds, taken by a fresh interpreter to import
+    stats_analysis and compute basic statistics of a short list.
+    """
+    return float(_run_basic_stats()[0])
+
+
+def basic_stats_heavy_imports() -> List[str]:
+    """Return the modules in HEAVY_MODULES that a fresh interpreter has imported after
+    importing stats_analysis and computing basic statistics of a short list.
+    """
+    loaded = _run_basic_stats()[1].split()
+    return [module for module in HEAVY_MODULES if module in loaded]
+
+
+def _run_basic_stats() -> List[str]:
+    """Return the lines printed by BASIC_STATS_SNIPPET in a fresh interpreter."""
+    completed = subprocess.run([sys.executable, '-c', BASIC_STATS_SNIPPET],
+                               capture_output=True, text=True, check=True)
+    return completed.stdout.splitlines()
+
+
+def report(modules: List[str], top: int) -> str:
+    """Return a report of the total import time of each module in modules and the top
+    most expensive imports each one triggers.
+    """
+    lines = []
+    for module in modules:
+        costs = import_costs(module)
+        lines.append(f'{module}: {costs[0].cumulative_ms:.1f} ms')
+        for cost in sorted(costs[1:], key=lambda c: c.cumulative_ms, reverse=True)[:top]:
+            lines.append(f'    {cost.cumulative_ms:9.1f} ms  {cost.self_ms:8.1f} ms self  '
+                         f'{cost.module}')
+    lines.append(f'import stats_analysis + basic stats: {basic_stats_milliseconds():.1f} ms')
+    heavy = basic_stats_heavy_imports()
+    if heavy:
+        lines.append('    basic stats imported ' + ', '.join(heavy))
+    return '\n'.join(lines)
+
+
+def main() -> None:
+    """Parse the command line and print the import time report."""
+    parser = argparse.ArgumentParser(description='Per-module import cost report.')
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--top', type=int, default=10,
+                        help='number of most expensive nested imports to list per module')
+    args = parser.parse_args()
+    print(report(args.modules, args.top))
+
+
+if __name__ == '__main__':
+    main()
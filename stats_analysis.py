@@ -1,9 +1,22 @@
 """Module containing functions for statistical analysis."""
+from __future__ import annotations
 
-from typing import List, Tuple, Any
-from math import ceil, sqrt
-from pandas import DataFrame
-from sklearn.linear_model import LinearRegression
+import sys
+from collections import Counter
+from typing import List, Tuple, Any, Iterable, Optional, TYPE_CHECKING
+from math import floor, fsum, sqrt
+
+from instrumentation import count, span
+from lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+np = lazy_import('numpy')
+
+# Number of values converted to double precision at a time when summarizing single precision
+# arrays, which bounds the extra memory used to a small buffer
+UPCAST_CHUNK = 2 ** 16
 
 
 class EmptyDatasetError(Exception):
@@ -14,8 +27,198 @@ class EmptyDatasetError(Exception):
         return 'function cannot be called on an empty dataset'
 
 
+def _numpy_loaded() -> bool:
+    """Return whether numpy has been imported. Until it has, values cannot be an array, and
+    mean, mode and sample_standard_deviation summarize lists in pure Python rather than pay
+    for importing it.
+    """
+    return 'numpy' in sys.modules
+
+
+def float_array(values: Iterable[float]) -> np.ndarray:
+    """Return values as an array: float32 and float64 arrays are returned as they are, without
+    copying, and anything else is converted to float64.
+    """
+    array = np.asarray(values)
+    if array.dtype != np.float64 and array.dtype != np.float32:
+        array = array.astype(float)
+    return array
+
+
+class BivariateAccumulator:
+    """Single-pass summary statistics of paired x and y data.
+
+    Data can be added one observation at a time, as whole arrays, or as a sequence of chunks,
+    and two accumulators can be merged, so partial results computed on separate chunks of a
+    file or in separate worker processes combine into the result for all of the data. The
+    statistics are kept as counts, means and centred second moments (Welford's algorithm with
+    the pairwise update of Chan et al. for chunks), which avoids the cancellation of naive
+    sum-of-squares formulas.
+
+    Instance Attributes:
+        - n: the number of observations added so far
+    """
+    # Private Instance Attributes:
+    #   - _mean_x: the mean of the x values
+    #   - _mean_y: the mean of the y values
+    #   - _m2_x: the sum of squared deviations of the x values from _mean_x
+    #   - _m2_y: the sum of squared deviations of the y values from _mean_y
+    #   - _c_xy: the sum of the products of the x and y deviations from their means
+    n: int
+    _mean_x: float
+    _mean_y: float
+    _m2_x: float
+    _m2_y: float
+    _c_xy: float
+
+    def __init__(self, x_values: Optional[Iterable[float]] = None,
+                 y_values: Optional[Iterable[float]] = None) -> None:
+        """Initialize an accumulator, adding x_values and y_values if they are given.
+        Preconditions:
+            - (x_values is None) == (y_values is None)
+        """
+        self.n = 0
+        self._mean_x = 0.0
+        self._mean_y = 0.0
+        self._m2_x = 0.0
+        self._m2_y = 0.0
+        self._c_xy = 0.0
+        if x_values is not None:
+            self.update(x_values, y_values)
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Tuple[Iterable[float], Iterable[float]]]) \
+            -> 'BivariateAccumulator':
+        """Return an accumulator over every (x_values, y_values) chunk in chunks."""
+        accumulator = cls()
+        for x_values, y_values in chunks:
+            accumulator.update(x_values, y_values)
+        return accumulator
+
+    def add(self, x: float, y: float) -> None:
+        """Add a single observation."""
+        self.n += 1
+        delta_x = x - self._mean_x
+        delta_y = y - self._mean_y
+        self._mean_x += delta_x / self.n
+        self._mean_y += delta_y / self.n
+        self._m2_x += delta_x * (x - self._mean_x)
+        self._m2_y += delta_y * (y - self._mean_y)
+        self._c_xy += delta_x * (y - self._mean_y)
+
+    def update(self, x_values: Iterable[float], y_values: Iterable[float]) -> None:
+        """Add every pair of values in x_values and y_values in one vectorized pass.
+        Single precision arrays are summarized in double precision, UPCAST_CHUNK values at
+        a time.
+        Preconditions:
+            - len(x_values) == len(y_values)
+        """
+        x_array = float_array(x_values)
+        y_array = float_array(y_values)
+        if x_array.shape != y_array.shape:
+            raise ValueError('x_values and y_values must have the same length')
+        if x_array.size == 0:
+            return
+        if x_array.dtype != np.float64 or y_array.dtype != np.float64:
+            for start in range(0, x_array.size, UPCAST_CHUNK):
+                self.update(x_array[start:start + UPCAST_CHUNK].astype(float),
+                            y_array[start:start + UPCAST_CHUNK].astype(float))
+            return
+
+        with span('stats.bivariate', 'stat', points=x_array.size):
+            chunk = BivariateAccumulator()
+            chunk.n = x_array.size
+            chunk._mean_x = float(x_array.mean())
+            chunk._mean_y = float(y_array.mean())
+            x_deviations = x_array - chunk._mean_x
+            y_deviations = y_array - chunk._mean_y
+            chunk._m2_x = float(np.dot(x_deviations, x_deviations))
+            chunk._m2_y = float(np.dot(y_deviations, y_deviations))
+            chunk._c_xy = float(np.dot(x_deviations, y_deviations))
+            self.merge(chunk)
+        count('stats_points', x_array.size)
+
+    def merge(self, other: 'BivariateAccumulator') -> None:
+        """Add every observation summarized by other to this accumulator."""
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self._mean_x, self._mean_y = other.n, other._mean_x, other._mean_y
+            self._m2_x, self._m2_y, self._c_xy = other._m2_x, other._m2_y, other._c_xy
+            return
+
+        total = self.n + other.n
+        delta_x = other._mean_x - self._mean_x
+        delta_y = other._mean_y - self._mean_y
+        weight = self.n * other.n / total
+        self._mean_x += delta_x * other.n / total
+        self._mean_y += delta_y * other.n / total
+        self._m2_x += other._m2_x + delta_x * delta_x * weight
+        self._m2_y += other._m2_y + delta_y * delta_y * weight
+        self._c_xy += other._c_xy + delta_x * delta_y * weight
+        self.n = total
+
+    def _check_not_empty(self) -> None:
+        """Raise EmptyDatasetError if no observations have been added."""
+        if self.n == 0:
+            raise EmptyDatasetError
+
+    @property
+    def mean_x(self) -> float:
+        """The mean of the x values."""
+        self._check_not_empty()
+        return self._mean_x
+
+    @property
+    def mean_y(self) -> float:
+        """The mean of the y values."""
+        self._check_not_empty()
+        return self._mean_y
+
+    @property
+    def variance_x(self) -> float:
+        """The sample variance of the x values."""
+        self._check_not_empty()
+        return self._m2_x / (self.n - 1)
+
+    @property
+    def variance_y(self) -> float:
+        """The sample variance of the y values."""
+        self._check_not_empty()
+        return self._m2_y / (self.n - 1)
+
+    @property
+    def covariance(self) -> float:
+        """The sample covariance of the x and y values."""
+        self._check_not_empty()
+        return self._c_xy / (self.n - 1)
+
+    @property
+    def correlation(self) -> float:
+        """The correlation coefficient of the x and y values."""
+        self._check_not_empty()
+        return self._c_xy / sqrt(self._m2_x * self._m2_y)
+
+    @property
+    def slope(self) -> float:
+        """The slope of the least-squares line of best fit."""
+        self._check_not_empty()
+        return self._c_xy / self._m2_x
+
+    @property
+    def intercept(self) -> float:
+        """The y-intercept of the least-squares line of best fit."""
+        return self.mean_y - self.slope * self._mean_x
+
+    @property
+    def r_squared(self) -> float:
+        """The coefficient of determination of the least-squares line of best fit."""
+        return self.correlation ** 2
+
+
 def median(values: List[float]) -> float:
-    """Returns the mean of the data
+    """Returns the median of the data, found by selection in linear time rather than by
+    sorting the whole dataset.
     Preconditions:
         - len(values) != 0
     >>> median([5.0, 7.0, 9.0, 11.0, 9.0])
@@ -23,23 +226,35 @@ def median(values: List[float]) -> float:
     >>> median([2.0, 2.0, 7.0, 4.0, 5.0, 1.0])
     3.0
     """
-    global position
-    length = len(values)
-    sorted_list = sorted(values)
-    if length % 2 == 1:
-        position = ceil(length / 2)
-        return sorted_list[int(position) - 1]
-    elif length % 2 == 0 and length != 0:
-        position = length / 2
-        right_median = sorted_list[int(position)]
-        left_median = sorted_list[int(position) - 1]
-        return (right_median + left_median) / 2
-    elif length == 0:
+    return quantile(values, 0.5)
+
+
+def quantile(values: Iterable[float], q: float) -> float:
+    """Return the q-th quantile of the data, interpolating linearly between the two nearest
+    order statistics. The order statistics are found with a partition-based selection, which
+    takes linear time on average.
+    Preconditions:
+        - 0.0 <= q <= 1.0
+    >>> quantile([1.0, 2.0, 3.0, 4.0], 0.25)
+    1.75
+    """
+    array = float_array(values)
+    if array.size == 0:
         raise EmptyDatasetError
 
+    position = q * (array.size - 1)
+    lower = floor(position)
+    upper = min(lower + 1, array.size - 1)
+    with span('stats.quantile', 'stat', points=array.size):
+        partitioned = np.partition(array, [lower, upper])
+    fraction = position - lower
+    return float(partitioned[lower] + (partitioned[upper] - partitioned[lower]) * fraction)
 
-def mode(values: List[float]) -> float:
-    """Returns the mode of the data
+
+def mode(values: Iterable[float]) -> float:
+    """Returns the mode of the data. If several values are tied for the most occurrences, the
+    one that occurs first in values is returned. Arrays are counted by sorting rather than
+    by hashing every value.
      Preconditions:
         - len(values) != 0
     >>> mode([2.0, 3.0, 6.0, 3.0, 7.0, 5.0, 1.0, 2.0, 3.0, 9.0])
@@ -47,20 +262,22 @@ def mode(values: List[float]) -> float:
     >>> mode([13.0, 17.0, 20.0, 21.0, 23.0, 23.0, 26.0, 29.0, 30.0])
     23.0
     """
-
-    empty_list = []
-    for num in values:
-        temp_list = [number for number in values if number == num]
-        list.append(empty_list, temp_list)
-
-    length = [len(numb) for numb in empty_list]
-    maximum = max(length)
-    index = length.index(maximum)
-    if len(values) != 0:
-        return empty_list[index][0]
-    else:
+    if _numpy_loaded() and isinstance(values, np.ndarray):
+        if values.size == 0:
+            raise EmptyDatasetError
+        with span('stats.mode', 'stat', points=values.size):
+            _, first, counts = np.unique(values.ravel(), return_index=True,
+                                         return_counts=True)
+        return values.ravel()[first[counts == counts.max()].min()].item()
+
+    with span('stats.mode', 'stat'):
+        counts = Counter(values)
+    if len(counts) == 0:
         raise EmptyDatasetError
 
+    # max returns the first of several tied keys, and a Counter keeps first-insertion order
+    return max(counts, key=counts.__getitem__)
+
 
 def mean(values: List[float]) -> float:
     """Returns the mean of the data
@@ -69,8 +286,15 @@ def mean(values: List[float]) -> float:
     >>> mean([3.0, 4.0, 6.0, 6.0, 8.0, 9.0, 11.0])
     6.714285714285714
     """
-    if len(values) != 0:
-        return sum(values) / len(values)
+    if not _numpy_loaded():
+        values = list(values)
+        if len(values) == 0:
+            raise EmptyDatasetError
+        return fsum(values) / len(values)
+
+    array = float_array(values)
+    if array.size != 0:
+        return float(array.mean(dtype=float))
     else:
         raise EmptyDatasetError
 
@@ -79,16 +303,17 @@ def sample_standard_deviation(values: List[float]) -> float:
     """returns the measure of variability in the data
      Preconditions:
         - len(values) != 0"""
-    average = mean(values)
-    numerator1 = [num - average for num in values]
-    numerator2 = [number ** 2 for number in numerator1]
-    numerator3 = sum(numerator2)
-    denominator = len(values) - 1
-    final_value = sqrt(numerator3 / denominator)
-    if len(values) != 0:
-        return final_value
-    else:
-        raise EmptyDatasetError
+    if not _numpy_loaded():
+        values = list(values)
+        average = mean(values)
+        return sqrt(fsum((value - average) ** 2 for value in values) / (len(values) - 1))
+
+    array = float_array(values)
+    average = mean(array)
+    deviations = np.subtract(array, average, dtype=float)
+    numerator = float(np.dot(deviations, deviations))
+    denominator = array.size - 1
+    return sqrt(numerator / denominator)
 
 
 def correlation(x_values: List[float], y_values: List[float]) -> float:
@@ -99,20 +324,7 @@ def correlation(x_values: List[float], y_values: List[float]) -> float:
         - len(x_values) != 0
         - len(y_values) != 0
     """
-    average_of_x = mean(x_values)
-    average_of_y = mean(y_values)
-    standard_deviation_x = sample_standard_deviation(x_values)
-    standard_deviation_y = sample_standard_deviation(y_values)
-    x_difference = [num - average_of_x for num in x_values]
-    y_difference = [num - average_of_y for num in y_values]
-    empty_list = []
-    for i in range(0, len(x_difference)):
-        product = x_difference[i] * y_difference[i]
-        list.append(empty_list, product)
-
-    summation = sum(empty_list)
-    result = summation / (standard_deviation_x * standard_deviation_y)
-    return result / (len(x_difference) - 1)
+    return BivariateAccumulator(x_values, y_values).correlation
 
 
 def slope_of_best_fit(x_values: List[float], y_values: List[float]) -> float:
@@ -121,11 +333,7 @@ def slope_of_best_fit(x_values: List[float], y_values: List[float]) -> float:
         - len(x_values) == len(y_values)
         - len(x_values) != 0
         - len(y_values) != 0"""
-    deviation_of_x = sample_standard_deviation(x_values)
-    deviation_of_y = sample_standard_deviation(y_values)
-    r = correlation(x_values, y_values)
-    m = r * (deviation_of_y / deviation_of_x)
-    return m
+    return BivariateAccumulator(x_values, y_values).slope
 
 
 def y_intercept_of_best_fit(x_values: List[float], y_values: List[float]) -> float:
@@ -135,11 +343,7 @@ def y_intercept_of_best_fit(x_values: List[float], y_values: List[float]) -> flo
         - len(x_values) != 0
         - len(y_values) != 0
     """
-    m = slope_of_best_fit(x_values, y_values)
-    average_of_x = mean(x_values)
-    average_of_y = mean(y_values)
-    b = average_of_y - (m * average_of_x)
-    return b
+    return BivariateAccumulator(x_values, y_values).intercept
 
 
 def best_fit_regression_equation(x_values: List[float], y_values: List[float]) -> str:
@@ -149,9 +353,8 @@ def best_fit_regression_equation(x_values: List[float], y_values: List[float]) -
         - len(x_values) != 0
         - len(y_values) != 0
     """
-    slope = slope_of_best_fit(x_values, y_values)
-    y_intercept = y_intercept_of_best_fit(x_values, y_values)
-    return 'y = ' + str(slope) + 'x + ' + str(y_intercept)
+    accumulator = BivariateAccumulator(x_values, y_values)
+    return 'y = ' + str(accumulator.slope) + 'x + ' + str(accumulator.intercept)
 
 
 def interpolation(x_value: float, x_values: List[float], y_values: List[float]) -> float:
@@ -166,9 +369,8 @@ def interpolation(x_value: float, x_values: List[float], y_values: List[float])
     >>> interpolation(1.5, x, y)
     8.0
     """
-    m = slope_of_best_fit(x_values, y_values)
-    b = y_intercept_of_best_fit(x_values, y_values)
-    y_value = m * x_value + b
+    accumulator = BivariateAccumulator(x_values, y_values)
+    y_value = accumulator.slope * x_value + accumulator.intercept
     return y_value
 
 
@@ -187,8 +389,8 @@ def extrapolation(start_point: int, end_point: int, x_values: List[float],
     >>> extrapolation(15, 20, x_list, y_list)
     [35.0, 37.0, 39.0, 41.0, 43.0, 45.0]
     """
-    m = slope_of_best_fit(x_values, y_values)
-    b = y_intercept_of_best_fit(x_values, y_values)
+    accumulator = BivariateAccumulator(x_values, y_values)
+    m, b = accumulator.slope, accumulator.intercept
     empty_list = []
     for x in range(start_point, end_point + 1):
         y_value = m * x + b
@@ -203,9 +405,7 @@ def r_squared(x_values: List[float], y_values: List[float]) -> float:
         - len(x_values) != 0
         - len(y_values) != 0
     """
-    r_r = correlation(x_values, y_values)
-    r_r_2 = r_r ** 2
-    return r_r_2
+    return BivariateAccumulator(x_values, y_values).r_squared
 
 
 def variance(values: List[float]) -> float:
@@ -221,43 +421,145 @@ def variance(values: List[float]) -> float:
 def root_mean_squared_error(start_point: int, end_point: int, x_values: List[float],
                             y_values: List[float]) -> float:
     """Calculates the RMSE. Measures the prediction error for predictions from a linear
-     regression model
+     regression model at each integer from start_point to end_point against every value in
+     y_values. See residual_analysis for paired residuals and error measures.
      Precondition:
         - start_point < end_point
         - len(x_values) == len(y_values)
         - len(x_values) != 0
         - len(y_values) != 0
      """
-    predicted_values = extrapolation(start_point, end_point, x_values, y_values)
-    empty_list = []
-    for value in predicted_values:
-        for y in y_values:
-            difference = (y - value) ** 2
-            list.append(empty_list, difference)
-
-    summation = sum(empty_list)
+    predicted_values = np.asarray(extrapolation(start_point, end_point, x_values, y_values))
+    y_array = np.asarray(y_values, dtype=float)
+
+    # Every prediction is compared with every observed y value. The sum of those squared
+    # differences splits into the spread of y about its mean and the spread of the
+    # predictions about the same mean, so it is found without building the n * m matrix.
+    with span('stats.root_mean_squared_error', 'stat', points=y_array.size):
+        y_deviations = y_array - y_array.mean()
+        prediction_deviations = predicted_values - y_array.mean()
+        summation = predicted_values.size * np.dot(y_deviations, y_deviations) \
+            + y_array.size * np.dot(prediction_deviations, prediction_deviations)
     denominator = len(x_values) - 1
     root = sqrt(summation / denominator)
     return root
 
 
-def multiple_lin_reg(df1: DataFrame, df2: DataFrame, df3: DataFrame) -> Tuple[Any, Any, Any]:
+class RegressionAccumulator:
+    """Sufficient statistics for the multiple linear regression of a target on any number of
+    factors.
+
+    Only the count, sums and cross products of the data are kept, so new observations are
+    added, and factors removed, without revisiting any earlier data. The values are shifted
+    by a reference point (the mean of the first batch) before being summed, which keeps the
+    cross products from losing precision to large offsets such as years or CO2
+    concentrations.
+
+    Instance Attributes:
+        - factor_names: the names of the factors, in the order of the coefficients
+        - n: the number of observations added so far
+    """
+    # Private Instance Attributes:
+    #   - _shift: the reference point subtracted from each observation, with one entry per
+    #       factor followed by one for the target
+    #   - _sums: the sums of the shifted observations
+    #   - _cross: the sums of the outer products of the shifted observations
+    factor_names: List[str]
+    n: int
+    _shift: Optional[np.ndarray]
+    _sums: np.ndarray
+    _cross: np.ndarray
+
+    def __init__(self, factor_names: List[str]) -> None:
+        """Initialize an accumulator with no observations for the given factors."""
+        self.factor_names = list(factor_names)
+        self.n = 0
+        self._shift = None
+        size = len(self.factor_names) + 1
+        self._sums = np.zeros(size)
+        self._cross = np.zeros((size, size))
+
+    def update(self, factor_values: Any, target_values: Iterable[float]) -> None:
+        """Add observations, given as a 2D array with one column per factor and the matching
+        target values.
+        Preconditions:
+            - len(factor_values) == len(target_values)
+        """
+        factors = np.asarray(factor_values, dtype=float).reshape(-1, len(self.factor_names))
+        target = np.asarray(target_values, dtype=float)
+        if factors.shape[0] != target.shape[0]:
+            raise ValueError('factor_values and target_values must have the same length')
+        if target.size == 0:
+            return
+
+        data = np.column_stack((factors, target))
+        if self._shift is None:
+            self._shift = data.mean(axis=0)
+        shifted = data - self._shift
+        self.n += target.size
+        self._sums += shifted.sum(axis=0)
+        self._cross += shifted.T @ shifted
+
+    def remove_factor(self, name: str) -> None:
+        """Remove the factor called name from the regression.
+        Preconditions:
+            - name in self.factor_names
+        """
+        index = self.factor_names.index(name)
+        self.factor_names.pop(index)
+        self._sums = np.delete(self._sums, index)
+        self._cross = np.delete(np.delete(self._cross, index, axis=0), index, axis=1)
+        if self._shift is not None:
+            self._shift = np.delete(self._shift, index)
+
+    def solve(self) -> Tuple[np.ndarray, float, float]:
+        """Return the coefficients, intercept and coefficient of determination of the least
+        squares regression of the target on the factors.
+        """
+        if self.n == 0:
+            raise EmptyDatasetError
+
+        # centred co-moment matrix of the factors and the target
+        shifted_means = self._sums / self.n
+        centred = self._cross - self.n * np.outer(shifted_means, shifted_means)
+        factor_moments, target_moments = centred[:-1, :-1], centred[:-1, -1]
+
+        # scale the factors to unit spread so the system is well conditioned
+        scales = np.sqrt(np.diag(factor_moments))
+        scales[scales == 0] = 1.0
+        scaled_solution = np.linalg.lstsq(factor_moments / np.outer(scales, scales),
+                                          target_moments / scales, rcond=None)[0]
+        coefficients = scaled_solution / scales
+
+        means = self._shift + shifted_means
+        intercept = float(means[-1] - coefficients @ means[:-1])
+        total = centred[-1, -1]
+        residual = total - coefficients @ target_moments
+        return (coefficients, intercept, float(1.0 - residual / total))
+
+
+def multiple_lin_reg(df1: DataFrame, *other_dfs: DataFrame) -> Tuple[Any, Any, Any]:
     """ Perform multiple linear regression on the given data
     and return coefficients, intercept, and summary of results.
+
+    Each DataFrame holds one factor in its first column and the same target values in its
+    second column, as made by create_data_frame; any number of DataFrames may be given.
+    Preconditions:
+        - all(len(df) == len(df1) for df in other_dfs)
     """
-    data = df1.merge(df2).merge(df3)
+    target = df1[df1.columns[1]].to_numpy(dtype=float)
+    dfs = (df1,) + other_dfs
+    for df in other_dfs:
+        if not np.array_equal(df[df.columns[1]].to_numpy(dtype=float), target):
+            raise ValueError('every DataFrame must have the same target values')
 
     # separating features and target
-    y = data[df1.columns[1]]
-    x = data[[df1.columns[0], df2.columns[0], df3.columns[0]]]
-
-    # defining the multiple linear regression model
-    lin_reg = LinearRegression()
-
-    # 'training' the model
-    model = lin_reg.fit(x, y)
+    factors = np.column_stack([df[df.columns[0]].to_numpy(dtype=float) for df in dfs])
 
-    return (model.coef_, model.intercept_, model.score(x, y))
+    with span('stats.multiple_lin_reg', 'stat', points=target.size, factors=len(dfs)):
+        accumulator = RegressionAccumulator([df.columns[0] for df in dfs])
+        accumulator.update(factors, target)
+        return accumulator.solve()
 
 
 if __name__ == '__main__':
@@ -271,7 +573,7 @@ if __name__ == '__main__':
         'allowed-io': ['read_csv_data'],
         'extra-imports': ['python_ta.contracts', 'csv', 'datetime',
                           'plotly.graph_objects', 'plotly.subplots',
-                          'math', 'sklearn.linear_model', 'pandas'],
+                          'math', 'sys', 'instrumentation', 'lazy_imports'],
         'max-line-length': 100,
         'max-args': 6,
         'max-locals': 25,
@@ -0,0 +1,27 @@
+"""
+Shared setup for the tests: makes the project's modules importable, draws charts without a
+display, and provides small synthetic datasets laid out like the climate files.
+"""
+import os
+import sys
+
+import matplotlib
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+matplotlib.use('Agg')
+
+
+@pytest.fixture
+def climate_files(tmp_path):
+    """Return the paths of synthetic CO2, temperature, glacier and sea level files with 30
+    points each, by the name of their series.
+    """
+    from benchmarks import write_synthetic_files
+    from dataset_cache import DATASET_CACHE
+    from curve_fitting import clear_fit_cache
+
+    paths = write_synthetic_files(30, str(tmp_path))
+    yield paths
+    DATASET_CACHE.invalidate()
+    clear_fit_cache()
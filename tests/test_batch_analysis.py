@@ -0,0 +1,55 @@
+"""Tests for the command-line analysis of a directory in batch_analysis."""
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import batch_analysis
+from curve_fitting import MODEL_FUNCTIONS
+
+
+def test_discover_finds_the_factors_and_target(climate_files) -> None:
+    """Every data file but the target is a factor, and the target must be unique."""
+    directory = os.path.dirname(climate_files['Sea Level'])
+    factors, target = batch_analysis.discover(directory)
+    assert target == climate_files['Sea Level']
+    assert factors == sorted(path for name, path in climate_files.items() if name != 'Sea Level')
+    with pytest.raises(ValueError):
+        batch_analysis.discover(directory, target='Mean')
+
+
+def test_report_of_a_directory(climate_files, tmp_path) -> None:
+    """The report holds the statistics and fits of every factor and the regression on them,
+    a file that cannot be parsed is reported with its error, and the report is written as
+    JSON and CSV.
+    """
+    directory = os.path.dirname(climate_files['Sea Level'])
+    broken = os.path.join(directory, 'Broken.csv')
+    with open(broken, 'w') as file:
+        file.write('Year\n2000\n2001\n')
+
+    report = batch_analysis.analyse(directory, jobs=1)
+    statistics = {row['ind_filename']: row for row in report['statistics']}
+    assert statistics[broken]['error'].startswith('ValueError')
+    for name in ('CO2', 'Temperature', 'Glacier Mass Balance'):
+        row = statistics[climate_files[name]]
+        assert row['error'] is None and row['points'] == 30
+        assert -1.0 <= row['correlation'] <= 1.0
+    fits = pd.DataFrame(report['fits'])
+    assert len(fits) == 4 * len(MODEL_FUNCTIONS)
+    assert fits[fits['ind_filename'] == broken]['error'].notna().all()
+    assert len(report['regression']['coefficients']) == 3
+    assert set(report['timings']) == {'discover', 'load', 'statistics', 'fits', 'regression'}
+
+    out_dir = str(tmp_path / 'report')
+    paths = batch_analysis.write_report(report, out_dir, ['json', 'csv'])
+    assert paths == [os.path.join(out_dir, 'report.json'), os.path.join(out_dir, 'report.csv')]
+    with open(paths[0]) as file:
+        written = json.load(file)
+    assert written['factors'] == report['factors']
+    assert written['regression']['r_squared'] == pytest.approx(report['regression']['r_squared'])
+    table = pd.read_csv(paths[1])
+    assert len(table) == len(fits)
+    assert table[table['ind_filename'] == broken]['stats_error'].notna().all()
+    assert table[table['ind_filename'] != broken]['points'].eq(30).all()
@@ -0,0 +1,33 @@
+"""Tests for fitting many dataset pairs and models at once in batch_fitting."""
+import numpy as np
+import pytest
+
+from batch_fitting import RESULT_COLUMNS, fit_batch
+from curve_fitting import fit_model
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_rows_follow_the_pairs_and_models(climate_files, tmp_path, jobs) -> None:
+    """There is one row per pair and model, in the order they were given, whichever worker
+    ran them, and a fit that fails is recorded in its row rather than stopping the batch.
+    """
+    dep_filename = climate_files['Sea Level']
+    missing = str(tmp_path / 'Missing.csv')
+    pairs = [(climate_files['Temperature'], dep_filename), (missing, dep_filename),
+             (climate_files['CO2'], dep_filename)]
+    models = ('cubic', 'linear')
+    results = fit_batch(pairs, models, jobs=jobs, chunk_size=3)
+
+    assert results.columns.tolist() == RESULT_COLUMNS
+    assert list(zip(results['ind_filename'], results['model'])) == \
+        [(ind_filename, model) for ind_filename, _ in pairs for model in models]
+    failed = results[results['ind_filename'] == missing]
+    assert failed['error'].str.startswith('FileNotFoundError').all()
+    assert failed['parameters'].isna().all()
+
+    succeeded = results[results['error'].isna()]
+    assert len(succeeded) == 4
+    for row in succeeded.itertuples():
+        fit = fit_model(row.ind_filename, row.dep_filename, row.model)
+        np.testing.assert_allclose(row.parameters, fit.parameters, rtol=1e-6)
+        assert row.rmse == pytest.approx(fit.residuals.rmse)
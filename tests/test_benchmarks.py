@@ -0,0 +1,19 @@
+"""Tests for the benchmark suite in benchmarks."""
+from benchmarks import compare_results, run_suite
+
+
+def test_suite_runs_every_benchmark() -> None:
+    """Every benchmark of the suite, rendering included, runs without error."""
+    results = run_suite([200], repeat=1)['results']
+    assert 'render.data_with_curve@200' in results
+    assert 'fit.cubic@200' in results
+    assert all(measurement['error'] is None for measurement in results.values())
+
+
+def test_compare_flags_slowdowns_only() -> None:
+    """Only benchmarks slower than the threshold, and not too fast to time, are flagged."""
+    baseline = {'results': {'a': {'seconds': 1.0}, 'b': {'seconds': 1.0},
+                            'c': {'seconds': 1e-5}}}
+    current = {'results': {'a': {'seconds': 2.0}, 'b': {'seconds': 1.1},
+                           'c': {'seconds': 1e-4}, 'd': {'seconds': 5.0}}}
+    assert compare_results(baseline, current) == [('a', 1.0, 2.0)]
@@ -0,0 +1,70 @@
+"""Tests for the bootstrap engine in bootstrap."""
+import numpy as np
+import pytest
+
+import bootstrap
+from curve_fitting import POLYNOMIAL_DEGREES
+
+
+def _data(points: int = 40):
+    """Return a noisy rising series."""
+    rng = np.random.default_rng(3)
+    x_values = np.linspace(0.0, 4.0, points)
+    return x_values, 1.5 ** x_values + 2.0 + rng.normal(scale=0.05, size=points)
+
+
+@pytest.mark.parametrize('model', ['linear', 'quadratic', 'cubic'])
+def test_polynomial_samples_match_refits(model) -> None:
+    """Each batched polynomial resample matches a polyfit of the resampled data."""
+    x_values, y_values = _data()
+    degree = POLYNOMIAL_DEGREES[model]
+    counts = bootstrap.resample_counts(x_values.size, 5, np.random.default_rng(0))
+    samples = bootstrap.polynomial_samples(x_values, y_values, degree, counts)
+    for row, count in zip(samples, counts):
+        expected = np.polyfit(np.repeat(x_values, count), np.repeat(y_values, count),
+                              degree)[::-1]
+        assert row == pytest.approx(expected, rel=1e-7, abs=1e-9)
+
+
+def test_same_seed_same_result() -> None:
+    """The same seed gives the same resamples."""
+    x_values, y_values = _data()
+    first = bootstrap.bootstrap_fit(x_values, y_values, 'quadratic', resamples=200, seed=7)
+    second = bootstrap.bootstrap_fit(x_values, y_values, 'quadratic', resamples=200, seed=7)
+    np.testing.assert_array_equal(first.samples, second.samples)
+
+
+def test_nonlinear_result_does_not_depend_on_workers() -> None:
+    """Exponential resamples are the same in this process and on a pool of workers."""
+    x_values, y_values = _data()
+    local = bootstrap.bootstrap_fit(x_values, y_values, 'exponential', resamples=120,
+                                    seed=11, workers=1)
+    pooled = bootstrap.bootstrap_fit(x_values, y_values, 'exponential', resamples=120,
+                                     seed=11, workers=2)
+    np.testing.assert_array_equal(local.samples, pooled.samples)
+    assert local.failures == pooled.failures
+
+
+def test_intervals_contain_the_fit() -> None:
+    """The confidence intervals contain the parameters fitted to the original data."""
+    x_values, y_values = _data()
+    result = bootstrap.bootstrap_fit(x_values, y_values, 'linear', resamples=500, seed=1)
+    intervals = result.confidence_intervals(0.95)
+    assert np.all(intervals[:, 0] <= result.parameters)
+    assert np.all(result.parameters <= intervals[:, 1])
+    lower, upper = result.prediction_band(x_values, 0.95, observations=True)
+    assert np.all(lower <= upper)
+
+
+def test_linear_stats_match_weighted_refits() -> None:
+    """The batched linear statistics of a resample match those of the resampled data."""
+    x_values, y_values = _data()
+    counts = bootstrap.resample_counts(x_values.size, 3, np.random.default_rng(2))
+    samples = bootstrap.linear_stats_samples(x_values, y_values, counts)
+    for i, count in enumerate(counts):
+        x_resampled, y_resampled = np.repeat(x_values, count), np.repeat(y_values, count)
+        slope, intercept = np.polyfit(x_resampled, y_resampled, 1)
+        assert samples['slope'][i] == pytest.approx(slope, rel=1e-9)
+        assert samples['intercept'][i] == pytest.approx(intercept, rel=1e-9)
+        assert samples['correlation'][i] == pytest.approx(
+            np.corrcoef(x_resampled, y_resampled)[0, 1], rel=1e-9)
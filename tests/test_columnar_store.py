@@ -0,0 +1,85 @@
+"""Tests for the on-disk columns in columnar_store."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar_store
+import plotting_data_with_pandas as pd_with_pandas
+from stats_analysis import BivariateAccumulator
+
+
+def test_columns_match_the_arrays_of_the_files(climate_files) -> None:
+    """The columns of each factor are paired with the sea levels as filenames_to_arrays
+    pairs them, including the CO2 workbook, whose rows are in reverse year order.
+    """
+    dep_filename = climate_files['Sea Level']
+    for name in ('CO2', 'Temperature'):
+        x_values, y_values = columnar_store.filenames_to_columns(climate_files[name],
+                                                                 dep_filename, chunk_rows=7)
+        expected_x, expected_y = pd_with_pandas.filenames_to_arrays(climate_files[name],
+                                                                    dep_filename)
+        np.testing.assert_allclose(x_values, expected_x)
+        np.testing.assert_array_equal(y_values, expected_y)
+
+
+def test_columns_are_paired_by_year(tmp_path) -> None:
+    """Files covering different years, in any row order and with missing values, are paired
+    on the years they both have values for.
+    """
+    co2_years = np.arange(1999, 1989, -1)
+    co2 = pd.DataFrame({'Year': co2_years})
+    for month in range(1, 13):
+        co2['Month ' + str(month)] = co2_years * 10.0 + month
+    sea_years = np.array([1998, 1995, 2002, 1996, 2000, 1997, 2001, 1999])
+    sea_level = pd.DataFrame({'Year': sea_years, 'a': 0, 'b': 0, 'c': 0,
+                              'GMSL': np.where(sea_years == 1997, np.nan, sea_years - 1990.0)})
+    co2.to_csv(tmp_path / 'CO2_Levels.csv', index=False)
+    sea_level.to_csv(tmp_path / 'Sea_Level.csv', index=False)
+
+    x_values, y_values = columnar_store.filenames_to_columns(str(tmp_path / 'CO2_Levels.csv'),
+                                                             str(tmp_path / 'Sea_Level.csv'))
+    years = np.array([1995, 1996, 1998, 1999])
+    np.testing.assert_allclose(x_values, years * 10.0 + 6.5)
+    np.testing.assert_array_equal(y_values, years - 1990.0)
+
+
+def test_aligned_columns_are_not_copied(climate_files) -> None:
+    """Files holding the same years in order are paired as views of their memory maps."""
+    x_values, y_values = columnar_store.filenames_to_columns(climate_files['Temperature'],
+                                                             climate_files['Sea Level'])
+    assert isinstance(x_values.base, np.memmap) and isinstance(y_values.base, np.memmap)
+    assert x_values.size == y_values.size == 30
+
+
+def test_store_is_ingested_again_when_its_source_changes(tmp_path) -> None:
+    """A store is reused while its source is unchanged and rebuilt once the source changes."""
+    source = str(tmp_path / 'values.csv')
+    pd.DataFrame({'Year': [2000, 2001, 2002], 'Mean': [1.0, 2.0, 3.0]}).to_csv(source,
+                                                                               index=False)
+    store = columnar_store.open_store(source, chunk_rows=2)
+    assert store.columns == ['Year', 'Mean'] and len(store) == 3
+    assert not store.is_stale()
+    assert columnar_store.open_store(source).store_dir == store.store_dir
+
+    pd.DataFrame({'Year': [2000, 2001, 2002, 2003], 'Mean': [1.0, 2.0, 3.0, 4.0]}) \
+        .to_csv(source, index=False)
+    os.utime(source, ns=(1, 1))
+    assert store.is_stale()
+    store = columnar_store.open_store(source)
+    assert store.column('Mean').tolist() == [1.0, 2.0, 3.0, 4.0]
+    with pytest.raises(KeyError):
+        store.column('Median')
+
+
+def test_chunked_statistics_match_a_single_pass() -> None:
+    """Statistics accumulated chunk by chunk match those of the whole data at once."""
+    rng = np.random.default_rng(0)
+    x_values = rng.normal(size=1000)
+    y_values = 2.0 * x_values + rng.normal(size=1000)
+    chunked = columnar_store.chunked_statistics(x_values, y_values, chunk_rows=64)
+    whole = BivariateAccumulator(x_values, y_values)
+    assert chunked.n == whole.n
+    assert chunked.slope == pytest.approx(whole.slope)
+    assert chunked.correlation == pytest.approx(whole.correlation)
@@ -0,0 +1,53 @@
+"""Tests for the curve fits in curve_fitting."""
+import numpy as np
+import pytest
+
+import curve_fitting
+from curve_fitting import MODEL_FUNCTIONS, fit_arrays
+
+
+def _data(points: int = 200):
+    """Return a noisy rising series shaped like CO2 levels against sea levels."""
+    rng = np.random.default_rng(5)
+    x_values = np.linspace(340.0, 400.0, points)
+    return x_values, 0.002 * (x_values - 340.0) ** 2 + 0.1 * x_values + rng.normal(size=points)
+
+
+@pytest.mark.parametrize('model', list(MODEL_FUNCTIONS))
+def test_single_precision_fits_like_double(model) -> None:
+    """float32 values are fitted in double precision and kept in the result as they are."""
+    x_values, y_values = _data()
+    x_single, y_single = x_values.astype(np.float32), y_values.astype(np.float32)
+    single = fit_arrays(x_single, y_single, model)
+    double = fit_arrays(x_single.astype(float), y_single.astype(float), model)
+    assert single.x_values is x_single and single.y_values is y_single
+    assert single.parameters == pytest.approx(double.parameters, rel=1e-6)
+    assert single.residuals.rmse == pytest.approx(double.residuals.rmse, rel=1e-6)
+
+
+@pytest.mark.parametrize('model', ['linear', 'quadratic', 'cubic'])
+def test_polynomials_match_polyfit(model) -> None:
+    """The polynomial models are the least-squares polynomials of numpy's polyfit."""
+    x_values, y_values = _data()
+    fit = fit_arrays(x_values, y_values, model)
+    degree = len(fit.parameters) - 1
+    expected = np.polyval(np.polyfit(x_values - 370.0, y_values, degree), x_values - 370.0)
+    assert fit.predict(x_values) == pytest.approx(expected, rel=1e-9)
+
+
+def test_plotting_does_not_show_the_figure(climate_files, monkeypatch) -> None:
+    """Plotting a fit returns its axes without calling plt.show, which would block."""
+    plt = curve_fitting.plt
+
+    def fail() -> None:
+        """Stand in for plt.show."""
+        raise AssertionError('plt.show was called')
+
+    plt.close('all')  # loads pyplot, so the stand-in below is not overwritten
+    monkeypatch.setattr(plt, 'show', fail)
+    ax = curve_fitting.cubic_curve_fitting_and_plotting(climate_files['CO2'],
+                                                        climate_files['Sea Level'])
+    try:
+        assert len(ax.collections) + len(ax.lines) >= 2
+    finally:
+        plt.close(ax.figure)
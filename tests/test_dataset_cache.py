@@ -0,0 +1,127 @@
+"""Tests for the dataset cache in dataset_cache."""
+import os
+
+import pandas as pd
+import pytest
+
+from dataset_cache import DEFAULT_SIDECAR_DIRNAME, DatasetCache
+
+
+class CountingReader:
+    """A csv reader that counts how many times it is called.
+
+    Instance Attributes:
+        - calls: the number of files read so far
+    """
+    calls: int
+
+    def __init__(self) -> None:
+        """Initialize a reader that has not read anything."""
+        self.calls = 0
+
+    def __call__(self, filename: str) -> pd.DataFrame:
+        """Read the csv file filename."""
+        self.calls += 1
+        return pd.read_csv(filename)
+
+
+@pytest.fixture
+def csv_files(tmp_path):
+    """Return the paths of three small csv files, each with a numeric and a text column."""
+    paths = []
+    for name in ('a', 'b', 'c'):
+        paths.append(str(tmp_path / (name + '.csv')))
+        pd.DataFrame({'Year': [2000, 2001], 'Name': [name, name * 2]}).to_csv(paths[-1],
+                                                                              index=False)
+    return paths
+
+
+def test_least_recently_used_entry_is_evicted(csv_files) -> None:
+    """A full cache drops the entry that was used least recently."""
+    cache, reader = DatasetCache(max_entries=2), CountingReader()
+    first, second, third = csv_files
+    cache.load(first, reader)
+    cache.load(second, reader)
+    cache.load(first, reader)
+    cache.load(third, reader)
+    assert len(cache) == 2 and reader.calls == 3
+
+    cache.load(first, reader)
+    assert reader.calls == 3
+    cache.load(second, reader)
+    assert reader.calls == 4
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_changed_file_is_read_again(csv_files) -> None:
+    """An entry is only used while the modification time and size of its file are unchanged,
+    and invalidate drops it.
+    """
+    cache, reader = DatasetCache(), CountingReader()
+    filename = csv_files[0]
+    cache.load(filename, reader)
+
+    pd.DataFrame({'Year': [2000, 2001, 2002], 'Name': ['x', 'y', 'z']}).to_csv(filename,
+                                                                                index=False)
+    assert len(cache.load(filename, reader)) == 3 and reader.calls == 2
+
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    cache.load(filename, reader)
+    assert reader.calls == 3
+
+    cache.invalidate(filename)
+    cache.load(filename, reader)
+    assert reader.calls == 4 and cache.hits == 0
+
+
+def test_sidecar_is_reused_by_a_new_cache(csv_files, tmp_path) -> None:
+    """A sidecar written by one cache answers the same load in another, with the same
+    columns and values, without parsing the file.
+    """
+    sidecar_dir = str(tmp_path / 'sidecars')
+    reader = CountingReader()
+    expected = DatasetCache(sidecar_dir=sidecar_dir).load(csv_files[0], reader, variant='v')
+
+    cache = DatasetCache(sidecar_dir=sidecar_dir)
+    df = cache.load(csv_files[0], reader, variant='v')
+    assert reader.calls == 1 and cache.sidecar_hits == 1
+    pd.testing.assert_frame_equal(df, expected)
+
+    cache.load(csv_files[0], reader, variant='other')
+    assert reader.calls == 2
+
+
+def test_stale_sidecar_is_not_used(csv_files, tmp_path) -> None:
+    """A sidecar written before its file changed, or that cannot be read, is ignored."""
+    sidecar_dir = str(tmp_path / 'sidecars')
+    reader = CountingReader()
+    filename = csv_files[0]
+    DatasetCache(sidecar_dir=sidecar_dir).load(filename, reader)
+
+    pd.DataFrame({'Year': [1999], 'Name': ['new']}).to_csv(filename, index=False)
+    cache = DatasetCache(sidecar_dir=sidecar_dir)
+    assert cache.load(filename, reader)['Name'].tolist() == ['new']
+    assert reader.calls == 2 and cache.sidecar_hits == 0
+
+    for sidecar in os.listdir(sidecar_dir):
+        with open(os.path.join(sidecar_dir, sidecar), 'wb') as file:
+            file.write(b'not an npz file')
+    cache = DatasetCache(sidecar_dir=sidecar_dir)
+    assert cache.load(filename, reader)['Name'].tolist() == ['new']
+    assert reader.calls == 3 and cache.sidecar_hits == 0
+
+
+def test_persistent_load_keeps_a_sidecar_next_to_the_file(csv_files, tmp_path) -> None:
+    """Loads marked persistent, as Excel workbooks are, keep a sidecar in the
+    DEFAULT_SIDECAR_DIRNAME directory next to the file even without a sidecar directory.
+    """
+    reader = CountingReader()
+    DatasetCache().load(csv_files[0], reader, persist=True)
+    assert os.listdir(tmp_path / DEFAULT_SIDECAR_DIRNAME)
+
+    cache = DatasetCache()
+    cache.load(csv_files[0], reader, persist=True)
+    cache.load(csv_files[1], reader)
+    assert reader.calls == 2 and cache.sidecar_hits == 1
+    assert len(os.listdir(tmp_path / DEFAULT_SIDECAR_DIRNAME)) == 1
@@ -0,0 +1,116 @@
+"""Tests for the chart data reductions in decimation."""
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+from hypothesis import given, settings, strategies as st
+
+import decimation
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    """Start every test with an empty reduction cache."""
+    decimation.REDUCTION_CACHE.clear()
+    yield
+    plt.close('all')
+
+
+@settings(deadline=None, max_examples=30)
+@given(st.integers(min_value=3, max_value=400), st.integers(min_value=3, max_value=50),
+       st.integers(min_value=0, max_value=2 ** 16))
+def test_lttb_keeps_endpoints_and_size(points, kept, seed) -> None:
+    """LTTB keeps the requested number of points, in order, with both ends."""
+    rng = np.random.default_rng(seed)
+    x_values = np.sort(rng.uniform(size=points))
+    selected = decimation.lttb(x_values, rng.normal(size=points), kept)
+    assert selected.size == min(points, kept)
+    assert selected[0] == 0 and selected[-1] == points - 1
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_lttb_keeps_a_spike() -> None:
+    """A single spike in a flat series survives decimation."""
+    y_values = np.zeros(10000)
+    y_values[4321] = 100.0
+    selected = decimation.lttb(np.arange(10000.0), y_values, 50)
+    assert 4321 in selected
+
+
+@settings(deadline=None, max_examples=30)
+@given(st.integers(min_value=1, max_value=2000), st.integers(min_value=1, max_value=100),
+       st.integers(min_value=0, max_value=2 ** 16))
+def test_min_max_keeps_every_bucket_envelope(points, buckets, seed) -> None:
+    """The points kept have the same minimum and maximum in every bucket as all points."""
+    rng = np.random.default_rng(seed)
+    x_values = np.sort(rng.uniform(0.0, 10.0, points))
+    y_values = rng.normal(size=points)
+    selected = decimation.min_max_decimate(x_values, y_values, 0.0, 10.0, buckets)
+    assert np.all(np.diff(selected) > 0)
+    assert selected.size <= 4 * buckets
+
+    bucket = np.clip((x_values / 10.0 * buckets).astype(int), 0, buckets - 1)
+    everything = pd.Series(y_values).groupby(bucket).agg(['min', 'max'])
+    kept = pd.Series(y_values[selected]).groupby(bucket[selected]).agg(['min', 'max'])
+    pd.testing.assert_frame_equal(everything, kept)
+
+
+def test_reduce_line_is_cached_per_viewport() -> None:
+    """The same dataset and viewport are reduced once; a new viewport is reduced again."""
+    x_values = np.linspace(0.0, 1.0, 100000)
+    y_values = np.sin(x_values * 50)
+    key = decimation.dataset_key(x_values, y_values)
+    viewport = (0.0, 1.0, -1.0, 1.0, 500, 400)
+    first = decimation.reduce_line(x_values, y_values, viewport, key=key)
+    second = decimation.reduce_line(x_values, y_values, viewport, key=key)
+    assert first[0] is second[0]
+    assert first[0].size <= 4 * 500
+    decimation.reduce_line(x_values, y_values, (0.0, 0.5, -1.0, 1.0, 500, 400), key=key)
+    assert (decimation.REDUCTION_CACHE.hits, decimation.REDUCTION_CACHE.misses) == (1, 2)
+
+
+def test_small_datasets_are_drawn_unchanged() -> None:
+    """Below the thresholds every point is drawn as before."""
+    _, ax = plt.subplots()
+    decimation.draw_scatter(ax, [1.0, 3.0, 2.0], [1.0, 2.0, 3.0])
+    line = decimation.draw_line(ax, [1.0, 3.0, 2.0], [1.0, 2.0, 3.0])
+    assert len(ax.collections) == 1
+    assert line.get_xdata().tolist() == [1.0, 3.0, 2.0]
+
+
+def test_large_datasets_are_reduced_and_follow_zoom() -> None:
+    """Large scatter plots become a density image, and large curves are decimated again
+    when the axes are zoomed.
+    """
+    fig, ax = plt.subplots()
+    x_values = np.linspace(1900.0, 2000.0, 200000)
+    y_values = np.sin(x_values)
+    image = decimation.draw_scatter(ax, x_values, y_values)
+    line = decimation.draw_line(ax, x_values, y_values)
+    assert len(ax.images) == 1 and len(ax.collections) == 0
+    assert image.get_array().sum() == x_values.size
+    assert len(line.get_xdata()) < x_values.size
+
+    ax.set_xlim(1950.0, 1951.0)
+    fig.canvas.draw()
+    assert line.get_xdata().min() <= 1950.0 and line.get_xdata().max() >= 1951.0
+    assert len(line.get_xdata()) < 5000
+
+
+def test_all_nan_data_is_drawn_without_reduction() -> None:
+    """Large datasets with no finite values fall back to the plain artists."""
+    _, ax = plt.subplots()
+    nan = np.full(200000, np.nan)
+    decimation.draw_scatter(ax, nan, nan)
+    line = decimation.draw_line(ax, np.arange(200000.0), nan)
+    assert len(ax.collections) == 1 and len(ax.images) == 0
+    assert len(line.get_xdata()) == 200000
+
+
+def test_lttb_on_a_one_pixel_axes() -> None:
+    """A curve decimated with LTTB for an axes one pixel wide keeps at least three points."""
+    x_values = np.linspace(0.0, 1.0, 1000)
+    x_shown, _ = decimation.reduce_line(x_values, np.sin(x_values), (0.0, 1.0, -1.0, 1.0, 1, 1),
+                                        'lttb')
+    assert x_shown.size == 3
+    assert (x_shown[0], x_shown[-1]) == (0.0, 1.0)
@@ -0,0 +1,27 @@
+"""Tests for rendering charts to files in figure_export."""
+import os
+import shutil
+
+from figure_export import chart_filename, export_charts
+
+
+def test_chart_filename_names_both_series() -> None:
+    """Charts of one factor against different targets get different names."""
+    assert chart_filename('data/CO2_Levels.csv', 'data/Sea_Level.csv', 'cubic', 'png') == \
+        'CO2_Levels_vs_Sea_Level_cubic.png'
+    assert chart_filename('CO2_Levels.csv', 'Sea_Level.csv', 'linear', 'svg') != \
+        chart_filename('CO2_Levels.csv', 'Mean_Global_Temperatures.csv', 'linear', 'svg')
+
+
+def test_export_charts_writes_every_chart(climate_files, tmp_path) -> None:
+    """Every job is rendered to its own file, including the same factor against two
+    targets.
+    """
+    other_target = str(tmp_path / 'Sea_Level_Reconstructed.csv')
+    shutil.copy(climate_files['Sea Level'], other_target)
+    jobs = [(climate_files['CO2'], climate_files['Sea Level'], 'linear'),
+            (climate_files['CO2'], other_target, 'linear'),
+            (climate_files['Temperature'], climate_files['Sea Level'], 'quadratic')]
+    paths = export_charts(jobs, str(tmp_path / 'charts'), 'png', dpi=50, workers=1)
+    assert len(set(paths)) == 3
+    assert all(os.path.getsize(path) > 0 for path in paths)
@@ -0,0 +1,60 @@
+"""Tests for the timing spans and counters in instrumentation."""
+import json
+
+import pytest
+
+import instrumentation
+
+
+@pytest.fixture
+def recording():
+    """Record spans and counters for one test, starting from nothing."""
+    instrumentation.reset()
+    instrumentation.enable()
+    yield instrumentation.RECORDER
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_nothing_is_recorded_while_disabled() -> None:
+    """While disabled, spans and counts are ignored."""
+    instrumentation.reset()
+    with instrumentation.span('read', 'read'):
+        instrumentation.count('rows', 5)
+    assert instrumentation.RECORDER.spans() == []
+    assert instrumentation.RECORDER.counters() == {}
+
+
+def test_nested_spans_and_counters(recording) -> None:
+    """An inner span finishes first and lies within its outer span, and counts add up."""
+    with instrumentation.span('load', 'read', file='a.csv'):
+        with instrumentation.span('parse', 'read'):
+            instrumentation.count('rows', 3)
+        instrumentation.count('rows', 4)
+    instrumentation.count('fits')
+
+    inner, outer = recording.spans()
+    assert (inner.name, outer.name) == ('parse', 'load')
+    assert outer.args == {'file': 'a.csv'} and inner.category == 'read'
+    assert outer.start_ns <= inner.start_ns
+    assert inner.start_ns + inner.duration_ns <= outer.start_ns + outer.duration_ns
+    assert recording.counters() == {'rows': 7, 'fits': 1}
+    assert 'load' in instrumentation.summary() and 'rows' in instrumentation.summary()
+
+
+def test_chrome_trace_export(recording, tmp_path) -> None:
+    """The exported trace holds a complete event per span and a counter event per count."""
+    with instrumentation.span('fit.cubic', 'fit', points=10):
+        instrumentation.count('fits')
+    instrumentation.count('fits', 2)
+
+    path = instrumentation.export_chrome_trace(str(tmp_path / 'trace.json'))
+    with open(path) as file:
+        events = json.load(file)['traceEvents']
+    spans = [event for event in events if event['ph'] == 'X']
+    counters = [event for event in events if event['ph'] == 'C']
+    assert [(event['name'], event['cat'], event['args']) for event in spans] == \
+        [('fit.cubic', 'fit', {'points': 10})]
+    assert spans[0]['dur'] >= 0 and spans[0]['ts'] >= 0
+    assert [event['args'] for event in counters] == [{'fits': 1}, {'fits': 3}]
+    assert [event['ts'] for event in events] == sorted(event['ts'] for event in events)
@@ -0,0 +1,165 @@
+"""Tests for reading and pairing the datasets in plotting_data_with_pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import plotting_data_with_pandas as pd_with_pandas
+import stats_analysis
+from curve_fitting import clear_fit_cache, fit_model
+
+
+def _write(path, frame: pd.DataFrame) -> str:
+    """Write frame to path as csv and return the path as a string."""
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def misaligned_files(tmp_path):
+    """Return the paths of a CO2 file for 1990-1999 in reverse order, a temperature file for
+    1993-2004 and a sea level file for 1995-2002 with its rows shuffled.
+    """
+    co2_years = np.arange(1999, 1989, -1)
+    co2 = pd.DataFrame({'Year': co2_years})
+    for month in range(1, 13):
+        co2['Month ' + str(month)] = co2_years * 10.0 + month
+    temperature = pd.DataFrame({'Year': np.arange(1993, 2005),
+                                'Mean': np.arange(1993, 2005) / 100.0})
+    sea_years = np.array([1998, 1995, 2002, 1996, 2000, 1997, 2001, 1999])
+    sea_level = pd.DataFrame({'Year': sea_years, 'a': 0, 'b': 0, 'c': 0,
+                              'GMSL': sea_years - 1990.0})
+    paths = (_write(tmp_path / 'CO2_Levels.csv', co2),
+             _write(tmp_path / 'Mean_Global_Temperatures.csv', temperature),
+             _write(tmp_path / 'Sea_Level.csv', sea_level))
+    yield paths
+    pd_with_pandas.DATASET_CACHE.invalidate()
+
+
+def test_arrays_are_paired_by_year(misaligned_files) -> None:
+    """The values of each file are paired with the sea levels of the same year."""
+    co2, temperature, sea_level = misaligned_files
+    x_values, y_values = pd_with_pandas.filenames_to_arrays(co2, sea_level)
+    years = np.arange(1995, 2000)
+    np.testing.assert_allclose(x_values, years * 10.0 + 6.5)
+    np.testing.assert_array_equal(y_values, years - 1990.0)
+
+    x_values, y_values = pd_with_pandas.filenames_to_arrays(temperature, sea_level, np.float32)
+    assert x_values.dtype == np.float32 and x_values.flags.c_contiguous
+    np.testing.assert_allclose(x_values, np.arange(1995, 2003) / 100.0, rtol=1e-6)
+    np.testing.assert_array_equal(y_values, np.arange(1995, 2003) - 1990.0)
+
+
+def test_missing_values_are_left_out(tmp_path) -> None:
+    """Years in which the sea levels are missing, as outside 1993-2014 in the EPA file, are
+    not paired, so the statistics and fits see finite values only.
+    """
+    years = np.arange(1880, 2015)
+    sea_level = pd.DataFrame({'Year': years, 'a': 0, 'b': 0, 'c': 0,
+                              'NOAA': np.where(years >= 1993, years - 1990.0, np.nan)})
+    temperature = pd.DataFrame({'Year': years, 'Mean': np.sin(years / 7.0) + years / 100.0})
+    temperature.loc[temperature['Year'] == 2000, 'Mean'] = np.nan
+    dep_filename = _write(tmp_path / 'Sea_Level.csv', sea_level)
+    ind_filename = _write(tmp_path / 'Mean_Global_Temperatures.csv', temperature)
+    try:
+        x_values, y_values = pd_with_pandas.filenames_to_arrays(ind_filename, dep_filename)
+        assert x_values.size == 21
+        assert np.isfinite(x_values).all() and np.isfinite(y_values).all()
+        assert np.isfinite(stats_analysis.correlation(x_values, y_values))
+        fit = fit_model(ind_filename, dep_filename, 'cubic')
+        assert fit.x_values.size == 21
+    finally:
+        pd_with_pandas.DATASET_CACHE.invalidate()
+        clear_fit_cache()
+
+
+def test_co2_file_is_recognized_by_its_name(misaligned_files, tmp_path) -> None:
+    """Only the name of a file, not the directories it is in, marks it as the CO2 file."""
+    _, temperature, sea_level = misaligned_files
+    assert pd_with_pandas.is_co2_file(misaligned_files[0])
+    directory = tmp_path / 'CO2 study'
+    directory.mkdir()
+    moved = str(directory / 'Mean_Global_Temperatures.csv')
+    with open(temperature) as source, open(moved, 'w') as target:
+        target.write(source.read())
+    assert not pd_with_pandas.is_co2_file(moved)
+    assert pd_with_pandas.data_columns(moved) == [0, 1]
+    for annual in (False, True):
+        years, x_values, _ = pd_with_pandas.filenames_to_aligned_arrays(moved, sea_level,
+                                                                         annual=annual)
+        np.testing.assert_allclose(x_values, years / 100.0)
+
+
+def test_data_frame_is_indexed_by_year(misaligned_files) -> None:
+    """create_data_frame holds the years both files share, as its index."""
+    _, temperature, sea_level = misaligned_files
+    df = pd_with_pandas.create_data_frame(temperature, sea_level)
+    assert df.index.tolist() == list(range(1995, 2003))
+    assert df.columns[0].endswith('Mean Global Temperatures')
+    assert df.columns[1] == 'Global Mean Sea Levels'
+    assert df.loc[2000].tolist() == pytest.approx([20.0, 10.0])
+
+
+def test_monthly_values_resample_to_annual(misaligned_files) -> None:
+    """With annual=True, the monthly CO2 values are averaged by year before pairing, and
+    the years can be restricted.
+    """
+    co2, _, sea_level = misaligned_files
+    years, x_values, y_values = pd_with_pandas.filenames_to_aligned_arrays(
+        co2, sea_level, start=1996, stop=1998, annual=True)
+    assert years.tolist() == [1996, 1997, 1998]
+    np.testing.assert_allclose(x_values, years * 10.0 + 6.5)
+    np.testing.assert_array_equal(y_values, years - 1990.0)
+
+
+def test_files_covering_the_same_years_are_not_copied(climate_files) -> None:
+    """Files with the same years in the same order are paired without copying."""
+    x_values, _ = pd_with_pandas.filenames_to_arrays(climate_files['Temperature'],
+                                                     climate_files['Sea Level'])
+    frame = pd_with_pandas.check_file_format(climate_files['Temperature'], usecols=[0, 1])
+    assert np.shares_memory(x_values, frame.iloc[:, 1].to_numpy())
+
+
+def test_data_frames_hold_the_rows_that_are_fitted(misaligned_files) -> None:
+    """Each factor's frame holds the same rows fit_model fits, so the equation and statistics
+    shown with a line of best fit describe the line drawn.
+    """
+    co2, temperature, sea_level = misaligned_files
+    try:
+        dfs = pd_with_pandas.create_data_frames([co2, temperature], sea_level, workers=1)
+        assert [df.index.tolist() for df in dfs] == [list(range(1995, 2000)),
+                                                     list(range(1995, 2003))]
+        for df, filename in zip(dfs, (co2, temperature)):
+            fit = fit_model(filename, sea_level, 'linear')
+            np.testing.assert_array_equal(df.iloc[:, 0].to_numpy(), fit.x_values)
+            np.testing.assert_array_equal(df['Global Mean Sea Levels'].to_numpy(),
+                                          fit.y_values)
+    finally:
+        clear_fit_cache()
+
+
+def test_data_frames_share_the_common_years(misaligned_files) -> None:
+    """common_years restricts the frames of several factors to the years every file has data
+    for, so they can be regressed together.
+    """
+    co2, temperature, sea_level = misaligned_files
+    dfs = pd_with_pandas.common_years(
+        pd_with_pandas.create_data_frames([co2, temperature], sea_level, workers=1))
+    assert [df.index.tolist() for df in dfs] == [list(range(1995, 2000))] * 2
+    assert dfs[0]['Global Mean Sea Levels'].tolist() == \
+        dfs[1]['Global Mean Sea Levels'].tolist()
+    assert dfs[1].iloc[:, 0].tolist() == pytest.approx(np.arange(1995, 2000) / 100.0)
+
+
+def test_only_the_data_columns_are_read(climate_files) -> None:
+    """Loading the files reads the columns the pipeline uses, once each."""
+    cache = pd_with_pandas.DATASET_CACHE
+    files = [climate_files['CO2'], climate_files['Temperature'], climate_files['Sea Level']]
+    frames = pd_with_pandas.load_files(files, dep_filename=climate_files['Sea Level'])
+    assert frames[climate_files['Sea Level']].columns.tolist() == \
+        ['Year', 'Global Mean Sea Levels']
+    assert frames[climate_files['Temperature']].columns.tolist() == ['Year', 'Mean']
+    assert frames[climate_files['CO2']].shape[1] == 13
+
+    misses = cache.misses
+    pd_with_pandas.create_data_frames(files[:2], climate_files['Sea Level'])
+    assert cache.misses == misses
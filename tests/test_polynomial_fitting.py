@@ -0,0 +1,48 @@
+"""Tests for the direct polynomial solvers in polynomial_fitting."""
+import numpy as np
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from polynomial_fitting import fit_polynomial, fit_polynomial_chunks
+
+
+def _series(points: int, seed: int = 0):
+    """Return trending x values like years and a noisy cubic of them."""
+    rng = np.random.default_rng(seed)
+    x_values = np.sort(rng.uniform(1880.0, 2020.0, points))
+    t = x_values - 1950.0
+    y_values = 0.002 * t ** 3 - 0.1 * t ** 2 + 3.0 * t + 40.0 + rng.normal(size=points)
+    return x_values, y_values
+
+
+@pytest.mark.parametrize('degree', [0, 1, 2, 3])
+def test_matches_polyfit(degree) -> None:
+    """The QR solution agrees with numpy's polyfit."""
+    x_values, y_values = _series(300)
+    fit = fit_polynomial(x_values, y_values, degree)
+    expected = np.polyfit(x_values - 1950.0, y_values, degree)
+    # compare the predictions, since coefficients in raw powers of years are ill-conditioned
+    assert fit.predict(x_values) == pytest.approx(np.polyval(expected, x_values - 1950.0),
+                                                  rel=1e-8)
+
+
+@settings(deadline=None, max_examples=30)
+@given(st.integers(min_value=0, max_value=3), st.integers(min_value=1, max_value=80))
+def test_chunked_matches_direct(degree, chunk_rows) -> None:
+    """The tall-skinny QR over chunks of any size matches the direct solve."""
+    x_values, y_values = _series(200, seed=degree)
+    direct = fit_polynomial(x_values, y_values, degree)
+    chunked = fit_polynomial_chunks(x_values, y_values, degree, chunk_rows)
+    assert chunked.predict(x_values) == pytest.approx(direct.predict(x_values), rel=1e-9,
+                                                       abs=1e-6)
+    assert chunked.residual_sum_squares == pytest.approx(direct.residual_sum_squares,
+                                                         rel=1e-8)
+    assert chunked.covariance == pytest.approx(direct.covariance, rel=1e-6)
+
+
+def test_too_few_points_raises() -> None:
+    """A polynomial needs more points than its degree."""
+    with pytest.raises(ValueError):
+        fit_polynomial([1.0, 2.0], [1.0, 2.0], 2)
+    with pytest.raises(ValueError):
+        fit_polynomial_chunks([1.0, 2.0], [1.0, 2.0], 2)
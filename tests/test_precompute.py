@@ -0,0 +1,80 @@
+"""Tests for the background result store in precompute."""
+import threading
+import time
+
+import pytest
+
+import plotting_data_with_pandas as pd_with_pandas
+from precompute import ResultStore
+
+
+@pytest.fixture
+def store(climate_files):
+    """Return a store of the results for the CO2 and temperature files, not started."""
+    ind_filenames = [climate_files['CO2'], climate_files['Temperature']]
+    dfs = pd_with_pandas.create_data_frames(ind_filenames, climate_files['Sea Level'])
+    result_store = ResultStore(ind_filenames, climate_files['Sea Level'], dfs)
+    yield result_store
+    result_store.shutdown()
+
+
+def test_results_match_whether_started_or_not(store, climate_files) -> None:
+    """Results computed on the pool are the same as results computed on request."""
+    ind_filenames = [climate_files['CO2'], climate_files['Temperature']]
+    dfs = pd_with_pandas.create_data_frames(ind_filenames, climate_files['Sea Level'])
+    started = ResultStore(ind_filenames, climate_files['Sea Level'], dfs)
+    started.start(workers=2)
+    try:
+        assert started.line(0) == store.line(0)
+        assert started.curve('cubic', 1) == store.curve('cubic', 1)
+    finally:
+        started.shutdown()
+    assert store.progress() == (2, len(store._tasks))
+
+
+def test_two_threads_share_one_computation(store) -> None:
+    """Two threads asking for the same result before it is ready compute it once, and both
+    get it.
+    """
+    calls = []
+    computing = threading.Event()
+
+    def slow_result() -> int:
+        """Return a result after giving the other thread time to ask for it too."""
+        calls.append(threading.current_thread().name)
+        computing.set()
+        time.sleep(0.2)
+        return 7
+
+    store._tasks[('line', 0)] = slow_result
+    results = []
+    errors = []
+
+    def ask() -> None:
+        """Request the result, recording it or the error raised."""
+        try:
+            results.append(store.line(0))
+        except Exception as error:  # pylint: disable=broad-except
+            errors.append(error)
+
+    first = threading.Thread(target=ask)
+    first.start()
+    assert computing.wait(5)
+    second = threading.Thread(target=ask)
+    second.start()
+    first.join(5)
+    second.join(5)
+
+    assert errors == []
+    assert results == [7, 7]
+    assert len(calls) == 1
+
+
+def test_start_keeps_results_computed_before_it(store) -> None:
+    """Starting the pool does not recompute results already computed on request."""
+    calls = []
+    store._tasks[('line', 1)] = lambda: calls.append(1) or len(calls)
+    assert store.line(1) == 1
+    store.start(workers=2)
+    assert store.line(1) == 1
+    assert len(calls) == 1
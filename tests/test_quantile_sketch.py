@@ -0,0 +1,60 @@
+"""Tests for the KLL quantile sketch in quantile_sketch."""
+import numpy as np
+import pytest
+from hypothesis import given, strategies as st
+
+from quantile_sketch import QuantileSketch
+from stats_analysis import EmptyDatasetError
+
+FINITE_FLOATS = st.floats(min_value=-1e6, max_value=1e6, allow_nan=False)
+
+
+def _rank_error(values: np.ndarray, sketch: QuantileSketch, q: float) -> float:
+    """Return how far the normalized rank of the sketch's q-th quantile is from q."""
+    answer = sketch.quantile(q)
+    low = np.count_nonzero(values < answer) / values.size
+    high = np.count_nonzero(values <= answer) / values.size
+    return max(low - q, q - high, 0.0)
+
+
+@given(st.lists(FINITE_FLOATS, min_size=1, max_size=150),
+       st.floats(min_value=0.0, max_value=1.0))
+def test_exact_below_capacity(values, q) -> None:
+    """Fewer than k values are kept exactly, so quantiles are the exact order statistics."""
+    sketch = QuantileSketch(k=200, seed=0)
+    sketch.update(values)
+    assert sketch.num_retained == len(values)
+    assert sketch.quantile(q) == np.quantile(values, q, method='inverted_cdf')
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_rank_error_within_bound(seed) -> None:
+    """The rank error of every decile stays within the sketch's published bound."""
+    values = np.random.default_rng(seed).lognormal(size=100000)
+    sketch = QuantileSketch(k=200, seed=seed)
+    sketch.update(values)
+    assert sketch.n == values.size
+    assert sketch.num_retained < 3 * sketch.k
+    for q in np.linspace(0.0, 1.0, 11):
+        assert _rank_error(values, sketch, q) <= sketch.normalized_rank_error
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_merged_sketches_within_bound(seed) -> None:
+    """Sketches of separate chunks merge into a sketch of all of them within the bound."""
+    chunks = np.array_split(np.random.default_rng(seed).normal(size=60000), 7)
+    merged = QuantileSketch(k=200, seed=seed)
+    for i, chunk in enumerate(chunks):
+        sketch = QuantileSketch(k=200, seed=seed * 10 + i)
+        sketch.update(chunk)
+        merged.merge(sketch)
+    values = np.concatenate(chunks)
+    assert merged.n == values.size
+    for q in np.linspace(0.0, 1.0, 11):
+        assert _rank_error(values, merged, q) <= merged.normalized_rank_error
+
+
+def test_empty_sketch_raises() -> None:
+    """Asking an empty sketch for a quantile raises EmptyDatasetError."""
+    with pytest.raises(EmptyDatasetError):
+        QuantileSketch().quantile(0.5)
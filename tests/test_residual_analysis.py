@@ -0,0 +1,40 @@
+"""Tests for the residual measures in residual_analysis."""
+import numpy as np
+import pytest
+
+from residual_analysis import linear_fit_residuals, residual_summaries, residual_summary
+from stats_analysis import EmptyDatasetError
+
+
+def test_batched_summaries_match_each_model() -> None:
+    """Summarizing several models at once gives each model's own paired residuals."""
+    rng = np.random.default_rng(1)
+    x_values = np.linspace(0.0, 5.0, 40)
+    y_values = x_values ** 2 + rng.normal(size=40)
+    models = [lambda x: 2.0 * x, lambda x: x ** 2, lambda x: np.exp(x / 2.0)]
+
+    for model, summary in zip(models, residual_summaries(models, x_values, y_values)):
+        residuals = y_values - model(x_values)
+        np.testing.assert_allclose(summary.residuals, residuals)
+        assert summary.rmse == pytest.approx(np.sqrt(np.mean(residuals ** 2)))
+        assert summary.mae == pytest.approx(np.mean(np.abs(residuals)))
+        assert summary.max_error == pytest.approx(np.max(np.abs(residuals)))
+        assert residual_summary(model, x_values, y_values).rmse == pytest.approx(summary.rmse)
+
+
+def test_linear_fit_residuals_match_polyfit() -> None:
+    """The residuals of the line of best fit are those of numpy's least-squares line."""
+    x_values = [1.0, 2.0, 4.0, 7.0, 8.0]
+    y_values = [2.0, 3.5, 4.0, 9.0, 8.5]
+    slope, intercept = np.polyfit(x_values, y_values, 1)
+    expected = np.array(y_values) - (slope * np.array(x_values) + intercept)
+    np.testing.assert_allclose(linear_fit_residuals(x_values, y_values).residuals, expected,
+                               atol=1e-12)
+
+
+def test_mismatched_or_empty_values_raise() -> None:
+    """Values that cannot be paired, or that are empty, are rejected."""
+    with pytest.raises(ValueError):
+        residual_summaries([np.sin], [1.0, 2.0], [1.0])
+    with pytest.raises(EmptyDatasetError):
+        residual_summaries([np.sin], [], [])
@@ -0,0 +1,77 @@
+"""Tests for the sliding-window regressions in rolling_analysis."""
+import numpy as np
+import pytest
+
+from rolling_analysis import RollingRegression, rolling_regression
+from stats_analysis import EmptyDatasetError
+
+
+def _hourly_stream(points: int, seed: int = 0):
+    """Return hourly epoch timestamps and a noisy series rising with them."""
+    rng = np.random.default_rng(seed)
+    timestamps = 1.7e9 + 3600.0 * np.arange(points)
+    return timestamps, 2.0615e-06 * (timestamps - 1.7e9) + rng.normal(scale=0.01, size=points)
+
+
+def _polyfit_window(x_values, y_values, end: int, window: int):
+    """Return the slope and intercept numpy fits to the window of observations ending just
+    before end.
+    """
+    x_window, y_window = x_values[end - window:end], y_values[end - window:end]
+    centre = x_window.mean()
+    slope, intercept = np.polyfit(x_window - centre, y_window, 1)
+    return slope, intercept - slope * centre
+
+
+def test_streaming_matches_polyfit_on_a_long_stream() -> None:
+    """After half a million hourly timestamps the streaming line of best fit still matches
+    a fresh fit of the window.
+    """
+    x_values, y_values = _hourly_stream(500000)
+    window = 24
+    rolling = RollingRegression(window)
+    checkpoints = set(range(window, x_values.size + 1, 49999)) | {x_values.size}
+    for i, (x, y) in enumerate(zip(x_values.tolist(), y_values.tolist()), start=1):
+        rolling.push(x, y)
+        if i in checkpoints:
+            slope, intercept = _polyfit_window(x_values, y_values, i, window)
+            assert rolling.slope == pytest.approx(slope, rel=1e-8)
+            assert rolling.intercept == pytest.approx(intercept, rel=1e-8)
+    assert len(rolling) == window
+
+
+def test_streaming_matches_vectorized() -> None:
+    """Pushing a series through a window gives the same line as rolling_regression."""
+    x_values, y_values = _hourly_stream(2000, seed=1)
+    result = rolling_regression(x_values, y_values, 50, step=10)
+    rolling = RollingRegression(50)
+    for i, (x, y) in enumerate(zip(x_values, y_values), start=1):
+        rolling.push(x, y)
+        if i >= 50 and (i - 50) % 10 == 0:
+            index = (i - 50) // 10
+            assert rolling.slope == pytest.approx(result.slope[index], rel=1e-8)
+            assert rolling.correlation == pytest.approx(result.correlation[index], rel=1e-8)
+
+
+def test_vectorized_matches_polyfit() -> None:
+    """Every window of rolling_regression matches a fresh fit of that window."""
+    x_values, y_values = _hourly_stream(300000, seed=2)
+    result = rolling_regression(x_values, y_values, 24, step=9973)
+    for start, slope, intercept in zip(result.starts, result.slope, result.intercept):
+        expected = _polyfit_window(x_values, y_values, start + 24, 24)
+        assert (slope, intercept) == pytest.approx(expected, rel=1e-8)
+
+
+def test_popping_to_empty_and_refilling() -> None:
+    """A window emptied by pop starts afresh, and fewer than two points have no line."""
+    rolling = RollingRegression(3)
+    rolling.push(1e9, 5.0)
+    rolling.push(1e9 + 1, 7.0)
+    rolling.pop()
+    rolling.pop()
+    with pytest.raises(EmptyDatasetError):
+        _ = rolling.slope
+    rolling.push(2.0, 1.0)
+    rolling.push(4.0, 2.0)
+    assert rolling.slope == pytest.approx(0.5)
+    assert rolling.intercept == pytest.approx(0.0)
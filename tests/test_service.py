@@ -0,0 +1,122 @@
+"""Tests for the JSON service in service."""
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import plotting_data_with_pandas as pd_with_pandas
+from curve_fitting import clear_fit_cache
+from service import AnalysisService
+
+
+def test_identical_queries_are_computed_once() -> None:
+    """Concurrent identical queries wait for one computation; later ones hit the cache."""
+    service = AnalysisService([], 'unused.csv', workers=4)
+    calls = []
+    release = threading.Event()
+
+    def compute() -> int:
+        """Return a result once released."""
+        calls.append(1)
+        release.wait(5)
+        return 42
+
+    async def run() -> list:
+        """Send twenty identical queries while the first is computing, then one more."""
+        queries = [asyncio.ensure_future(service.query('key', compute)) for _ in range(20)]
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(*queries)
+        results.append(await service.query('key', compute))
+        return results
+
+    try:
+        assert asyncio.run(run()) == [42] * 21
+    finally:
+        service.shutdown()
+    assert len(calls) == 1
+    assert (service.computations, service.coalesced, service.cache_hits) == (1, 19, 1)
+
+
+def test_failed_computation_is_not_cached() -> None:
+    """A computation that raises is reported to every waiter and retried later."""
+    service = AnalysisService([], 'unused.csv', workers=2)
+    attempts = []
+
+    def compute() -> str:
+        """Fail the first time."""
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError('boom')
+        return 'ok'
+
+    async def run() -> str:
+        """Query, fail, and query again."""
+        with pytest.raises(RuntimeError):
+            await service.query('key', compute)
+        return await service.query('key', compute)
+
+    try:
+        assert asyncio.run(run()) == 'ok'
+    finally:
+        service.shutdown()
+    assert len(attempts) == 2
+
+
+def test_endpoints(climate_files) -> None:
+    """The service answers fits and statistics of the loaded files, and errors as JSON."""
+    factors = [climate_files['CO2'], climate_files['Temperature']]
+    service = AnalysisService(factors, climate_files['Sea Level'], workers=2)
+
+    async def run() -> list:
+        """Load the files and send a few queries."""
+        await service.load()
+        return [await service.respond(target) for target in
+                ('/factors', '/fit?factor=0&model=linear', '/stats?factor=1',
+                 '/predict?factor=0&model=cubic&x=350,400', '/fit?factor=9&model=linear',
+                 '/fit?factor=0&model=quartic', '/nowhere')]
+
+    try:
+        answers = asyncio.run(run())
+    finally:
+        service.shutdown()
+    statuses = [status for status, _ in answers]
+    assert statuses == [200, 200, 200, 200, 404, 400, 404]
+    assert len(answers[0][1]['factors']) == 2
+    assert len(answers[1][1]['parameters']) == 2
+    assert answers[1][1]['points'] == 30
+    assert -1.0 <= answers[2][1]['correlation'] <= 1.0
+    assert len(answers[3][1]['y']) == 2
+
+
+def test_stats_and_fit_use_the_same_years(tmp_path) -> None:
+    """/stats describes the line /fit fits, even when the factors cover different years."""
+    years = np.arange(1990, 2010)
+    paths = []
+    for name, factor_years in (('Mean_Global_Temperatures.csv', years),
+                               ('Mean_Cumulative_Mass_Balance_of_Glaciers.csv', years[8:])):
+        paths.append(str(tmp_path / name))
+        pd.DataFrame({'Year': factor_years,
+                      'Mean': np.sin(factor_years / 3.0) + factor_years / 50.0}) \
+            .to_csv(paths[-1], index=False)
+    dep_filename = str(tmp_path / 'Sea_Level.csv')
+    pd.DataFrame({'Year': years, 'a': 0, 'b': 0, 'c': 0, 'GMSL': years * 0.3 - 590.0}) \
+        .to_csv(dep_filename, index=False)
+    service = AnalysisService(paths, dep_filename, workers=2)
+
+    async def run() -> list:
+        """Ask for the statistics and the linear fit of the factor with the most years."""
+        await service.load()
+        return [await service.respond(target)
+                for target in ('/stats?factor=0', '/fit?factor=0&model=linear')]
+
+    try:
+        (_, stats), (_, fit) = asyncio.run(run())
+    finally:
+        service.shutdown()
+        pd_with_pandas.DATASET_CACHE.invalidate()
+        clear_fit_cache()
+    assert stats['points'] == fit['points'] == 20
+    assert [stats['slope'], stats['intercept']] == pytest.approx(fit['parameters'], rel=1e-6)
@@ -0,0 +1,141 @@
+"""Tests for the statistics in stats_analysis."""
+from collections import Counter
+
+import numpy as np
+import pytest
+from hypothesis import assume, given, strategies as st
+
+import startup_profile
+import stats_analysis
+from stats_analysis import BivariateAccumulator, EmptyDatasetError, RegressionAccumulator
+
+FINITE_FLOATS = st.floats(min_value=-1e3, max_value=1e3, allow_nan=False)
+
+
+@st.composite
+def paired_values(draw, min_size: int = 3):
+    """Draw x and y arrays of the same length, with x not constant."""
+    size = draw(st.integers(min_value=min_size, max_value=60))
+    x_values = np.array(draw(st.lists(FINITE_FLOATS, min_size=size, max_size=size)))
+    y_values = np.array(draw(st.lists(FINITE_FLOATS, min_size=size, max_size=size)))
+    assume(np.ptp(x_values) > 1e-3 and np.ptp(y_values) > 1e-3)
+    return x_values, y_values
+
+
+@given(paired_values(), st.data())
+def test_merge_matches_single_pass(pair, data) -> None:
+    """Accumulators of two chunks merge into the accumulator of all the data."""
+    x_values, y_values = pair
+    split = data.draw(st.integers(min_value=0, max_value=x_values.size))
+    merged = BivariateAccumulator(x_values[:split], y_values[:split])
+    merged.merge(BivariateAccumulator(x_values[split:], y_values[split:]))
+    whole = BivariateAccumulator(x_values, y_values)
+
+    assert merged.n == whole.n
+    for name in ('mean_x', 'mean_y', 'variance_x', 'variance_y', 'covariance', 'slope'):
+        assert getattr(merged, name) == pytest.approx(getattr(whole, name), rel=1e-9,
+                                                      abs=1e-9)
+
+
+@given(paired_values())
+def test_add_matches_update(pair) -> None:
+    """Adding observations one at a time gives the same statistics as one update."""
+    x_values, y_values = pair
+    accumulator = BivariateAccumulator()
+    for x, y in zip(x_values, y_values):
+        accumulator.add(x, y)
+    whole = BivariateAccumulator(x_values, y_values)
+    assert accumulator.slope == pytest.approx(whole.slope, rel=1e-9, abs=1e-9)
+    assert accumulator.intercept == pytest.approx(whole.intercept, rel=1e-9, abs=1e-6)
+
+
+@given(paired_values())
+def test_line_of_best_fit_matches_numpy(pair) -> None:
+    """The slope, intercept and correlation agree with numpy's."""
+    x_values, y_values = pair
+    accumulator = BivariateAccumulator(x_values, y_values)
+    slope, intercept = np.polyfit(x_values, y_values, 1)
+    assert accumulator.slope == pytest.approx(slope, rel=1e-6, abs=1e-9)
+    assert accumulator.intercept == pytest.approx(intercept, rel=1e-6, abs=1e-6)
+    assert accumulator.correlation == pytest.approx(np.corrcoef(x_values, y_values)[0, 1],
+                                                    rel=1e-6, abs=1e-9)
+
+
+def test_large_offset_keeps_precision() -> None:
+    """Values far from zero compared to their spread do not lose the slope."""
+    x_values = 1.0e9 + np.arange(1000.0)
+    y_values = 3.0 * np.arange(1000.0) + 1.0e9
+    assert BivariateAccumulator(x_values, y_values).slope == pytest.approx(3.0, rel=1e-12)
+
+
+def test_single_precision_matches_double() -> None:
+    """float32 arrays are summarized in double precision, in chunks."""
+    rng = np.random.default_rng(0)
+    x_values = rng.normal(size=200000).astype(np.float32)
+    y_values = (2.0 * x_values + rng.normal(size=x_values.size)).astype(np.float32)
+    single = BivariateAccumulator(x_values, y_values)
+    double = BivariateAccumulator(x_values.astype(float), y_values.astype(float))
+    assert single.slope == pytest.approx(double.slope, rel=1e-12)
+    assert single.r_squared == pytest.approx(double.r_squared, rel=1e-12)
+
+
+@given(st.lists(FINITE_FLOATS, min_size=1, max_size=60),
+       st.floats(min_value=0.0, max_value=1.0))
+def test_quantile_matches_numpy(values, q) -> None:
+    """quantile interpolates between order statistics like numpy's default method."""
+    assert stats_analysis.quantile(values, q) == pytest.approx(np.quantile(values, q),
+                                                               rel=1e-12, abs=1e-12)
+
+
+@given(st.lists(st.integers(min_value=0, max_value=5).map(float), min_size=1, max_size=40))
+def test_mode_is_first_most_common(values) -> None:
+    """mode returns the most common value, the first to occur on ties, for lists and
+    arrays alike.
+    """
+    counts = Counter(values)
+    expected = next(value for value in values if counts[value] == max(counts.values()))
+    assert stats_analysis.mode(values) == expected
+    assert stats_analysis.mode(np.array(values)) == expected
+
+
+def test_empty_inputs_raise() -> None:
+    """The single-series statistics raise EmptyDatasetError on empty data."""
+    for function in (stats_analysis.mean, stats_analysis.median, stats_analysis.mode):
+        with pytest.raises(EmptyDatasetError):
+            function([])
+
+
+def test_regression_matches_least_squares() -> None:
+    """The sufficient-statistics regression matches a direct least-squares solve."""
+    rng = np.random.default_rng(1)
+    factors = rng.normal(size=(500, 3)) + [400.0, 14.0, -20.0]
+    target = factors @ [0.5, -2.0, 0.25] + 7.0 + rng.normal(scale=0.1, size=500)
+    accumulator = RegressionAccumulator(['a', 'b', 'c'])
+    accumulator.update(factors[:200], target[:200])
+    accumulator.update(factors[200:], target[200:])
+    coefficients, intercept, _ = accumulator.solve()
+
+    design = np.column_stack([factors, np.ones(500)])
+    expected = np.linalg.lstsq(design, target, rcond=None)[0]
+    assert coefficients == pytest.approx(expected[:3], rel=1e-8)
+    assert intercept == pytest.approx(expected[3], rel=1e-8)
+
+
+@given(st.lists(FINITE_FLOATS, min_size=2, max_size=60))
+def test_list_stats_match_numpy(values) -> None:
+    """Before numpy is imported, lists are summarized in pure Python with the same results."""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(stats_analysis, '_numpy_loaded', lambda: False)
+        mean = stats_analysis.mean(values)
+        deviation = stats_analysis.sample_standard_deviation(values)
+        mode = stats_analysis.mode(values)
+        with pytest.raises(EmptyDatasetError):
+            stats_analysis.mean([])
+    assert mean == pytest.approx(np.mean(values), abs=1e-9)
+    assert deviation == pytest.approx(np.std(values, ddof=1), abs=1e-9)
+    assert mode == stats_analysis.mode(np.array(values))
+
+
+def test_basic_stats_do_not_import_numpy() -> None:
+    """Importing stats_analysis and summarizing a list loads none of the heavy libraries."""
+    assert startup_profile.basic_stats_heavy_imports() == []
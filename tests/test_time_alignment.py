@@ -0,0 +1,102 @@
+"""Tests for resampling and joining time series in time_alignment."""
+import numpy as np
+import pandas as pd
+import pytest
+from hypothesis import given, strategies as st
+
+import time_alignment
+
+SORTED_KEYS = st.sets(st.integers(min_value=1800, max_value=2100), max_size=50).map(sorted)
+
+
+@given(SORTED_KEYS, SORTED_KEYS)
+def test_merge_join_finds_common_keys(left, right) -> None:
+    """merge_join pairs exactly the keys the two series share, in increasing order."""
+    left_positions, right_positions = time_alignment.merge_join(np.array(left, dtype=int),
+                                                                np.array(right, dtype=int))
+    common = sorted(set(left) & set(right))
+    assert [left[i] for i in left_positions] == common
+    assert [right[i] for i in right_positions] == common
+
+
+def test_merge_join_rejects_unsorted_keys() -> None:
+    """Repeated or unsorted keys must be resampled first."""
+    with pytest.raises(ValueError):
+        time_alignment.merge_join(np.array([1, 1, 2]), np.array([1, 2]))
+
+
+@given(st.lists(st.tuples(st.integers(min_value=0, max_value=9),
+                          st.one_of(st.floats(min_value=-1e3, max_value=1e3),
+                                    st.just(float('nan')))),
+                min_size=1, max_size=60),
+       st.sampled_from(['mean', 'sum', 'min', 'max', 'first', 'last', 'count']))
+def test_resample_matches_pandas(pairs, how) -> None:
+    """resample aggregates each label's values like a pandas groupby, ignoring NaNs."""
+    labels = np.array([label for label, _ in pairs])
+    values = np.array([value for _, value in pairs])
+    keys, result = time_alignment.resample(labels, values, how)
+    expected = pd.Series(values).groupby(labels).agg(how)
+    assert keys.tolist() == expected.index.tolist()
+    np.testing.assert_allclose(result, expected.to_numpy(dtype=float), rtol=1e-9,
+                               atol=1e-9)
+
+
+def test_resample_first_and_last_skip_nan() -> None:
+    """first and last take the first and last values that are not NaN in each label."""
+    nan = float('nan')
+    labels = np.array([1, 1, 1, 2, 2, 3])
+    values = np.array([nan, 1.0, 2.0, 3.0, nan, nan])
+    _, first = time_alignment.resample(labels, values, 'first')
+    _, last = time_alignment.resample(labels, values, 'last')
+    np.testing.assert_array_equal(first, [1.0, 3.0, nan])
+    np.testing.assert_array_equal(last, [2.0, 3.0, nan])
+
+
+def test_resample_keeps_the_order_of_equal_labels() -> None:
+    """first and last follow the order of the values even when the labels decrease."""
+    labels = np.array([1, 0, 0])
+    values = np.array([float('nan'), 0.0, 1.0])
+    assert time_alignment.resample(labels, values, 'first')[1][0] == 0.0
+    assert time_alignment.resample(labels, values, 'last')[1][0] == 1.0
+
+
+def test_resample_monthly_to_annual() -> None:
+    """Fractional-year monthly keys resample to annual means."""
+    keys = 2000.0 + (np.arange(24) + 0.5) / 12
+    years, means = time_alignment.resample(time_alignment.annual_labels(keys),
+                                           np.arange(24.0))
+    assert years.tolist() == [2000, 2001]
+    assert means.tolist() == [5.5, 17.5]
+
+
+def test_align_keeps_common_keys_of_every_series() -> None:
+    """align keeps only the keys every series has, whatever their order in the files."""
+    keys, (first, second, third) = time_alignment.align(
+        (np.array([1, 2, 3, 4]), np.array([10.0, 20.0, 30.0, 40.0])),
+        (np.array([2, 3, 4, 5]), np.array([0.2, 0.3, 0.4, 0.5])),
+        (np.array([0, 2, 4]), np.array([-1.0, -2.0, -4.0])))
+    assert keys.tolist() == [2, 4]
+    assert first.tolist() == [20.0, 40.0]
+    assert second.tolist() == [0.2, 0.4]
+    assert third.tolist() == [-2.0, -4.0]
+
+
+def test_filter_range_is_inclusive() -> None:
+    """filter_range keeps the keys from start to stop, both included."""
+    keys, values = time_alignment.filter_range(np.arange(1990, 2000), np.arange(10.0),
+                                               1993, 1995)
+    assert keys.tolist() == [1993, 1994, 1995]
+    assert values.tolist() == [3.0, 4.0, 5.0]
+
+
+def test_drop_missing_removes_incomplete_keys() -> None:
+    """Keys at which any series has a missing value are dropped from all of them."""
+    keys, (first, second) = time_alignment.drop_missing(
+        np.array([1, 2, 3, 4]), [np.array([1.0, np.nan, 3.0, 4.0]),
+                                 np.array([5.0, 6.0, np.inf, 8.0])])
+    assert keys.tolist() == [1, 4]
+    assert first.tolist() == [1.0, 4.0]
+    assert second.tolist() == [5.0, 8.0]
+
+    values = [np.arange(4.0)]
+    assert time_alignment.drop_missing(np.arange(4), values)[1][0] is values[0]
@@ -0,0 +1,222 @@
+"""
+Contains functions for aligning time series on a time key.
+
+Each series is a pair of arrays: its keys (years as numbers, possibly fractional, or numpy
+datetime64 values) and its values. Series of different cadences are first resampled onto a
+common cadence, e.g. monthly values to annual means, by labelling each key with the period it
+falls in and reducing each run of equal labels in one vectorized pass. Series on the same
+cadence are then joined on their keys with a merge of their sorted keys, and can be restricted
+to a range of keys without copying.
+"""
+from __future__ import annotations
+
+from typing import List, Tuple, TYPE_CHECKING
+
+from lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    import numpy
+
+np = lazy_import('numpy')
+
+AGGREGATIONS = ('mean', 'sum', 'min', 'max', 'first', 'last', 'count')
+
+# A time series: its keys and its values, of the same length
+Series = Tuple['numpy.ndarray', 'numpy.ndarray']
+
+
+def sort_series(keys: numpy.ndarray, values: numpy.ndarray) -> Series:
+    """Return keys and values ordered by increasing key, keeping values with equal keys in
+    their original order. Series that are already in order, as most files are, are returned
+    as they are; series in strictly decreasing order are reversed without sorting.
+    Preconditions:
+        - len(keys) == len(values)
+    """
+    keys, values = np.asarray(keys), np.asarray(values)
+    if keys.shape[0] != values.shape[0]:
+        raise ValueError('keys and values must have the same length')
+    steps = np.diff(keys)
+    if np.all(steps >= 0):
+        return keys, values
+    if np.all(steps < 0):
+        return keys[::-1], values[::-1]
+    order = np.argsort(keys, kind='stable')
+    return keys[order], values[order]
+
+
+def annual_labels(keys: numpy.ndarray) -> numpy.ndarray:
+    """Return the year each key falls in, as an integer, for keys that are years (possibly
+    fractional) or datetime64 values.
+    """
+    keys = np.asarray(keys)
+    if np.issubdtype(keys.dtype, np.datetime64):
+        return keys.astype('datetime64[Y]').astype(np.int64) + 1970
+    return np.floor(keys).astype(np.int64)
+
+
+def monthly_labels(keys: numpy.ndarray) -> numpy.ndarray:
+    """Return the month each key falls in, as a datetime64[M], for keys that are datetime64
+    values or fractional years (where year + (m - 0.5) / 12 is the middle of month m).
+    """
+    keys = np.asarray(keys)
+    if np.issubdtype(keys.dtype, np.datetime64):
+        return keys.astype('datetime64[M]')
+    months_since_1970 = np.floor((keys - 1970.0) * 12.0).astype(np.int64)
+    return months_since_1970.astype('datetime64[M]')
+
+
+def resample(labels: numpy.ndarray, values: numpy.ndarray, how: str = 'mean') -> Series:
+    """Return the distinct labels, in increasing order, and the aggregate of the values
+    with each label, e.g. the annual means of monthly values labelled with annual_labels.
+
+    Each run of equal labels is reduced with a single ufunc.reduceat call, so resampling is
+    linear in the number of values once the labels are sorted. NaN values are ignored: 'first'
+    and 'last' take the first and last value that is not NaN, and a label whose values are all
+    NaN has a NaN mean, minimum, maximum, first and last value. Labels that are already
+    distinct are returned with their values as they are, without reducing them.
+    Preconditions:
+        - how in AGGREGATIONS
+        - len(labels) == len(values)
+    """
+    if how not in AGGREGATIONS:
+        raise ValueError('how must be one of ' + ', '.join(AGGREGATIONS))
+    labels, values = sort_series(labels, np.asarray(values, dtype=float))
+    if labels.size == 0:
+        return labels, values
+
+    starts = np.concatenate([[0], np.flatnonzero(labels[1:] != labels[:-1]) + 1])
+    if starts.size == labels.size and how in ('mean', 'min', 'max', 'first', 'last'):
+        return labels, values  # every run holds one value, which is its own aggregate
+
+    present = ~np.isnan(values)
+    counts = np.add.reduceat(present.astype(np.int64), starts)
+    if how == 'count':
+        result = counts.astype(float)
+    elif how in ('first', 'last'):
+        result = _first_or_last_present(values, present, starts, how == 'first')
+    elif how == 'min':
+        result = np.fmin.reduceat(values, starts)
+    elif how == 'max':
+        result = np.fmax.reduceat(values, starts)
+    else:
+        sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+        if how == 'sum':
+            result = sums
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = sums / counts
+    return labels[starts], result
+
+
+def _first_or_last_present(values: numpy.ndarray, present: numpy.ndarray,
+                           starts: numpy.ndarray, first: bool) -> numpy.ndarray:
+    """Return the first (or last, if first is False) value that is not NaN in each run of
+    values beginning at the positions in starts, or NaN for a run with no such value.
+    """
+    result = np.full(starts.size, np.nan)
+    positions = np.flatnonzero(present)
+    if positions.size == 0:
+        return result
+    runs = np.searchsorted(starts, positions, side='right') - 1
+    if first:
+        boundary = np.concatenate([[True], runs[1:] != runs[:-1]])
+    else:
+        boundary = np.concatenate([runs[1:] != runs[:-1], [True]])
+    result[runs[boundary]] = values[positions[boundary]]
+    return result
+
+
+def filter_range(keys: numpy.ndarray, values: numpy.ndarray, start: object = None,
+                 stop: object = None) -> Series:
+    """Return the part of the series whose keys are in [start, stop], as views of keys and
+    values found by binary search. A start or stop of None leaves that end open.
+    Preconditions:
+        - keys is sorted in increasing order
+    """
+    low = 0 if start is None else int(np.searchsorted(keys, start, side='left'))
+    high = len(keys) if stop is None else int(np.searchsorted(keys, stop, side='right'))
+    return keys[low:high], values[low:high]
+
+
+def merge_join(left_keys: numpy.ndarray,
+               right_keys: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the positions in left_keys and in right_keys of every key the two have in
+    common, in increasing key order.
+
+    Both key arrays must be sorted with no repeated keys (e.g. the output of resample). The
+    right keys are merged into the left keys with a vectorized binary search, so no keys are
+    compared in Python.
+    Preconditions:
+        - left_keys and right_keys are sorted in strictly increasing order
+    """
+    left_keys, right_keys = np.asarray(left_keys), np.asarray(right_keys)
+    for keys in (left_keys, right_keys):
+        if keys.size > 1 and not np.all(keys[1:] > keys[:-1]):
+            raise ValueError('keys must be sorted and unique; resample the series first')
+
+    positions = np.searchsorted(left_keys, right_keys)
+    in_bounds = positions < left_keys.size
+    matched = np.zeros(right_keys.size, dtype=bool)
+    matched[in_bounds] = left_keys[positions[in_bounds]] == right_keys[in_bounds]
+    return positions[matched], np.flatnonzero(matched)
+
+
+def align(*series: Series) -> Tuple[numpy.ndarray, List[numpy.ndarray]]:
+    """Return the keys common to every (keys, values) series in series, and the values of
+    each series at those keys.
+    Series that all have the same keys, as files covering the same years do, are returned as
+    they are.
+    Preconditions:
+        - len(series) > 0
+        - the keys of every series are sorted in strictly increasing order
+    """
+    keys = np.asarray(series[0][0])
+    if all(np.array_equal(keys, other_keys) for other_keys, _ in series[1:]):
+        if keys.size > 1 and not np.all(keys[1:] > keys[:-1]):
+            raise ValueError('keys must be sorted and unique; resample the series first')
+        return keys, [np.asarray(values) for _, values in series]
+    positions = [np.arange(keys.size)]
+    for other_keys, _ in series[1:]:
+        left, right = merge_join(keys, other_keys)
+        keys = keys[left]
+        positions = [position[left] for position in positions] + [right]
+    return keys, [np.asarray(values)[position]
+                  for (_, values), position in zip(series, positions)]
+
+
+def drop_missing(keys: numpy.ndarray,
+                 values: List[numpy.ndarray]) -> Tuple[numpy.ndarray, List[numpy.ndarray]]:
+    """Return keys and every array in values without the positions at which any of the arrays
+    holds NaN or an infinite value, e.g. the years of aligned series that one of them has no
+    data for. If every value is finite, the arrays are returned as they are.
+    Preconditions:
+        - all(len(array) == len(keys) for array in values)
+    """
+    present = np.ones(len(keys), dtype=bool)
+    for array in values:
+        present &= np.isfinite(array)
+    if present.all():
+        return keys, values
+    return keys[present], [array[present] for array in values]
+
+
+if __name__ == '__main__':
+    # When you are ready to check your work with python_ta, uncomment the following lines.
+    # (Delete the "#" and space before each line.)
+    # IMPORTANT: keep this code indented inside the "if __name__ == '__main__'" block
+    # Leave this code uncommented when you submit your files.
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': [],
+        'extra-imports': ['python_ta.contracts', 'lazy_imports'],
+        'max-line-length': 100,
+        'max-args': 6,
+        'max-locals': 25,
+        'disable': ['R1705'],
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()